@@ -0,0 +1 @@
+"""Micro-benchmarks for Chapiana hot paths."""
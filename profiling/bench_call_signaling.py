@@ -0,0 +1,81 @@
+"""
+Benchmark: ring latency of a call notification, direct vs Celery.
+
+A listener joins the caller's and receiver's `user_<id>_calls` groups, then
+each round sends one call state and waits until both copies have arrived:
+
+    direct: `src.chat.calls.asend_call_state`, straight from this process
+            to the channel layer, both groups concurrently;
+    celery: `notify_video_call_users.delay`, through the broker and a worker
+            (the path every transition used before).
+
+Needs the channel layer and Celery broker from the project settings and a
+running worker for the Celery path:
+`python -m profiling.bench_call_signaling [rounds]`.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.local")
+os.environ.setdefault("DJANGO_CONFIGURATION", "LOCAL")
+
+import configurations  # noqa: E402
+
+configurations.setup()
+
+from channels.layers import get_channel_layer  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from src.chat.calls import CallState, asend_call_state, call_payload  # noqa: E402
+from src.chat.constants.symbolic_constants import VideoCallStatus  # noqa: E402
+from src.chat.notifications import call_group  # noqa: E402
+from src.chat.tasks import notify_video_call_users  # noqa: E402
+
+CALLER_ID, RECEIVER_ID = 900_001, 900_002
+TIMEOUT = 10
+
+
+async def ring(layer, channels, send) -> float:
+    """
+    Milliseconds from sending a call state until both participants have it.
+    """
+    started = time.perf_counter()
+    await send()
+    await asyncio.wait_for(asyncio.gather(*(layer.receive(channel) for channel in channels)), TIMEOUT)
+    return (time.perf_counter() - started) * 1e3
+
+
+async def run(rounds: int = 50) -> None:
+    layer = get_channel_layer()
+    channels = [await layer.new_channel(), await layer.new_channel()]
+    for user_id, channel in zip((CALLER_ID, RECEIVER_ID), channels):
+        await layer.group_add(call_group(user_id), channel)
+
+    now = timezone.now()
+    state = CallState(1, CALLER_ID, RECEIVER_ID, VideoCallStatus.CONTACTING, now, now)
+
+    async def direct():
+        await asend_call_state(state)
+
+    async def celery():
+        notify_video_call_users.delay(**call_payload(state))
+
+    try:
+        for name, send in (("direct", direct), ("celery", celery)):
+            try:
+                samples = sorted([await ring(layer, channels, send) for _ in range(rounds)])
+            except asyncio.TimeoutError:
+                print(f"{name}: no delivery within {TIMEOUT}s (is a worker running?)")
+                continue
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{name}: median {statistics.median(samples):.2f} ms, p95 {p95:.2f} ms over {rounds} rings")
+    finally:
+        for user_id, channel in zip((CALLER_ID, RECEIVER_ID), channels):
+            await layer.group_discard(call_group(user_id), channel)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(*(int(arg) for arg in sys.argv[1:2])))
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: CPU cost of one room fan-out.
+
+Before: every recipient consumer calls `json.dumps(event)` on the same dict.
+After: the sender encodes the frame once with `src.common.encoding` and each
+recipient only forwards the string.
+
+Run with `python -m profiling.bench_fanout [members] [rounds]`.
+"""
+import json
+import sys
+import timeit
+
+from src.common.encoding import ENCODER, dumps, frame_event
+
+EVENT = {
+    "type": "chat_message",
+    "command": "new_message",
+    "content": "Habari yako? " * 8,
+    "__str__": "biko",
+    "created_at": "2024-01-01T12:00:00+00:00",
+}
+
+
+def fan_out_before(members: int) -> None:
+    """
+    Encode the event once per recipient socket.
+    """
+    for _ in range(members):
+        json.dumps(EVENT)
+
+
+def fan_out_after(members: int) -> None:
+    """
+    Encode the event once, then forward the pre-encoded text per recipient.
+    """
+    event = frame_event({key: value for key, value in EVENT.items() if key != "type"})
+    for _ in range(members):
+        event["text"]
+
+
+def main(members: int = 2000, rounds: int = 200) -> None:
+    before = min(timeit.repeat(lambda: fan_out_before(members), number=1, repeat=rounds))
+    after = min(timeit.repeat(lambda: fan_out_after(members), number=1, repeat=rounds))
+    single = min(timeit.repeat(lambda: dumps(EVENT), number=1000, repeat=rounds)) / 1000
+
+    print(f"encoder: {ENCODER}, members: {members}")
+    print(f"before: {before * 1e3:.3f} ms per fan-out")
+    print(f"after:  {after * 1e3:.3f} ms per fan-out")
+    print(f"single encode: {single * 1e6:.2f} us, speed-up: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
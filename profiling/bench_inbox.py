@@ -0,0 +1,101 @@
+"""
+Benchmark: inbox query for a user with 10,000 conversations.
+
+Seeds one user with N peers, a conversation and a few messages each, then
+times the first and a deep page of `get_inbox` against the old approach of
+one last-message and one unread-count query per conversation. Everything is
+rolled back at the end.
+
+Needs the PostgreSQL database from the project settings:
+`python -m profiling.bench_inbox [conversations]`.
+"""
+import os
+import sys
+import time
+import uuid
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.local")
+os.environ.setdefault("DJANGO_CONFIGURATION", "LOCAL")
+
+import configurations  # noqa: E402
+
+configurations.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from src.accounts.models import ChapianaUser  # noqa: E402
+from src.chat.inbox import get_inbox  # noqa: E402
+from src.chat.models import Conversation, Message  # noqa: E402
+
+
+class Rollback(Exception):
+    """
+    Raised to undo the seeded rows.
+    """
+
+
+def seed(conversations: int) -> ChapianaUser:
+    """
+    Create a user with `conversations` peers and three messages per dialog.
+    """
+    run = uuid.uuid4().hex[:8]
+    user = ChapianaUser.objects.create(username=f"bench_{run}", email=f"bench_{run}@example.com")
+    peers = ChapianaUser.objects.bulk_create([
+        ChapianaUser(username=f"peer_{run}_{index}", email=f"peer_{run}_{index}@example.com")
+        for index in range(conversations)
+    ])
+    Conversation.ensure_pairs([(user, peer) for peer in peers])
+
+    now = timezone.now()
+    Message.objects.bulk_create([
+        Message(
+            sender=sender,
+            recipient=recipient,
+            message_content=f"message {index}",
+            created_at=now - timezone.timedelta(seconds=index * 3 + offset),
+        )
+        for index, peer in enumerate(peers)
+        for offset, (sender, recipient) in enumerate(((user, peer), (peer, user), (user, peer)))
+    ], batch_size=5000)
+    with connection.cursor() as db:
+        db.execute("ANALYZE")
+    return user
+
+
+def timed(label: str, func) -> None:
+    started = time.perf_counter()
+    func()
+    print(f"{label}: {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+
+def main(conversations: int = 10_000) -> None:
+    try:
+        with transaction.atomic():
+            user = seed(conversations)
+            first = get_inbox(user.pk)
+            timed("inbox first page (1 query)", lambda: get_inbox(user.pk))
+
+            page = first
+            for _ in range(20):
+                page = get_inbox(user.pk, page.next_cursor)
+            timed("inbox page 21 (1 query)", lambda: get_inbox(user.pk, page.next_cursor))
+
+            pairs = list(Conversation.get_conversations_for_user(user)[:len(first.entries)])
+            timed(
+                f"per-conversation queries ({len(pairs) * 2} queries, first page only)",
+                lambda: [
+                    (
+                        Message.get_last_message_for_conversation(first_id, second_id),
+                        Message.get_unread_count_for_dialog_with_user(second_id, first_id),
+                    )
+                    for first_id, second_id in pairs
+                ],
+            )
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,152 @@
+"""
+Benchmark: sockets, memory and connect latency per active user, one socket
+per room vs one multiplexed socket.
+
+Seeds U users who are all members of R rooms, then connects every user the
+old way (a notification socket plus `ws/chat/<room>/` per room, each
+authenticated by `AuthMiddlewareStack`) and the new way (one `ws/stream/`
+socket subscribing to the R rooms). For each layout it reports sockets per
+user, the time until a user is fully connected (median/p95) and the Python
+memory held per user while connected. The seeded rows are deleted at the
+end.
+
+Needs the PostgreSQL database, Redis and the channel layer from the project
+settings: `python -m profiling.bench_stream [rooms] [users]`.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from importlib import import_module
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.local")
+os.environ.setdefault("DJANGO_CONFIGURATION", "LOCAL")
+
+import configurations  # noqa: E402
+
+configurations.setup()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import URLRouter  # noqa: E402
+from channels.testing import WebsocketCommunicator  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY  # noqa: E402
+
+from src.accounts.models import ChapianaUser  # noqa: E402
+from src.chat.constants.symbolic_constants import ChapianaUserPackage, ChatType  # noqa: E402
+from src.chat.models import Category, ChatRoom  # noqa: E402
+from src.chat.routing import websocket_urlpatterns  # noqa: E402
+
+APPLICATION = AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+
+def seed(rooms: int, users: int):
+    """
+    Create `users` users, each a member of the same `rooms` rooms, and a
+    logged-in session per user.
+    """
+    run = uuid.uuid4().hex[:8]
+    members = ChapianaUser.objects.bulk_create([
+        ChapianaUser(username=f"bench_{run}_{index}", email=f"bench_{run}_{index}@example.com")
+        for index in range(users)
+    ])
+    category = Category.objects.create(
+        country_name="Kenya", chat_type=ChatType.GROUP_MESSAGE, user_package=ChapianaUserPackage.FREE
+    )
+    chat_rooms = [
+        ChatRoom.objects.create(category=category, room_name=f"bench_{run}_{index}", slug=f"bench-{run}-{index}")
+        for index in range(rooms)
+    ]
+    for room in chat_rooms:
+        room.members.add(*members)
+
+    engine = import_module(settings.SESSION_ENGINE)
+    sessions = []
+    for user in members:
+        session = engine.SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        sessions.append(session.session_key)
+    return members, category, chat_rooms, sessions
+
+
+async def open_socket(path: str, session_key: str) -> WebsocketCommunicator:
+    communicator = WebsocketCommunicator(
+        APPLICATION, path, headers=[(b"cookie", f"{settings.SESSION_COOKIE_NAME}={session_key}".encode())]
+    )
+    connected, _ = await communicator.connect()
+    if not connected:
+        raise RuntimeError(f"Could not connect to {path}")
+    return communicator
+
+
+async def connect_per_room(session_key: str, room_names) -> list[WebsocketCommunicator]:
+    """
+    The old layout: a notification socket and one socket per room.
+    """
+    return list(await asyncio.gather(
+        open_socket("/ws/notifications/", session_key),
+        *(open_socket(f"/ws/chat/{name}/", session_key) for name in room_names),
+    ))
+
+
+async def connect_multiplexed(session_key: str, room_names) -> list[WebsocketCommunicator]:
+    """
+    The new layout: one socket subscribing to every room.
+    """
+    communicator = await open_socket("/ws/stream/", session_key)
+    for name in room_names:
+        await communicator.send_json_to({"command": "subscribe", "stream": f"room:{name}"})
+    for _ in room_names:
+        reply = await communicator.receive_json_from(timeout=10)
+        if reply["payload"].get("command") != "subscribed":
+            raise RuntimeError(f"Subscription failed: {reply}")
+    return [communicator]
+
+
+async def measure(label: str, connect, sessions, room_names) -> None:
+    latencies = []
+    sockets = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for session_key in sessions:
+        started = time.perf_counter()
+        sockets.append(await connect(session_key, room_names))
+        latencies.append((time.perf_counter() - started) * 1e3)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    for user_sockets in sockets:
+        for communicator in user_sockets:
+            await communicator.disconnect()
+
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{label}: {len(sockets[0])} sockets/user, "
+        f"connect median {statistics.median(latencies):.1f} ms, p95 {p95:.1f} ms, "
+        f"{held / len(sessions) / 1024:.0f} KiB/user"
+    )
+
+
+def main(rooms: int = 30, users: int = 20) -> None:
+    members, category, chat_rooms, sessions = seed(rooms, users)
+    room_names = [room.room_name for room in chat_rooms]
+    try:
+        asyncio.run(measure("per-room sockets", connect_per_room, sessions, room_names))
+        asyncio.run(measure("multiplexed socket", connect_multiplexed, sessions, room_names))
+    finally:
+        engine = import_module(settings.SESSION_ENGINE)
+        for session_key in sessions:
+            engine.SessionStore(session_key).delete()
+        category.delete()
+        ChapianaUser.objects.filter(pk__in=[user.pk for user in members]).delete()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,205 @@
+"""
+Cached user lookups by id and username.
+
+Users are kept in a short-lived process-local LRU in front of Django's
+shared (Redis) cache: id -> user, and username -> id. Only a `CachedUser`
+projection is cached (id, username, active flag and a prefix of the
+session auth hash), never the password hash. `ChapianaUser`
+post_save/post_delete signals drop both tiers, so the message path and
+websocket authentication resolve users without touching the database in
+steady state.
+
+The signals only reach the local tier of the process that saved the user;
+elsewhere a local copy lives on for up to `IDENTITY_LOCAL_TTL` seconds.
+Authentication therefore reads with `local=False`, so a deactivated user
+or a changed password takes effect at once in every process.
+
+Hits in each tier and misses are counted in `METRICS`; `hit_ratio` sums
+them up.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from src.accounts.models import ChapianaUser
+from src.common.cache import LocalCache
+from src.common.metrics import METRICS
+
+# Holds `CachedUser` projections, never full user rows.
+ID_KEY = "accounts:cached_user:{}"
+USERNAME_KEY = "accounts:username:{}"
+DEFAULT_LOCAL_TTL = 30
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+
+_LOCAL_TTL = getattr(settings, "IDENTITY_LOCAL_TTL", DEFAULT_LOCAL_TTL)
+_USERS = LocalCache(maxsize=10_000, ttl=_LOCAL_TTL)
+_USER_IDS = LocalCache(maxsize=10_000, ttl=_LOCAL_TTL)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    The fields of a user that cached lookups serve.
+    """
+    id: int
+    username: str
+    is_active: bool
+    auth_hash: str
+
+    @property
+    def pk(self) -> int:
+        """
+        The user's id, as on the model.
+        """
+        return self.id
+
+    def as_user(self) -> ChapianaUser:
+        """
+        A `ChapianaUser` with only these fields loaded; any other field is
+        read from the database when first accessed.
+        """
+        loaded = {"id": self.id, "username": self.username, "is_active": self.is_active}
+        names = [field.attname for field in ChapianaUser._meta.concrete_fields if field.attname in loaded]
+        return ChapianaUser.from_db("default", names, [loaded[name] for name in names])
+
+
+def auth_hash(user: ChapianaUser) -> str:
+    """
+    The prefix of the user's session auth hash; it changes with the password.
+    """
+    return user.get_session_auth_hash()[:16]
+
+
+def _cache_timeout() -> int:
+    return getattr(settings, "IDENTITY_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT)
+
+
+def _remember(user: CachedUser, shared: bool = True) -> None:
+    _USERS.set(user.id, user)
+    _USER_IDS.set(user.username, user.id)
+    if shared:
+        cache.set_many(
+            {ID_KEY.format(user.id): user, USERNAME_KEY.format(user.username): user.id},
+            _cache_timeout(),
+        )
+
+
+def _load(**lookup) -> CachedUser | None:
+    METRICS.increment("accounts.identity.misses")
+    user = ChapianaUser.objects.filter(**lookup).first()
+    if user is None:
+        return None
+    cached = CachedUser(id=user.pk, username=user.username, is_active=user.is_active, auth_hash=auth_hash(user))
+    _remember(cached)
+    return cached
+
+
+def get_local_user(user_id: int) -> CachedUser | None:
+    """
+    The user with `user_id` if this process has it cached, without any I/O.
+    """
+    user = _USERS.get(user_id)
+    if user is not None:
+        METRICS.increment("accounts.identity.local_hits")
+    return user
+
+
+def get_user(user_id: int, local: bool = True) -> CachedUser | None:
+    """
+    The user with `user_id`, or None if there is none.
+
+    With `local=False` the process-local tier is skipped, for decisions
+    that must not act on a copy another process has since invalidated.
+    """
+    user = get_local_user(user_id) if local else None
+    if user is not None:
+        return user
+
+    user = cache.get(ID_KEY.format(user_id))
+    if user is not None:
+        METRICS.increment("accounts.identity.shared_hits")
+        _remember(user, shared=False)
+        return user
+    return _load(pk=user_id)
+
+
+async def aget_shared_user(user_id: int) -> CachedUser | None:
+    """
+    The user with `user_id` from the shared tier only, or None on a miss.
+    """
+    user = await cache.aget(ID_KEY.format(user_id))
+    if user is not None:
+        METRICS.increment("accounts.identity.shared_hits")
+    return user
+
+
+def get_user_by_username(username: str) -> CachedUser | None:
+    """
+    The user called `username`, or None if there is none.
+    """
+    user_id = _USER_IDS.get(username)
+    if user_id is None:
+        user_id = cache.get(USERNAME_KEY.format(username))
+    if user_id is not None:
+        return get_user(user_id)
+    return _load(username=username)
+
+
+def get_user_ids(usernames) -> dict[str, int]:
+    """
+    The ids of the given usernames, with one shared-cache round-trip and at
+    most one query for the rest. Unknown usernames are left out.
+    """
+    user_ids = {}
+    missing = []
+    for username in set(usernames):
+        user_id = _USER_IDS.get(username)
+        if user_id is None:
+            missing.append(username)
+        else:
+            user_ids[username] = user_id
+    METRICS.increment("accounts.identity.local_hits", len(user_ids))
+    if not missing:
+        return user_ids
+
+    shared = cache.get_many([USERNAME_KEY.format(username) for username in missing])
+    for username in missing:
+        user_id = shared.get(USERNAME_KEY.format(username))
+        if user_id is not None:
+            user_ids[username] = user_id
+            _USER_IDS.set(username, user_id)
+    METRICS.increment("accounts.identity.shared_hits", len(shared))
+
+    missing = [username for username in missing if username not in user_ids]
+    if missing:
+        METRICS.increment("accounts.identity.misses", len(missing))
+        loaded = dict(ChapianaUser.objects.filter(username__in=missing).values_list("username", "pk"))
+        for username, user_id in loaded.items():
+            _USER_IDS.set(username, user_id)
+        cache.set_many(
+            {USERNAME_KEY.format(username): user_id for username, user_id in loaded.items()},
+            _cache_timeout(),
+        )
+        user_ids.update(loaded)
+    return user_ids
+
+
+def invalidate_user(user: ChapianaUser) -> None:
+    """
+    Drop a user from both tiers, under their current and cached usernames.
+    """
+    cached = _USERS.get(user.pk) or cache.get(ID_KEY.format(user.pk))
+    usernames = {user.username} | ({cached.username} if cached is not None else set())
+    _USERS.delete(user.pk)
+    _USER_IDS.delete(*usernames)
+    cache.delete_many([ID_KEY.format(user.pk)] + [USERNAME_KEY.format(username) for username in usernames])
+
+
+def hit_ratio() -> float:
+    """
+    The share of lookups in this process answered by either cache tier.
+    """
+    hits = METRICS.counter("accounts.identity.local_hits") + METRICS.counter("accounts.identity.shared_hits")
+    total = hits + METRICS.counter("accounts.identity.misses")
+    return hits / total if total else 0.0
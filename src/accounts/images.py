@@ -0,0 +1,70 @@
+"""
+Profile Image Processing Module for Chapiana.
+
+This module renders the avatar variants of a profile image: one image per
+size in `AVATAR_SIZES` and per format in `FORMATS`, with the EXIF orientation
+applied and the metadata dropped.
+
+Decoding is the expensive part, so the source is decoded once at a reduced
+scale (`Image.draft` lets the JPEG decoder skip detail it would throw away),
+shrunk by an integer factor with `Image.reduce` and only then resampled.
+Smaller sizes are derived from the largest one rather than from the source.
+"""
+
+import hashlib
+import io
+from typing import BinaryIO
+
+from PIL import Image, ImageOps
+
+AVATAR_SIZES = (300, 96, 48)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+READ_SIZE = 64 * 1024
+
+
+def content_hash(image_file: BinaryIO) -> str:
+    """
+    Compute the SHA-256 of an image file, reading it in chunks.
+    """
+    digest = hashlib.sha256()
+    for block in iter(lambda: image_file.read(READ_SIZE), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def _downscale(image: Image.Image, size: int) -> Image.Image:
+    """
+    Fit an image inside a `size` x `size` box, keeping its aspect ratio.
+    """
+    factor = min(image.width, image.height) // (size * 2)
+    if factor > 1:
+        image = image.reduce(factor)
+    if image.width > size or image.height > size:
+        image = image.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return image
+
+
+def render_variants(image_file: BinaryIO) -> dict[tuple[int, str], bytes]:
+    """
+    Render every avatar variant of an image.
+
+    Returns the encoded bytes keyed by `(size, format)`. EXIF is not carried
+    over, so location and camera metadata never reach other users.
+    """
+    image = Image.open(image_file)
+    largest = max(AVATAR_SIZES)
+    image.draft("RGB", (largest, largest))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    variants = {}
+    for size in sorted(AVATAR_SIZES, reverse=True):
+        image = _downscale(image, size)
+        for name, (pil_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            variants[(size, name)] = buffer.getvalue()
+    return variants
@@ -11,9 +11,8 @@ from django.contrib.auth.models import(
     Group,
     Permission
 )
-from django.db import models
-from django.utils import timezone
-from PIL import Image
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 
 from src.accounts.managers import ChapianaUserManager
 
@@ -51,18 +50,25 @@ class ChapianaUser(AbstractUser):
 
     def mark_online(self):
         """
-        Marks the user as online and saves the status.
+        Marks the user as online in the presence service.
+
+        Nothing is saved here; `is_online` and `was_online` are written in
+        bulk by `src.accounts.tasks.flush_presence`.
         """
-        self.is_online = True
-        self.save(update_fields=["is_online"])
+        # Imported here: the presence module imports the models.
+        from src.accounts import presence
+
+        presence.mark_online(self.pk)
 
     def mark_offline(self):
         """
-        Marks the user as offline and updates the was_online field with the current timestamp.
+        Marks the user as offline in the presence service, recording now as
+        their last activity.
         """
-        self.is_online = False
-        self.was_online = timezone.now()
-        self.save(update_fields=["is_online", "was_online"])
+        # Imported here: the presence module imports the models.
+        from src.accounts import presence
+
+        presence.mark_offline(self.pk)
     
     def __str__(self):
         """String representation of the user availability."""
@@ -74,36 +80,68 @@ class Profile(models.Model):
     """
     User profile model for Chapiana.
 
-    It handles user profile information, including profile images.
-    It uses the Pillow library to resize images upon saving.
+    It handles user profile information, including profile images. Avatar
+    variants are rendered in the background by
+    `src.accounts.tasks.process_profile_image` whenever the image changes.
     """
 
+    DEFAULT_IMAGE = "default.jpg"
+
     user = models.OneToOneField(
         ChapianaUser,
         on_delete=models.CASCADE,
         related_name="user_profile"
     )
-    image = models.ImageField(default="default.jpg", upload_to="profile_pics")
+    image = models.ImageField(default=DEFAULT_IMAGE, upload_to="profile_pics")
+    # SHA-256 of the image the variants were rendered from.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Storage names of the rendered variants: {"<size>": {"<format>": name}}.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         """String representation of the profile."""
         return f"{self.user.username} profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the stored image name to detect image changes on save.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
     def save(self, *args, **kwargs):
         """
-        Save the profile and resize the profile image if necessary.
+        Save the profile and queue the avatar variants if the image changed.
 
-        This method overrides the default `save` method to resize the profile image
-        using the Pillow library if the image dimensions exceed 300x300 pixels.
+        Saves that leave the image alone do no image work at all.
         """
+        image_changed = getattr(self, "_loaded_image", None) != self.image.name
         super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
 
-        img = Image.open(self.image.path)
+        if image_changed and self.image.name and self.image.name != self.DEFAULT_IMAGE:
+            # Imported here: the tasks module imports the models.
+            from src.accounts.tasks import process_profile_image
 
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+            transaction.on_commit(lambda: process_profile_image.delay(self.pk))
+
+    @staticmethod
+    def variant_urls_for(variants: dict) -> dict:
+        """
+        Map stored variant names to their URLs: {"<size>": {"<format>": url}}.
+        """
+        return {
+            size: {image_format: default_storage.url(name) for image_format, name in formats.items()}
+            for size, formats in (variants or {}).items()
+        }
+
+    def variant_urls(self) -> dict:
+        """
+        The URLs of this profile's avatar variants, empty until rendered.
+        """
+        return Profile.variant_urls_for(self.image_variants)
 
 
 class OneTimePassword(models.Model):
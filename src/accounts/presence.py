@@ -0,0 +1,229 @@
+"""
+Redis-backed user presence.
+
+A user is online while `presence:online:<user id>` exists. The key holds the
+user's last activity as a Unix timestamp and expires `PRESENCE_TTL` seconds
+after the last heartbeat, so users whose sockets or tabs vanish without a
+goodbye drop offline by themselves.
+
+HTTP requests and websocket traffic call `touch`, which writes to Redis at
+most once per user per `PRESENCE_WRITE_INTERVAL` seconds in each process.
+Every write also records the timestamp in the `presence:last_seen` hash,
+which `flush_last_seen` periodically moves to `ChapianaUser.was_online` and
+`is_online` with one bulk update, so presence never writes a user row per
+request.
+
+Websocket connections are also counted per user, and the state last
+announced to other users is kept next to the count. The count does not
+follow `PRESENCE_TTL`, so a socket that stays quiet keeps it; it only
+expires a day after the user's last connect, which clears counts left by a
+crashed worker. `connected` reports
+when a user comes online, and `settle`, run a debounce interval after the
+last connection closed, reports when they went offline. A reconnect within
+that interval announces nothing in either direction.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from src.accounts.models import ChapianaUser
+from src.common.cache import LocalCache
+from src.common.metrics import METRICS
+from src.common.redis import get_redis
+
+ONLINE_KEY = "presence:online:{}"
+LAST_SEEN_KEY = "presence:last_seen"
+FLUSHING_KEY = "presence:last_seen:flushing"
+CONNECTIONS_KEY = "presence:connections:{}"
+ANNOUNCED_KEY = "presence:announced:{}"
+ANNOUNCED_TTL = 24 * 60 * 60
+CONNECTIONS_TTL = 24 * 60 * 60
+DEFAULT_TTL = 90
+DEFAULT_WRITE_INTERVAL = 30
+
+# Count a connection; 1 if the user was not announced online yet.
+CONNECT_SCRIPT = """
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return redis.call('SET', KEYS[2], 'online', 'EX', ARGV[2], 'GET') ~= 'online' and 1 or 0
+"""
+
+# Drop a connection; the number left, never below 0.
+DISCONNECT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') <= 1 then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+return redis.call('DECR', KEYS[1])
+"""
+
+# 1 if the user has no connection left and was announced online.
+SETTLE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return 0
+end
+return redis.call('SET', KEYS[2], 'offline', 'EX', ARGV[1], 'GET') == 'online' and 1 or 0
+"""
+
+_RECENT = LocalCache(
+    maxsize=100_000,
+    ttl=getattr(settings, "PRESENCE_WRITE_INTERVAL", DEFAULT_WRITE_INTERVAL),
+)
+
+
+@dataclass(frozen=True)
+class Presence:
+    """
+    Whether a user is online, and when they were last active.
+    """
+    is_online: bool
+    last_seen: datetime | None
+
+
+def _from_timestamp(value) -> datetime | None:
+    return datetime.fromtimestamp(float(value), tz=dt_timezone.utc) if value else None
+
+
+def _write(user_id: int, online: bool) -> None:
+    now = time.time()
+    ttl = getattr(settings, "PRESENCE_TTL", DEFAULT_TTL)
+    pipe = get_redis().pipeline(transaction=False)
+    if online:
+        pipe.set(ONLINE_KEY.format(user_id), now, ex=ttl)
+    else:
+        pipe.delete(ONLINE_KEY.format(user_id))
+    pipe.hset(LAST_SEEN_KEY, user_id, now)
+    pipe.execute()
+    METRICS.increment("accounts.presence.writes")
+
+
+def touch(user_id: int) -> None:
+    """
+    Heartbeat: keep the user online, writing at most once per interval.
+    """
+    if user_id in _RECENT:
+        METRICS.increment("accounts.presence.throttled")
+        return
+    _RECENT.set(user_id, True)
+    _write(user_id, online=True)
+
+
+async def atouch(user_id: int) -> None:
+    """
+    Async variant of `touch` that skips the thread hop while throttled.
+    """
+    if user_id in _RECENT:
+        METRICS.increment("accounts.presence.throttled")
+        return
+    await sync_to_async(touch, thread_sensitive=False)(user_id)
+
+
+def mark_online(user_id: int) -> None:
+    """
+    Mark the user online now, regardless of the write interval.
+    """
+    _RECENT.set(user_id, True)
+    _write(user_id, online=True)
+
+
+def mark_offline(user_id: int) -> None:
+    """
+    Mark the user offline now and record the time as their last activity.
+    """
+    _RECENT.delete(user_id)
+    _write(user_id, online=False)
+
+
+def connected(user_id: int) -> bool:
+    """
+    Count a new websocket connection and mark the user online. True if they
+    should be announced online.
+    """
+    mark_online(user_id)
+    announce = get_redis().register_script(CONNECT_SCRIPT)(
+        keys=[CONNECTIONS_KEY.format(user_id), ANNOUNCED_KEY.format(user_id)],
+        args=[CONNECTIONS_TTL, ANNOUNCED_TTL],
+    )
+    return bool(announce)
+
+
+def disconnected(user_id: int) -> bool:
+    """
+    Count a closed websocket connection. True if it was the user's last one.
+    """
+    left = get_redis().register_script(DISCONNECT_SCRIPT)(keys=[CONNECTIONS_KEY.format(user_id)])
+    return left <= 0
+
+
+def settle(user_id: int) -> bool:
+    """
+    After the debounce interval: mark the user offline if they have not
+    reconnected. True if they should be announced offline.
+    """
+    announce = get_redis().register_script(SETTLE_SCRIPT)(
+        keys=[CONNECTIONS_KEY.format(user_id), ANNOUNCED_KEY.format(user_id)],
+        args=[ANNOUNCED_TTL],
+    )
+    if not announce:
+        return False
+    mark_offline(user_id)
+    return True
+
+
+def get_presence(user_ids) -> dict[int, Presence]:
+    """
+    The presence of many users in one pipelined round-trip.
+
+    `last_seen` is None for users with no activity since the last flush;
+    their `was_online` column is then the most recent value.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.mget([ONLINE_KEY.format(user_id) for user_id in user_ids])
+    pipe.hmget(LAST_SEEN_KEY, user_ids)
+    online, last_seen = pipe.execute()
+    return {
+        user_id: Presence(is_online=active is not None, last_seen=_from_timestamp(active or seen))
+        for user_id, active, seen in zip(user_ids, online, last_seen)
+    }
+
+
+def flush_last_seen(batch_size: int = 1000) -> int:
+    """
+    Write the recorded activity to `was_online`/`is_online` in bulk, and mark
+    users who went quiet without a flush as offline. Returns the number of
+    users written.
+    """
+    client = get_redis()
+    # A hash left over from a failed flush is written before new activity.
+    if not client.exists(FLUSHING_KEY) and client.exists(LAST_SEEN_KEY):
+        client.rename(LAST_SEEN_KEY, FLUSHING_KEY)
+
+    seen = {int(user_id): value for user_id, value in client.hgetall(FLUSHING_KEY).items()}
+    if seen:
+        presence = get_presence(seen)
+        ChapianaUser.objects.bulk_update(
+            [
+                ChapianaUser(pk=user_id, was_online=_from_timestamp(value), is_online=presence[user_id].is_online)
+                for user_id, value in seen.items()
+            ],
+            ["was_online", "is_online"],
+            batch_size=batch_size,
+        )
+
+    ttl = getattr(settings, "PRESENCE_TTL", DEFAULT_TTL)
+    ChapianaUser.objects.filter(is_online=True).filter(
+        Q(was_online__isnull=True) | Q(was_online__lt=timezone.now() - timedelta(seconds=ttl))
+    ).update(is_online=False)
+
+    client.delete(FLUSHING_KEY)
+    METRICS.increment("accounts.presence.flushed", len(seen))
+    return len(seen)
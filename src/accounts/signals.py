@@ -1,8 +1,10 @@
 """Signals specifically meant for user(s)."""
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from src.accounts import identity
 from src.accounts.models import ChapianaUser, Profile
 
 @receiver(post_save, sender=ChapianaUser)
@@ -12,22 +14,27 @@ def create_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=ChapianaUser)
-def save_profile(sender, instance, **kwargs):
-    """Ensures the Profile instance is saved whenever the User is updated."""
-    instance.profile.save()
+@receiver(post_delete, sender=ChapianaUser)
+def invalidate_identity(sender, instance, **kwargs):
+    """
+    Drops a changed or deleted user from the identity cache once the change
+    commits, so a concurrent lookup cannot cache the old row again.
+    """
+    # Copied now: deleting the user clears `instance.pk` before the commit.
+    user = ChapianaUser(pk=instance.pk, username=instance.username)
+    transaction.on_commit(lambda: identity.invalidate_user(user))
 
 @receiver(user_logged_in)
 def handle_user_logged_in(sender, user, request, **kwargs):
     """
     Marks the user as online when they log in."
     """
-    if hasattr(user, "status"):
-        user.status.mark_online()
+    user.mark_online()
 
 @receiver(user_logged_out)
 def handle_user_logged_out(sender, user, request, **kwargs):
     """
     Marks the user as offline and records the time when they log out."
     """
-    if hasattr(user, "status"):
-        user.status.mark_offline()
+    if user is not None:
+        user.mark_offline()
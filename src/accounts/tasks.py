@@ -0,0 +1,79 @@
+"""
+Background Tasks Module for Chapiana Accounts.
+
+This module renders the avatar variants of profile images outside the
+request cycle, so saving a profile never decodes or resizes images inline,
+and flushes presence from Redis to the user table in bulk.
+"""
+
+import logging
+import os
+from logging import Logger
+from typing import Final
+
+from celery import shared_task
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from src.accounts import presence
+from src.accounts.images import content_hash, render_variants
+from src.accounts.models import Profile
+from src.common.models import BaseRetryTask
+
+_LOGGER: Final[Logger] = logging.getLogger(__name__)
+
+
+def variant_name(original: str, digest: str, size: int, image_format: str) -> str:
+    """
+    Storage name of a variant, next to the original and keyed by its content.
+    """
+    extension = "jpg" if image_format == "jpeg" else image_format
+    return f"{os.path.dirname(original)}/variants/{digest}_{size}.{extension}"
+
+
+@shared_task(bind=True, base=BaseRetryTask)
+def process_profile_image(self, profile_id: int) -> dict:
+    """
+    Render and store the avatar variants of a profile image.
+
+    Nothing is rendered when the image content is the one the current
+    variants were made from, and variants already in storage are reused.
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.image.name or profile.image.name == Profile.DEFAULT_IMAGE:
+        return {}
+
+    original = profile.image.name
+    with profile.image.open("rb") as image_file:
+        digest = content_hash(image_file)
+    if digest == profile.image_hash and profile.image_variants:
+        _LOGGER.info(f"Profile {profile_id} image unchanged; skipping variants.")
+        return profile.image_variants
+
+    with profile.image.open("rb") as image_file:
+        rendered = render_variants(image_file)
+
+    variants = {}
+    for (size, image_format), data in rendered.items():
+        name = variant_name(original, digest, size, image_format)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        variants.setdefault(str(size), {})[image_format] = name
+
+    # Only record the variants if the image was not replaced meanwhile.
+    Profile.objects.filter(pk=profile_id, image=original).update(
+        image_hash=digest, image_variants=variants
+    )
+    _LOGGER.info(f"Rendered {len(rendered)} avatar variants for profile {profile_id}.")
+    return variants
+
+
+@shared_task
+def flush_presence() -> int:
+    """
+    Write the users' recorded activity to `was_online`/`is_online`.
+    """
+    flushed = presence.flush_last_seen()
+    if flushed:
+        _LOGGER.info(f"Flushed presence of {flushed} users.")
+    return flushed
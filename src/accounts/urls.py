@@ -4,7 +4,9 @@ from django.conf.urls.static import static
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
-from src.accounts.views import RegisterViewSet, LoginViewSet, LogoutViewSet, OneTimePassword, ForgotPasswordViewSet
+from src.accounts.views import (
+    RegisterViewSet, LoginViewSet, LogoutViewSet, OneTimePassword, ForgotPasswordViewSet, WebsocketTokenViewSet,
+)
 
 
 router = DefaultRouter()
@@ -13,6 +15,7 @@ router.register(r"login", LoginViewSet, basename="login-user")
 router.register(r"logout", LogoutViewSet, basename="logout-user")
 router.register(r"otp", OneTimePassword, basename="one-time-password")
 router.register(r"password", ForgotPasswordViewSet, basename="forgot-password")
+router.register(r"ws-token", WebsocketTokenViewSet, basename="ws-token")
 
 app_name = "accounts"
 
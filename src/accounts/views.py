@@ -19,6 +19,7 @@ from src.accounts.models import (
     OneTimePassword,
 )
 from src.accounts.utils import send_email
+from src.accounts.ws_auth import issue_token, token_ttl
 
 
 
@@ -286,3 +287,25 @@ class ForgotPasswordViewSet(viewsets.ModelViewSet):
             return Response({'status': 200, 'username': username}, status=status.HTTP_200_OK)
         
         return Response({'status': 400, 'message': 'Invalid data', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class WebsocketTokenViewSet(viewsets.ViewSet):
+    """
+    A ViewSet that issues short-lived websocket tokens.
+    Supports:
+    - Issuing a token for the authenticated user, to present on a websocket
+      handshake instead of the session.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request):
+        """
+        Handles token requests.
+
+        Returns:
+            - 200 OK with the token and the seconds it stays valid.
+        """
+        return Response(
+            {'status': 200, 'token': issue_token(request.user), 'expires_in': token_ttl()},
+            status=status.HTTP_200_OK,
+        )
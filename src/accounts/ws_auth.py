@@ -0,0 +1,143 @@
+"""
+Token authentication for websockets.
+
+`AuthMiddlewareStack` reads the Django session and the user from the
+database on every handshake. Clients can instead fetch a short-lived signed
+token from `accounts/ws-token/` and present it when connecting, either as
+`?token=<token>` or as the subprotocols `["chapiana.auth", "<token>"]`.
+
+The token is verified statelessly with `django.core.signing`; only the user
+is needed, and it comes from the shared tier of the identity cache, so a
+reconnect storm after a deploy costs at most one query per user rather than
+two per socket. The process-local tier is not used: it can lag behind a
+deactivation or password change made in another process. Handshakes
+without a token fall back to the session.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+
+from src.accounts import identity
+from src.accounts.models import ChapianaUser
+from src.common.metrics import METRICS
+
+SALT = "src.accounts.ws_auth"
+SUBPROTOCOL = "chapiana.auth"
+DEFAULT_TOKEN_TTL = 60
+
+# "." keeps tokens valid as websocket subprotocol names, which cannot hold ":".
+_SIGNER = signing.TimestampSigner(salt=SALT, sep=".")
+
+
+def token_ttl() -> int:
+    """
+    Seconds a websocket token is accepted after it was issued.
+    """
+    return getattr(settings, "WS_TOKEN_TTL", DEFAULT_TOKEN_TTL)
+
+
+def issue_token(user: ChapianaUser) -> str:
+    """
+    A signed token that authenticates `user` on a websocket handshake.
+    """
+    # Changing the password changes the hash, which revokes the token.
+    return _SIGNER.sign_object({"uid": user.pk, "h": identity.auth_hash(user)})
+
+
+def _load_user(user_id: int) -> identity.CachedUser | None:
+    return identity.get_user(user_id, local=False)
+
+
+def _claims(token: str) -> dict | None:
+    try:
+        return _SIGNER.unsign_object(token, max_age=token_ttl())
+    except signing.BadSignature:
+        return None
+
+
+def _check(claims: dict, user: identity.CachedUser | None) -> ChapianaUser | AnonymousUser:
+    if user is None or not user.is_active or not constant_time_compare(user.auth_hash, claims.get("h", "")):
+        METRICS.increment("accounts.ws_auth.rejected")
+        return AnonymousUser()
+    return user.as_user()
+
+
+def _user_for_claims(claims: dict | None) -> ChapianaUser | AnonymousUser:
+    if claims is None:
+        METRICS.increment("accounts.ws_auth.rejected")
+        return AnonymousUser()
+    return _check(claims, _load_user(claims.get("uid")))
+
+
+def user_for_token(token: str) -> ChapianaUser | AnonymousUser:
+    """
+    The user a token was issued to, or `AnonymousUser` if it is invalid,
+    expired or revoked.
+    """
+    return _user_for_claims(_claims(token))
+
+
+async def auser_for_token(token: str) -> ChapianaUser | AnonymousUser:
+    """
+    Async variant of `user_for_token` that skips the thread hop when the
+    token is invalid or its user is in the shared cache.
+    """
+    claims = _claims(token)
+    if claims is None:
+        return _user_for_claims(claims)
+    user = await identity.aget_shared_user(claims.get("uid"))
+    if user is not None:
+        return _check(claims, user)
+    return await database_sync_to_async(_user_for_claims)(claims)
+
+
+def token_from_scope(scope) -> tuple[str | None, bool]:
+    """
+    The token offered in a handshake, and whether it came as a subprotocol.
+    """
+    subprotocols = scope.get("subprotocols") or []
+    if SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], True
+
+    tokens = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return (tokens[0], False) if tokens else (None, False)
+
+
+class TokenAuthMiddleware:
+    """
+    Channels middleware that authenticates websockets by signed token, and
+    by session when no token is offered.
+    """
+    def __init__(self, inner):
+        self.inner = inner
+        self.session_auth = AuthMiddlewareStack(inner)
+
+    async def __call__(self, scope, receive, send):
+        token, as_subprotocol = token_from_scope(scope)
+        if token is None:
+            return await self.session_auth(scope, receive, send)
+
+        user = await auser_for_token(token)
+        scope = dict(scope, user=user)
+        if as_subprotocol:
+            send = self.accepting_subprotocol(send)
+        return await self.inner(scope, receive, send)
+
+    @staticmethod
+    def accepting_subprotocol(send):
+        """
+        Wrap `send` so the handshake reply selects `chapiana.auth`, which
+        browsers require when they offered subprotocols.
+        """
+        async def wrapped(message):
+            if message["type"] == "websocket.accept" and not message.get("subprotocol"):
+                message = dict(message, subprotocol=SUBPROTOCOL)
+            await send(message)
+        return wrapped
@@ -11,6 +11,6 @@ class CategoryAdmin(admin.ModelAdmin):
         """
         Display the flag + country name in admin.
         """
-        return format_html(f"{obj.country_flag} {obj.country_name}")
+        return format_html("{} {}", obj.country_flag, obj.get_country_name_display())
 
     country_with_flag.short_description = "Country"
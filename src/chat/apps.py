@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.chat'
+
+    def ready(self):
+        # Ensures signals are loaded when the app is ready
+        import src.chat.signals
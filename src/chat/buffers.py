@@ -0,0 +1,236 @@
+"""
+Write-behind persistence for chat messages.
+
+The consumer broadcasts a message as soon as it arrives and hands the row to
+a per-process `MessageBuffer`. The buffer writes pending rows with a single
+`bulk_create` once `CHAT_MESSAGE_BUFFER_SIZE` messages are waiting or
+`CHAT_MESSAGE_FLUSH_INTERVAL_MS` milliseconds have passed, whichever comes
+first. Pending rows are flushed on websocket disconnect and at interpreter
+shutdown so a clean restart does not lose messages.
+
+A failed write is retried with a growing delay. Messages that fail
+`CHAT_MESSAGE_FLUSH_MAX_ATTEMPTS` times are written one by one, so a single
+bad row cannot hold back the rest; a row that still fails on its own is
+logged and dropped.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from src.accounts import identity
+from src.chat.models import ChatRoom, Conversation, Message, UnreadCounter
+from src.common.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 100
+DEFAULT_FLUSH_INTERVAL_MS = 250
+DEFAULT_MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY = 30
+
+
+@dataclass(frozen=True)
+class PendingMessage:
+    """
+    A message that has been broadcast but not yet written to the database.
+    """
+    sender: str
+    recipient: str
+    chat_room: str | None = None
+    message_content: str | None = None
+    file_id: uuid.UUID | None = None
+    read: bool = False
+    created_at: datetime = field(default_factory=timezone.now)
+    # Failed writes so far.
+    attempts: int = 0
+
+
+def persist_messages(batch: list[PendingMessage]) -> list[Message]:
+    """
+    Write a batch of pending messages in one transaction.
+
+    Usernames are resolved through the identity cache and room names with
+    one query for the whole batch, every missing direct conversation is
+    created once per pair, unread counters are bumped once per counter and
+    the batch is indexed for search with one UPDATE.
+    """
+    usernames = {pending.sender for pending in batch} | {pending.recipient for pending in batch}
+    user_ids = identity.get_user_ids(usernames)
+    room_names = {pending.chat_room for pending in batch if pending.chat_room}
+    room_ids = dict(
+        ChatRoom.objects.filter(room_name__in=room_names).values_list("room_name", "pk")
+    ) if room_names else {}
+
+    messages = []
+    pairs = set()
+    for pending in batch:
+        sender_id = user_ids.get(pending.sender)
+        recipient_id = user_ids.get(pending.recipient)
+        if sender_id is None or recipient_id is None:
+            LOGGER.warning(
+                f"Dropping buffered message from {pending.sender} to {pending.recipient}: unknown user."
+            )
+            continue
+
+        messages.append(Message(
+            chat_room_id=room_ids.get(pending.chat_room),
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            message_content=pending.message_content,
+            file_id=pending.file_id,
+            created_at=pending.created_at,
+            read=pending.read,
+        ))
+        if not pending.chat_room and sender_id != recipient_id:
+            pairs.add((sender_id, recipient_id))
+
+    with transaction.atomic():
+        created = Message.objects.bulk_create(messages)
+        UnreadCounter.increment_for(created)
+        Message.update_search_vectors(created)
+        Conversation.ensure_pairs(pairs)
+    return created
+
+
+class MessageBuffer:
+    """
+    Per-process buffer that batches message inserts.
+    """
+    def __init__(
+        self,
+        max_size: int | None = None,
+        flush_interval_ms: int | None = None,
+        max_attempts: int | None = None,
+    ):
+        self.max_size = max_size or getattr(
+            settings, "CHAT_MESSAGE_BUFFER_SIZE", DEFAULT_BUFFER_SIZE
+        )
+        self.flush_interval = (flush_interval_ms or getattr(
+            settings, "CHAT_MESSAGE_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS
+        )) / 1000
+        self.max_attempts = max_attempts or getattr(
+            settings, "CHAT_MESSAGE_FLUSH_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS
+        )
+        self._failures = 0
+        self._pending: list[PendingMessage] = []
+        self._lock = threading.Lock()
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, message: PendingMessage) -> None:
+        """
+        Queue a message, flushing straight away once the batch is full.
+        """
+        with self._lock:
+            self._pending.append(message)
+            size = len(self._pending)
+
+        if size >= self.max_size:
+            await self.try_flush()
+        else:
+            self._schedule_flush()
+
+    async def flush(self) -> None:
+        """
+        Write every pending message on a database thread.
+        """
+        self._cancel_timer()
+        batch = self._drain()
+        if batch:
+            await database_sync_to_async(self._write)(batch)
+
+    async def try_flush(self) -> bool:
+        """
+        Like `flush`, but on failure schedule a retry instead of raising.
+        Returns whether the write succeeded.
+        """
+        try:
+            await self.flush()
+        except Exception:
+            # Already logged and re-queued.
+            self._failures += 1
+            self._schedule_flush(min(self.flush_interval * 2 ** self._failures, MAX_RETRY_DELAY))
+            return False
+        self._failures = 0
+        return True
+
+    def flush_sync(self) -> None:
+        """
+        Write every pending message from synchronous code, e.g. at shutdown.
+        """
+        batch = self._drain()
+        if batch:
+            self._write(batch)
+
+    def _drain(self) -> list[PendingMessage]:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        return batch
+
+    def _write(self, batch: list[PendingMessage]) -> None:
+        try:
+            with METRICS.timer("chat.message_buffer.flush_seconds"):
+                persist_messages(batch)
+        except Exception:
+            LOGGER.exception(f"Failed to flush {len(batch)} buffered messages, re-queueing.")
+            METRICS.increment("chat.message_buffer.flush_failures")
+            failed = [replace(pending, attempts=pending.attempts + 1) for pending in batch]
+            retry = [pending for pending in failed if pending.attempts < self.max_attempts]
+            with self._lock:
+                self._pending[:0] = retry
+            self._write_singly([pending for pending in failed if pending.attempts >= self.max_attempts])
+            raise
+
+        METRICS.observe("chat.message_buffer.flush_size", len(batch))
+        METRICS.increment("chat.message_buffer.messages_flushed", len(batch))
+
+    def _write_singly(self, batch: list[PendingMessage]) -> None:
+        """
+        Write messages that keep failing one at a time, dropping the ones
+        that fail on their own.
+        """
+        for pending in batch:
+            try:
+                persist_messages([pending])
+            except Exception:
+                LOGGER.exception(
+                    f"Dropping buffered message from {pending.sender} to {pending.recipient} "
+                    f"in {pending.chat_room} at {pending.created_at.isoformat()} "
+                    f"after {pending.attempts} failed writes: {pending.message_content!r}"
+                )
+                METRICS.increment("chat.message_buffer.dead_letters")
+            else:
+                METRICS.increment("chat.message_buffer.messages_flushed")
+
+    def _schedule_flush(self, delay: float | None = None) -> None:
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(delay or self.flush_interval, self._on_timer, loop)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._timer = None
+        task = loop.create_task(self.try_flush())
+        # Keep a reference until the flush is done so it is not collected.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+MESSAGE_BUFFER = MessageBuffer()
+atexit.register(MESSAGE_BUFFER.flush_sync)
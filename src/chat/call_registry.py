@@ -0,0 +1,124 @@
+"""
+Redis registry of active calls.
+
+Who is in a call, and who can be rung, is kept in Redis rather than derived
+from `VideoCall` rows and `ChapianaUser.is_online`:
+
+    chat:calls:active:<user id>     the call the user is in, expiring unless
+                                    heartbeats keep it alive;
+    chat:calls:reachable:<user id>  set while the user has a call socket,
+                                    refreshed by the same heartbeats;
+    chat:calls:ring_deadlines       sorted set of ringing call ids, scored by
+                                    when they count as missed.
+
+Starting a call costs one round-trip to learn whether the receiver is busy
+or unreachable, and one to claim both users. Crashed clients stop sending
+heartbeats, so their entries expire by themselves, and the sweeper reads
+only the calls whose deadline has passed instead of scanning the table.
+"""
+import time
+
+from django.conf import settings
+
+from src.chat.constants.symbolic_constants import VideoCallStatus
+from src.common.redis import get_redis
+
+ACTIVE_KEY = "chat:calls:active:{}"
+REACHABLE_KEY = "chat:calls:reachable:{}"
+DEADLINES_KEY = "chat:calls:ring_deadlines"
+DEFAULT_HEARTBEAT_TTL = 60
+DEFAULT_RING_TIMEOUT = 45
+
+# Claims both users for a call unless either one is already in another call.
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1], KEYS[2]) > 0 then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return 1
+"""
+
+# Frees the users still registered for this call, leaving newer calls alone.
+RELEASE_SCRIPT = """
+for i = 1, 2 do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+    end
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+"""
+
+
+def heartbeat_ttl() -> int:
+    """
+    Seconds a registry entry lives without a heartbeat.
+    """
+    return getattr(settings, "CHAT_CALL_HEARTBEAT_TTL", DEFAULT_HEARTBEAT_TTL)
+
+
+def heartbeat(user_id: int) -> None:
+    """
+    Mark the user reachable and keep their current call, if any, alive.
+    """
+    ttl = heartbeat_ttl()
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.set(REACHABLE_KEY.format(user_id), 1, ex=ttl)
+    pipe.expire(ACTIVE_KEY.format(user_id), ttl)
+    pipe.execute()
+
+
+def availability(user_id: int) -> VideoCallStatus:
+    """
+    `BUSY` if the user is in a call, `NOT_AVAILABLE` if they have no call
+    socket, otherwise `CONTACTING`.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.exists(ACTIVE_KEY.format(user_id))
+    pipe.exists(REACHABLE_KEY.format(user_id))
+    in_call, reachable = pipe.execute()
+    if in_call:
+        return VideoCallStatus.BUSY
+    if not reachable:
+        return VideoCallStatus.NOT_AVAILABLE
+    return VideoCallStatus.CONTACTING
+
+
+def claim(call_id: int, caller_id: int, receiver_id: int) -> bool:
+    """
+    Register a ringing call for both users and schedule it to be missed.
+
+    Returns False, registering nothing, if either user is already in a call.
+    """
+    ring_timeout = getattr(settings, "CHAT_CALL_RING_TIMEOUT", DEFAULT_RING_TIMEOUT)
+    client = get_redis()
+    claimed = client.register_script(CLAIM_SCRIPT)(
+        keys=[ACTIVE_KEY.format(caller_id), ACTIVE_KEY.format(receiver_id), DEADLINES_KEY],
+        args=[call_id, heartbeat_ttl(), time.time() + ring_timeout],
+    )
+    return bool(claimed)
+
+
+def answered(call_id: int) -> None:
+    """
+    Stop the missed-call deadline of a call that was picked up.
+    """
+    get_redis().zrem(DEADLINES_KEY, call_id)
+
+
+def release(call_id: int, caller_id: int, receiver_id: int) -> None:
+    """
+    Free both users of a call that has ended.
+    """
+    get_redis().register_script(RELEASE_SCRIPT)(
+        keys=[ACTIVE_KEY.format(caller_id), ACTIVE_KEY.format(receiver_id), DEADLINES_KEY],
+        args=[call_id],
+    )
+
+
+def overdue_calls(limit: int = 500) -> list[int]:
+    """
+    Ids of ringing calls whose deadline has passed, oldest first.
+    """
+    return [int(call_id) for call_id in get_redis().zrangebyscore(DEADLINES_KEY, "-inf", time.time(), 0, limit)]
@@ -0,0 +1,304 @@
+"""
+Video call state machine.
+
+Every status change goes through `transition`, which checks it against
+`ALLOWED_TRANSITIONS` and applies it with a single conditional
+`UPDATE ... WHERE status IN (<allowed sources>) RETURNING ...`. Concurrent
+transitions cannot both win, nothing is read before the write, and no model
+signals fire. `transition` and `start_call` return the committed state, and
+the caller announces it once to both participants' call groups: async code
+awaits `asend_call_state`, sync code calls `notify_call_state`. The send is
+kept out of the commit hooks, which run on the database thread. Celery is
+only used when that send fails.
+
+While a call is live, the participants are kept in a `CallSession` in a
+short-lived process-local tier backed by Django's shared (Redis) cache. The
+signaling consumer checks offers, answers and ICE candidates against it, so
+relaying them never touches the database. Busy and unreachable receivers,
+and rings that go unanswered, are detected through `call_registry`.
+
+Transition write latency and the time from call creation to each status are
+recorded in `METRICS`.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from src.chat import call_registry
+from src.chat.constants.symbolic_constants import VideoCallStatus
+from src.chat.models import VideoCall
+from src.chat.notifications import send_call_event
+from src.chat.tasks import notify_video_call_users
+from src.common.cache import LocalCache
+from src.common.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+ALLOWED_TRANSITIONS = {
+    VideoCallStatus.CONTACTING: frozenset({
+        VideoCallStatus.ACCEPTED,
+        VideoCallStatus.REJECTED,
+        VideoCallStatus.BUSY,
+        VideoCallStatus.NOT_AVAILABLE,
+        VideoCallStatus.MISSED,
+        VideoCallStatus.ENDED,
+    }),
+    VideoCallStatus.ACCEPTED: frozenset({VideoCallStatus.PROCESSING, VideoCallStatus.ENDED}),
+    VideoCallStatus.PROCESSING: frozenset({VideoCallStatus.ENDED}),
+    VideoCallStatus.REJECTED: frozenset(),
+    VideoCallStatus.BUSY: frozenset(),
+    VideoCallStatus.NOT_AVAILABLE: frozenset(),
+    VideoCallStatus.ENDED: frozenset(),
+    VideoCallStatus.MISSED: frozenset(),
+}
+TERMINAL_STATUSES = frozenset(status for status, targets in ALLOWED_TRANSITIONS.items() if not targets)
+
+TRANSITION_SQL = """
+UPDATE {table}
+   SET status = %(target)s,
+       date_started = COALESCE(%(date_started)s, date_started),
+       date_ended = COALESCE(%(date_ended)s, date_ended)
+ WHERE id = %(call_id)s AND status = ANY(%(sources)s)
+RETURNING caller_id, receiver_id, date_started, date_ended, date_created
+"""
+
+SESSION_KEY = "chat:calls:session:{}"
+DEFAULT_SESSION_LOCAL_TTL = 5
+DEFAULT_SESSION_TIMEOUT = 2 * 60 * 60
+
+_SESSIONS = LocalCache(maxsize=4096, ttl=DEFAULT_SESSION_LOCAL_TTL)
+
+
+class InvalidTransition(Exception):
+    """
+    Raised when a call is not in a status the requested transition allows.
+    """
+    def __init__(self, call_id: int, target: int):
+        super().__init__(call_id, target)
+        self.call_id = call_id
+        self.target = target
+
+    def __str__(self):
+        return f"Video call {self.call_id} cannot move to {VideoCallStatus(self.target).label}."
+
+
+@dataclass(frozen=True)
+class CallState:
+    """
+    A call's state right after a transition.
+    """
+    call_id: int
+    caller_id: int
+    receiver_id: int
+    status: int
+    date_started: datetime
+    date_ended: datetime
+
+    @property
+    def duration_seconds(self) -> int:
+        """
+        The call duration in seconds, zero until it has ended.
+        """
+        if self.status not in TERMINAL_STATUSES:
+            return 0
+        return max(0, int((self.date_ended - self.date_started).total_seconds()))
+
+
+@dataclass(frozen=True)
+class CallSession:
+    """
+    The participants of a live call, as seen by the signaling consumer.
+    """
+    call_id: int
+    caller_id: int
+    receiver_id: int
+
+    def peer_of(self, user_id: int) -> int | None:
+        """
+        The other participant, or None if `user_id` is not in the call.
+        """
+        if user_id == self.caller_id:
+            return self.receiver_id
+        if user_id == self.receiver_id:
+            return self.caller_id
+        return None
+
+
+def save_session(state: CallState) -> None:
+    """
+    Store (or refresh) the session of a live call in both tiers.
+    """
+    session = CallSession(state.call_id, state.caller_id, state.receiver_id)
+    cache.set(
+        SESSION_KEY.format(state.call_id),
+        session,
+        getattr(settings, "CHAT_CALL_SESSION_TIMEOUT", DEFAULT_SESSION_TIMEOUT),
+    )
+    _SESSIONS.set(state.call_id, session)
+
+
+async def aget_session(call_id: int) -> CallSession | None:
+    """
+    The session of a live call, or None once it has ended or expired.
+    """
+    session = _SESSIONS.get(call_id)
+    if session is None:
+        session = await cache.aget(SESSION_KEY.format(call_id))
+        if session is not None:
+            _SESSIONS.set(call_id, session)
+    return session
+
+
+def drop_session(call_id: int) -> None:
+    """
+    Forget the session of a call that has ended.
+    """
+    _SESSIONS.delete(call_id)
+    cache.delete(SESSION_KEY.format(call_id))
+
+
+def sources_for(target: int) -> list[int]:
+    """
+    The statuses a call may be in to move to `target`.
+    """
+    return [int(source) for source, targets in ALLOWED_TRANSITIONS.items() if target in targets]
+
+
+def call_payload(state: CallState) -> dict:
+    """
+    The event both participants receive about a call state.
+    """
+    return {
+        "call_id": state.call_id,
+        "caller_id": state.caller_id,
+        "receiver_id": state.receiver_id,
+        "status": VideoCallStatus(state.status).label,
+        "date_started": state.date_started.isoformat(),
+        "date_ended": state.date_ended.isoformat(),
+        "duration_seconds": state.duration_seconds,
+    }
+
+
+async def asend_call_state(state: CallState) -> None:
+    """
+    Send a call state straight to both participants' call groups, falling
+    back to the Celery task if the channel layer send fails.
+    """
+    payload = call_payload(state)
+    try:
+        with METRICS.timer("chat.calls.notify_seconds"):
+            await send_call_event(get_channel_layer(), state.caller_id, state.receiver_id, payload)
+    except Exception as exc:
+        LOGGER.warning(f"Direct signaling for call {state.call_id} failed, queueing it: {exc}")
+        METRICS.increment("chat.calls.notify_fallbacks")
+        notify_video_call_users.delay(**payload)
+
+
+def notify_call_state(state: CallState) -> None:
+    """
+    Tell both participants about the call's new state, from sync code that
+    is not running on the database thread of an async caller.
+    """
+    async_to_sync(asend_call_state)(state)
+
+
+def _on_committed(state: CallState) -> None:
+    if state.status in TERMINAL_STATUSES:
+        drop_session(state.call_id)
+        call_registry.release(state.call_id, state.caller_id, state.receiver_id)
+    else:
+        save_session(state)
+        if state.status != VideoCallStatus.CONTACTING:
+            call_registry.answered(state.call_id)
+
+
+def _on_started(state: CallState) -> CallState:
+    if state.status == VideoCallStatus.CONTACTING and not call_registry.claim(
+        state.call_id, state.caller_id, state.receiver_id
+    ):
+        # Another call claimed one of the users since the availability check.
+        return transition(state.call_id, VideoCallStatus.BUSY)
+    _on_committed(state)
+    return state
+
+
+def start_call(caller_id: int, receiver_id: int) -> CallState:
+    """
+    Ring the receiver, or record the call as busy or not available straight
+    away when the active-call registry says they cannot take it.
+
+    Once committed, a ringing call is claimed for both users in the registry
+    (ending as busy if either was claimed by another call first) and its
+    session is opened. Returns the state to announce to both users.
+    """
+    status = call_registry.availability(receiver_id)
+    started = []
+    with transaction.atomic():
+        call = VideoCall.objects.create(caller_id=caller_id, receiver_id=receiver_id, status=status)
+        state = CallState(
+            call_id=call.pk,
+            caller_id=caller_id,
+            receiver_id=receiver_id,
+            status=call.status,
+            date_started=call.date_started,
+            date_ended=call.date_ended,
+        )
+        transaction.on_commit(lambda: started.append(_on_started(state)))
+
+    METRICS.increment("chat.calls.started")
+    if status != VideoCallStatus.CONTACTING:
+        METRICS.increment(f"chat.calls.{status.name.lower()}_on_start")
+    LOGGER.info(f"New call {call.pk} initiated between {caller_id} and {receiver_id} ({status.label}).")
+    # Empty only inside an outer transaction, which has not committed yet.
+    return started[0] if started else state
+
+
+def transition(call_id: int, target: int) -> CallState:
+    """
+    Move a call to `target` if its current status allows it.
+
+    Accepting a call stamps `date_started`; reaching a final status stamps
+    `date_ended`, closes the call's session and frees both users in the
+    active-call registry once committed. Returns the new state, which the
+    caller announces. Raises `InvalidTransition` if the call does not exist
+    or is in a status `target` cannot follow.
+    """
+    target = VideoCallStatus(target)
+    now = timezone.now()
+    params = {
+        "call_id": call_id,
+        "target": int(target),
+        "sources": sources_for(target),
+        "date_started": now if target == VideoCallStatus.ACCEPTED else None,
+        "date_ended": now if target in TERMINAL_STATUSES else None,
+    }
+
+    with METRICS.timer("chat.calls.transition_seconds"), transaction.atomic():
+        with connection.cursor() as db:
+            db.execute(TRANSITION_SQL.format(table=VideoCall._meta.db_table), params)
+            row = db.fetchone()
+        if row is None:
+            METRICS.increment("chat.calls.invalid_transitions")
+            raise InvalidTransition(call_id, target)
+
+        caller_id, receiver_id, date_started, date_ended, date_created = row
+        state = CallState(
+            call_id=call_id,
+            caller_id=caller_id,
+            receiver_id=receiver_id,
+            status=int(target),
+            date_started=date_started,
+            date_ended=date_ended,
+        )
+        transaction.on_commit(lambda: _on_committed(state))
+
+    METRICS.observe(f"chat.calls.seconds_to_{target.name.lower()}", (now - date_created).total_seconds())
+    LOGGER.info(f"Call {call_id} moved to {target.label}.")
+    return state
@@ -1,13 +1,9 @@
 """Chat Symbolic Constants."""
 
-from datetime import timedelta
-
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from django.utils import timezone
 
 
-ETA_TIME = timezone.now() + timedelta(minutes=1)
 class VideoCallStatus(models.IntegerChoices):
     CONTACTING = 0, 'Contacting'
     NOT_AVAILABLE = 1, 'Not Available'
@@ -1,16 +1,34 @@
-import json
 import logging
 from asgiref.sync import sync_to_async
 
-from channels.auth import login, logout
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from rest_framework.renderers import JSONRenderer
-
-from src.chat.utils import save_message, new_message_query, clear_history_query, chat_room_icon_query, get_chat_room
-from src.chat.models import Message
+from django.conf import settings
+from django.db import IntegrityError
+
+from src.accounts import identity, presence
+from src.chat import call_registry
+from src.chat.buffers import MESSAGE_BUFFER, PendingMessage
+from src.chat.calls import InvalidTransition, aget_session, asend_call_state, start_call, transition
+from src.chat.constants.symbolic_constants import VideoCallStatus
+from src.chat.contacts import user_connected, user_disconnected
+from src.chat.history import page_size, room_history
+from src.chat.membership import aget_room_members
+from src.chat.models import ChatRoom, UnreadCounter
+from src.chat.notifications import (
+    NOTIFICATIONS, SIGNAL_HANDLER, call_group, dialog_group, room_group, user_group,
+)
+from src.chat.serializers import MessageSerializer
+from src.chat.uploads import UploadError, cancel_upload, complete_upload, start_upload, write_chunk
+from src.chat.utils import new_message_query, clear_history_query, chat_room_icon_query
+from src.common.encoding import dumps, frame_event, loads, stream_frame
+from src.common.metrics import METRICS
+from src.common.pagination import InvalidCursor
 
 LOGGER = logging.getLogger(__name__)
 
+DEFAULT_MAX_STREAMS = 100
+
 class ChatConsumer(AsyncWebsocketConsumer):
     """
     Chapiana Consumer.
@@ -28,9 +46,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
         user = self.scope["user"]
 
         if user.is_authenticated:
-            # Connect only if the user is authenticated
+            # Connect only if the user is authenticated; pinned so messages
+            # need no sender lookup
+            self.user = user
             self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
-            self.room_group_name = f"chat_{self.room_name}"
+            if await self.member_room() is None:
+                # Like room streams, only members may read a room.
+                await self.close()
+                return
+            self.room_group_name = room_group(self.room_name)
             LOGGER.info(self.room_name, self.room_group_name)
 
             # Join room group
@@ -47,151 +71,798 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         Disconnect from channel.
     
-        Leave room group.
+        Leave room group and write any buffered messages.
         """
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if hasattr(self, "room_group_name"):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+        await MESSAGE_BUFFER.try_flush()
 
-    async def new_message(self, data=None):
+    async def receive(self, text_data=None, bytes_data=None):
         """
-        Receive message from WebSocket.
+        Dispatch a client command to its handler. Binary frames are upload
+        chunks.
         """
-        await self.chat_notification(data)
-        data_json = json.loads(data)
-        chat_room = data_json["chat_room"]
-        sender = data_json["sender"]
-        recipient = data_json["recipient"]
-        file = data_json["file"]
-        message = data_json["message_content"]
-
-        new_message =  await new_message_query(sender, chat_room, message, file)
-        # Remove Byte String
-        result = eval(new_message)
+        await presence.atouch(self.scope["user"].id)
+        if bytes_data is not None:
+            await self.upload_chunk(bytes_data)
+            return
+
+        data = loads(text_data)
+        handler = self.commands.get(data.get("command"))
+        if handler is None:
+            LOGGER.warning(f"Unknown chat command: {data.get('command')}")
+            return
+        await handler(self, data)
 
-        if file:
-            context = {"command": "file", "result": result}
-        else:
-            context = {"command": "new_message", "result": result}
+    async def new_message(self, data=None):
+        """
+        Receive message from WebSocket.
 
-        # Save message to DB
-        await save_message(chat_room, sender, recipient, message)
+        Text messages are broadcast first and persisted write-behind by the
+        message buffer; messages with a completed upload (`upload_id`) are
+        written inline with the stored file attached. The message always
+        goes to this socket's (or stream's) room, never one named in `data`.
+        """
+        members = await self.require_member_room()
+        if members is None:
+            return
+
+        chat_room = self.room_name
+        sender = self.user.username
+        recipient = sender
+        upload_id = data.get("upload_id")
+        message = data.get("message_content")
+
+        if upload_id:
+            try:
+                file = await database_sync_to_async(complete_upload)(self.scope["user"].id, upload_id)
+            except UploadError as exc:
+                await self.send_upload_error(exc)
+                return
+
+            await self.chat_notification(data, members)
+            new_message = await new_message_query(self.user, chat_room, message, file)
+            context = {"command": "file", "result": {
+                "__str__": sender,
+                "file": new_message.file.file.url if new_message.file else None,
+                "created_at": new_message.created_at.isoformat(),
+            }}
+            await self.send_to_chat_message(context)
+            return
+
+        await self.chat_notification(data, members)
+        pending = PendingMessage(
+            sender=sender,
+            recipient=recipient,
+            chat_room=chat_room,
+            message_content=message,
+        )
+        context = {"command": "new_message", "result": {
+            "__str__": sender,
+            "content": message,
+            "created_at": pending.created_at.isoformat(),
+        }}
 
-        # Send message to room group
+        # Send message to room group, then queue it for the database
         await self.send_to_chat_message(context)
+        await MESSAGE_BUFFER.add(pending)
 
     async def change_icon(self, data):
-        username = data.get("username", None)
-        room_name = data.get("roomName", None)
-        file_data = data.get("file", None)
-        change_room_icon = await chat_room_icon_query(room_name, file_data)
-        room_icon_json = await self.room_icon_serializer(change_room_icon)
-        result = eval(room_icon_json)
+        """
+        Set the room icon to a completed upload (`upload_id`).
+        """
+        if await self.require_member_room() is None:
+            return
+        try:
+            file = await database_sync_to_async(complete_upload)(self.scope["user"].id, data.get("upload_id"))
+        except UploadError as exc:
+            await self.send_upload_error(exc)
+            return
+        chat_room = await chat_room_icon_query(self.room_name, file)
 
         context = {
             "command": "change_icon",
-            "result": result
+            "result": {
+                "room_image": chat_room.room_file.file.url if chat_room.room_file_id else None,
+            }
         }
 
         await self.send_to_chat_message(context)
-        await self.channel_layer.group_send(self.room_group_name, {
-            "type": "chat_message",
+        await self.channel_layer.group_send(self.room_group_name, frame_event({
             "command": "info",
             "content": {
                 "type": "changeIcon",
-                "message": f"{username} changed the room icon."
+                "message": f"{self.user.username} changed the room icon."
             }
-        })
+        }, group=self.room_group_name))
+
+    async def upload_start(self, data):
+        """
+        Start or resume a chunked upload and reply with the offset to send from.
+        """
+        def start():
+            state = start_upload(
+                self.scope["user"].id,
+                data.get("name"),
+                data.get("size"),
+                data.get("sha256"),
+                data.get("upload_id"),
+            )
+            return state.upload_id, state.offset
+
+        try:
+            upload_id, offset = await sync_to_async(start, thread_sensitive=False)()
+        except UploadError as exc:
+            await self.send_upload_error(exc)
+            return
+        await self.send(text_data=dumps({
+            "command": "upload_ready",
+            "upload_id": upload_id,
+            "offset": offset,
+        }))
+
+    async def upload_chunk(self, frame):
+        """
+        Append one binary chunk to its upload and acknowledge the new offset.
+        """
+        def write():
+            state = write_chunk(self.scope["user"].id, frame)
+            return state.upload_id, state.offset
+
+        try:
+            upload_id, offset = await sync_to_async(write, thread_sensitive=False)()
+        except UploadError as exc:
+            await self.send_upload_error(exc)
+            return
+        await self.send(text_data=dumps({"command": "upload_ack", "upload_id": upload_id, "offset": offset}))
+
+    async def upload_cancel(self, data):
+        """
+        Abandon an upload and drop its received bytes.
+        """
+        try:
+            await sync_to_async(cancel_upload, thread_sensitive=False)(self.scope["user"].id, data.get("upload_id"))
+        except UploadError as exc:
+            await self.send_upload_error(exc)
+
+    async def send_upload_error(self, exc):
+        """
+        Report a rejected upload request or chunk to this socket.
+        """
+        await self.send(text_data=dumps({
+            "command": "upload_error",
+            "upload_id": exc.upload_id,
+            "offset": exc.offset,
+            "message": str(exc),
+        }))
 
     async def clear_history(self, data):
-        room_name = data.get("roomName", None)
-        clear_history = await clear_history_query(room_name)
+        """
+        Hide the room's history at once; rows are deleted in the background.
+        """
+        if await self.require_member_room() is None:
+            return
+        cleared_before = await clear_history_query(self.room_name)
 
-        if clear_history:
-            await self.channel_layer.group_send(self.room_group_name, {
-                "type": "chat_message",
+        if cleared_before:
+            await self.channel_layer.group_send(self.room_group_name, frame_event({
                 "command": "clear_history",
-            })
+                "cleared_before": cleared_before,
+            }, group=self.room_group_name))
 
-    async def message_serializer(self, query):
-        serialized_message = MessageSerializer(query)
-        message_json = JSONRenderer().render(serialized_message.data)
-        return message_json
-    
-    async def room_icon_serializer(self, query):
-        serialize_icon = ChatRoomSerializer(query)
-        icon_json = JSONRenderer().render(serialize_icon.data)
-        return icon_json
-
-    async def chat_notification(self, data):
-        room_name = data["roomName"]
-        username = data["username"]
+    async def fetch_history(self, data):
+        """
+        Send one page of room history, older than `cursor`, to this socket.
+        Archived messages are included when `archived` is true.
+        """
+        members = await self.require_member_room()
+        if members is None:
+            return
+
+        def read_page():
+            page = room_history(
+                members.room_id,
+                data.get("cursor"),
+                page_size(data.get("page_size")),
+                members.cleared_before,
+                include_archived=bool(data.get("archived")),
+            )
+            return {
+                "command": "history",
+                "results": MessageSerializer(page.messages, many=True).data,
+                "next_cursor": page.next_cursor,
+            }
+
+        try:
+            frame = await database_sync_to_async(read_page)()
+        except InvalidCursor:
+            frame = {"command": "error", "message": "Invalid cursor"}
+        await self.send(text_data=dumps(frame))
+
+    async def member_room(self):
+        """
+        The membership snapshot of this socket's room, or None if the user
+        is not a member.
+        """
+        try:
+            members = await aget_room_members(self.room_name)
+        except ChatRoom.DoesNotExist:
+            return None
+        return members if members.is_member(self.user.id) else None
+
+    async def require_member_room(self):
+        """
+        Like `member_room`, but tell the client when the user is not a
+        member.
+        """
+        members = await self.member_room()
+        if members is None:
+            await self.send(text_data=dumps({"command": "error", "message": "Not a member of this room"}))
+        return members
+
+    async def mark_read(self, data):
+        """
+        Mark the room, or the dialog with `user`, read for this user.
+        """
+        user_id = self.scope["user"].id
+        peer = data.get("user")
+        members = None if peer else await aget_room_members(self.room_name)
+
+        def mark():
+            if peer:
+                peer_id = identity.get_user_ids([peer]).get(peer)
+                return UnreadCounter.mark_read(user_id, sender=peer_id) if peer_id else 0
+            return UnreadCounter.mark_read(user_id, chat_room=members.room_id)
+
+        updated = await database_sync_to_async(mark)()
+        await self.send(text_data=dumps({"command": "read", "updated": updated}))
+
+    async def chat_notification(self, data, members):
+        """
+        Notify the other `members` of this socket's room through their user
+        groups.
+        """
         message = data.get("message", None)
         file = data.get("file", None)
-        chat_room = await get_chat_room(room_name)
-
-        members_list = []
-        for _ in chat_room.members.all():
-            members_list.append(_.username)
 
         result = {
-            "type": "chat_message",
+            "command": "notification",
             "content": message,
-            "__str__": username,
-            "room_name": room_name,
-            "members_list": members_list,
+            "__str__": self.user.username,
+            "room_name": self.room_name,
         }
 
         if file:
             result["content"] = "file"
 
-        await self.channel_layer.group_send("chat_listener", result)
-
-    async def chat_message(self, event):
-        message = event["message_content"]
-        chat_room = event["chat_room"]
-        sender = event["sender"]
-        recipient = event["recipient"]
-        message = event["message_content"]
-
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            "message_content": message,
-            "sender": sender,
-            "receipient": recipient,
-            "chat_room": chat_room,
-        }))
+        sender_id = self.scope["user"].id
+        recipients = [user_id for user_id in members.member_ids if user_id != sender_id]
+        await NOTIFICATIONS.notify(self.channel_layer, self.room_name, recipients, result)
 
     async def send_to_chat_message(self, data):
+        """
+        Encode the outbound frame once and fan it out to the room group.
+        """
         command = data.get('command')
         if command == 'file' or command == 'new_message':
-            await self.channel_layer.group_send(self.room_group_name, {
-                "type": "chat_message",
-                "content": (
-                    lambda content: data['result']['file'] if (command == 'file') else data['result']['content'])(
-                    command),
+            await self.channel_layer.group_send(self.room_group_name, frame_event({
+                "content": data['result']['file'] if command == 'file' else data['result']['content'],
                 "__str__": data['result']['__str__'],
                 "created_at": data['result']['created_at'],
                 'command': command,
-            })
+            }, group=self.room_group_name))
 
         elif command == 'change_icon':
-            await self.channel_layer.group_send(self.room_group_name, {
-                'type': 'chat_message',
+            await self.channel_layer.group_send(self.room_group_name, frame_event({
                 'content': data['result']['room_image'],
                 'command': command,
-            })
+            }, group=self.room_group_name))
+
+    async def chat_frame(self, event):
+        """
+        Forward a frame that the sender already encoded.
+        """
+        await self.send(text_data=event.get("text"), bytes_data=event.get("bytes"))
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event))
+        """
+        Forward a raw event, for senders that do not pre-encode frames.
+        """
+        await self.send(text_data=dumps(event))
 
     commands = {
         'new_message': new_message,
         'change_icon': change_icon,
         'clear_history': clear_history,
+        'fetch_history': fetch_history,
+        'mark_read': mark_read,
+        'upload_start': upload_start,
+        'upload_cancel': upload_cancel,
+    }
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Chapiana Notification Consumer.
+
+    Each client keeps one notification socket, subscribed to its own
+    `user_<id>` group, and receives only the notifications addressed to it.
+    The socket's lifetime also marks the user online and offline in the
+    presence service, announced to their contacts with a debounce; client
+    heartbeats and chat and call traffic keep them online.
+    """
+    async def connect(self):
+        """
+        Join the user's notification group.
+        """
+        user = self.scope["user"]
+
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_id = user.id
+        self.user_group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        await self.accept()
+        await user_connected(self.channel_layer, user.id)
+
+    async def disconnect(self, close_code):
+        """
+        Leave the user's notification group and count the closed connection.
+        """
+        if hasattr(self, "user_group_name"):
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+            await user_disconnected(self.channel_layer, self.user_id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Any frame from the client is a presence heartbeat.
+        """
+        await presence.atouch(self.user_id)
+
+    async def user_notification(self, event):
+        """
+        Forward a pre-encoded notification frame.
+        """
+        await self.send(text_data=event["text"])
+
+
+class CallConsumer(AsyncWebsocketConsumer):
+    """
+    Chapiana Call Consumer.
+
+    WebRTC signaling between the two participants of a call. Each socket
+    joins its user's `user_<id>_calls` group, where call state events and
+    the peer's relayed offers, answers and ICE candidates arrive. Relayed
+    frames are checked against the cached call session and never stored;
+    only lifecycle commands write the call, through
+    `src.chat.calls.transition`.
+
+    Clients send a `ping` at least every `CHAT_CALL_HEARTBEAT_TTL` seconds,
+    which keeps the user reachable and their current call registered.
+    """
+    SIGNALS = frozenset({"offer", "answer", "ice"})
+    LIFECYCLE = {
+        "accept": VideoCallStatus.ACCEPTED,
+        "reject": VideoCallStatus.REJECTED,
+        "busy": VideoCallStatus.BUSY,
+        "connected": VideoCallStatus.PROCESSING,
+        "end": VideoCallStatus.ENDED,
+    }
+    # Answering a call is up to the receiver.
+    RECEIVER_ONLY = frozenset({"accept", "reject", "busy"})
+
+    async def connect(self):
+        """
+        Join the user's call group.
+        """
+        user = self.scope["user"]
+
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_id = user.id
+        self.call_group_name = call_group(user.id)
+        await self.channel_layer.group_add(self.call_group_name, self.channel_name)
+        await self.accept()
+        await self.ping()
+
+    async def disconnect(self, close_code):
+        """
+        Leave the user's call group.
+        """
+        if hasattr(self, "call_group_name"):
+            await self.channel_layer.group_discard(self.call_group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Dispatch a client command to its handler.
+        """
+        await presence.atouch(self.user_id)
+        data = loads(text_data)
+        handler = self.commands.get(data.get("command"))
+        if handler is None:
+            LOGGER.warning(f"Unknown call command: {data.get('command')}")
+            return
+        await handler(self, data)
+
+    async def start(self, data):
+        """
+        Ring `receiver_id`; both users learn the new call's id and state
+        through their call groups.
+        """
+        try:
+            receiver_id = int(data.get("receiver_id"))
+        except (TypeError, ValueError):
+            receiver_id = None
+        if receiver_id is None or receiver_id == self.user_id:
+            await self.send_call_error(None, "Invalid receiver.")
+            return
+
+        try:
+            state = await database_sync_to_async(start_call)(self.user_id, receiver_id)
+        except IntegrityError:
+            await self.send_call_error(None, "Invalid receiver.")
+            return
+        await asend_call_state(state)
+
+    async def ping(self, data=None):
+        """
+        Heartbeat: refresh the user's entries in the active-call registry.
+        """
+        await sync_to_async(call_registry.heartbeat, thread_sensitive=False)(self.user_id)
+
+    async def relay(self, data):
+        """
+        Forward an offer, answer or ICE candidate to the other participant.
+        """
+        call_id, session = await self.get_session(data)
+        peer_id = session.peer_of(self.user_id) if session else None
+        if peer_id is None:
+            await self.send_call_error(call_id, "Unknown call.")
+            return
+
+        await self.channel_layer.group_send(call_group(peer_id), frame_event({
+            "command": data["command"],
+            "call_id": call_id,
+            "sender_id": self.user_id,
+            "payload": data.get("payload"),
+        }, handler=SIGNAL_HANDLER))
+        METRICS.increment("chat.calls.signals_relayed")
+
+    async def move(self, data):
+        """
+        Apply a lifecycle command (accept, reject, busy, connected, end).
+        """
+        command = data["command"]
+        call_id, session = await self.get_session(data)
+        if session is None or session.peer_of(self.user_id) is None:
+            await self.send_call_error(call_id, "Unknown call.")
+            return
+        if command in self.RECEIVER_ONLY and self.user_id != session.receiver_id:
+            await self.send_call_error(call_id, "Only the receiver can answer a call.")
+            return
+
+        try:
+            state = await database_sync_to_async(transition)(call_id, self.LIFECYCLE[command])
+        except InvalidTransition as exc:
+            await self.send_call_error(call_id, str(exc))
+            return
+        await asend_call_state(state)
+
+    async def get_session(self, data):
+        """
+        The `call_id` of a command and its live session, if there is one.
+        """
+        try:
+            call_id = int(data.get("call_id"))
+        except (TypeError, ValueError):
+            return None, None
+        return call_id, await aget_session(call_id)
+
+    async def send_call_error(self, call_id, message):
+        """
+        Report a rejected call command to this socket.
+        """
+        await self.send(text_data=dumps({"command": "call_error", "call_id": call_id, "message": message}))
+
+    async def video_call_status(self, event):
+        """
+        Forward a pre-encoded call state frame.
+        """
+        await self.send(text_data=event["text"])
+
+    async def call_signal(self, event):
+        """
+        Forward a pre-encoded frame relayed by the other participant.
+        """
+        await self.send(text_data=event["text"])
+
+    commands = {
+        "call": start,
+        "ping": ping,
+        **dict.fromkeys(SIGNALS, relay),
+        **dict.fromkeys(LIFECYCLE, move),
     }
 
 
+class StreamConsumer(ChatConsumer, CallConsumer):
+    """
+    Chapiana Multiplexed Consumer.
+
+    One authenticated socket per client instead of one per room. The client
+    subscribes to streams and every frame is wrapped as
+    `{"stream": ..., "payload": ...}`:
+
+        notifications            the user's notifications, always on;
+        room:<room name>         a chat room the user is a member of;
+        conversation:<user id>   the direct conversation with a user;
+        calls                    call state and signaling.
+
+    Commands name their stream (`{"stream": "room:lobby", "command":
+    "new_message", ...}`) and are handled as on the per-room chat socket or
+    the call socket. Binary frames are upload chunks, as on the chat socket.
+    """
+    NOTIFICATIONS_STREAM = "notifications"
+    CALLS_STREAM = "calls"
+    UPLOADS_STREAM = "uploads"
+
+    async def connect(self):
+        """
+        Accept the socket and subscribe it to the user's notifications.
+        """
+        user = self.scope["user"]
+
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user = user
+        self.user_id = user.id
+        self.username = user.username
+        # group -> stream, and stream -> (group, stream name argument)
+        self.group_streams: dict[str, str] = {}
+        self.streams: dict[str, tuple[str, str]] = {}
+        self.reply_stream = None
+        self.max_streams = getattr(settings, "CHAT_STREAM_MAX_SUBSCRIPTIONS", DEFAULT_MAX_STREAMS)
+
+        await self.accept()
+        await self.join(self.NOTIFICATIONS_STREAM, user_group(user.id), "")
+        await user_connected(self.channel_layer, user.id)
+
+    async def disconnect(self, close_code):
+        """
+        Leave every subscribed group and write any buffered messages.
+        """
+        if not hasattr(self, "streams"):
+            return
+        for group, _ in self.streams.values():
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.streams.clear()
+        self.group_streams.clear()
+        await user_disconnected(self.channel_layer, self.user_id)
+        await MESSAGE_BUFFER.try_flush()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Handle a subscription change, or dispatch a command to the handler
+        of its stream.
+        """
+        await presence.atouch(self.user_id)
+        if bytes_data is not None:
+            self.reply_stream = self.UPLOADS_STREAM
+            await self.upload_chunk(bytes_data)
+            return
+
+        data = loads(text_data)
+        command = data.get("command")
+        stream = data.get("stream")
+        self.reply_stream = stream if stream in self.streams else None
+
+        if command == "subscribe":
+            await self.subscribe(stream)
+            return
+        if command == "unsubscribe":
+            await self.unsubscribe(stream)
+            return
+        if stream not in self.streams:
+            await self.send_stream_error(stream, "Not subscribed.")
+            return
+
+        kind = stream.partition(":")[0]
+        group, name = self.streams[stream]
+        if kind == "room":
+            self.room_name, self.room_group_name = name, group
+            handler = ChatConsumer.commands.get(command)
+        elif kind == "conversation":
+            handler = StreamConsumer.direct_message if command == "new_message" else None
+        elif kind == self.CALLS_STREAM:
+            handler = CallConsumer.commands.get(command)
+        else:
+            handler = None
+
+        if handler is None:
+            LOGGER.warning(f"Unknown {kind} command: {command}")
+            return
+        await handler(self, data)
+
+    async def subscribe(self, stream):
+        """
+        Join the group behind `stream` once the user is allowed to read it.
+        """
+        if not isinstance(stream, str):
+            await self.send_stream_error(stream, "Invalid stream.")
+            return
+        if stream in self.streams:
+            await self.send_stream_reply(stream, {"command": "subscribed", "stream": stream})
+            return
+        if len(self.streams) >= self.max_streams:
+            await self.send_stream_error(stream, "Too many subscriptions.")
+            return
+
+        resolved = await self.resolve_stream(stream)
+        if resolved is None:
+            return
+        group, name = resolved
+        if stream == self.CALLS_STREAM:
+            await self.ping()
+
+        await self.join(stream, group, name)
+        await self.send_stream_reply(stream, {"command": "subscribed", "stream": stream})
+
+    async def resolve_stream(self, stream):
+        """
+        The `(group, stream name argument)` behind `stream`, or None after
+        reporting why the user may not subscribe to it.
+        """
+        kind, _, name = stream.partition(":")
+        if kind == "room":
+            return await self.resolve_room_stream(stream, name)
+        if kind == "conversation":
+            return await self.resolve_conversation_stream(stream, name)
+        if stream == self.CALLS_STREAM:
+            return call_group(self.user_id), name
+        await self.send_stream_error(stream, "Invalid stream.")
+        return None
+
+    async def resolve_room_stream(self, stream, name):
+        """
+        The group of the room `name`, if the user is a member of it.
+        """
+        try:
+            members = await aget_room_members(name)
+        except ChatRoom.DoesNotExist:
+            members = None
+        if members is None or not members.is_member(self.user_id):
+            await self.send_stream_error(stream, "Not a member of this room.")
+            return None
+        return room_group(name), name
+
+    async def resolve_conversation_stream(self, stream, name):
+        """
+        The group of the conversation with the user whose id is `name`, and
+        that user's username.
+        """
+        peer_id = int(name) if name.isdigit() else None
+        user = None
+        if peer_id is not None and peer_id != self.user_id:
+            user = identity.get_local_user(peer_id) or await database_sync_to_async(identity.get_user)(peer_id)
+        if user is None:
+            await self.send_stream_error(stream, "Unknown user.")
+            return None
+        return dialog_group(self.user_id, peer_id), user.username
+
+    async def unsubscribe(self, stream):
+        """
+        Leave the group behind `stream`.
+        """
+        if stream == self.NOTIFICATIONS_STREAM or stream not in self.streams:
+            await self.send_stream_error(stream, "Not subscribed.")
+            return
+        group, _ = self.streams.pop(stream)
+        self.group_streams.pop(group, None)
+        await self.channel_layer.group_discard(group, self.channel_name)
+        await self.send_stream_reply(stream, {"command": "unsubscribed", "stream": stream})
+
+    async def join(self, stream, group, name):
+        """
+        Add this socket to `group` and remember it as `stream`.
+        """
+        await self.channel_layer.group_add(group, self.channel_name)
+        self.streams[stream] = (group, name)
+        self.group_streams[group] = stream
+
+    async def direct_message(self, data):
+        """
+        Send a direct message to the peer of a conversation stream.
+
+        Like room messages, it is broadcast first and persisted write-behind.
+        """
+        group, peer = self.streams[data["stream"]]
+        pending = PendingMessage(
+            sender=self.username,
+            recipient=peer,
+            message_content=data.get("message_content"),
+        )
+        await self.channel_layer.group_send(group, frame_event({
+            "command": "new_message",
+            "__str__": self.username,
+            "content": pending.message_content,
+            "created_at": pending.created_at.isoformat(),
+        }, group=group))
+        await MESSAGE_BUFFER.add(pending)
+
+        peer_id = int(data["stream"].partition(":")[2])
+        await NOTIFICATIONS.notify(self.channel_layer, group, [peer_id], {
+            "command": "notification",
+            "content": pending.message_content,
+            "__str__": self.username,
+        })
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        """
+        Tag direct replies with the stream of the command being handled.
+        """
+        if text_data is not None:
+            text_data = stream_frame(self.reply_stream or self.NOTIFICATIONS_STREAM, text_data)
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+    async def send_stream_reply(self, stream, payload):
+        """
+        Send a reply about `stream` to this socket.
+        """
+        await super().send(text_data=stream_frame(str(stream), dumps(payload)))
+
+    async def send_stream_error(self, stream, message):
+        """
+        Report a rejected subscription or command to this socket.
+        """
+        await self.send_stream_reply(stream, {"command": "error", "message": message})
+
+    async def forward(self, stream, text):
+        """
+        Forward a pre-encoded frame from a subscribed group, tagged with its
+        stream.
+        """
+        await super().send(text_data=stream_frame(stream, text))
+
+    async def chat_frame(self, event):
+        """
+        Forward a room or conversation frame.
+        """
+        stream = self.group_streams.get(event.get("group"))
+        if stream is None:
+            LOGGER.warning(f"Dropping a frame from unknown group {event.get('group')}")
+            return
+        await self.forward(stream, event["text"])
 
- 
+    async def chat_message(self, event):
+        """
+        Forward a raw event, for senders that do not pre-encode frames.
+        """
+        stream = self.group_streams.get(event.get("group"))
+        if stream is not None:
+            await self.forward(stream, dumps(event))
+
+    async def user_notification(self, event):
+        """
+        Forward a notification frame.
+        """
+        await self.forward(self.NOTIFICATIONS_STREAM, event["text"])
+
+    async def video_call_status(self, event):
+        """
+        Forward a call state frame.
+        """
+        await self.forward(self.CALLS_STREAM, event["text"])
+
+    async def call_signal(self, event):
+        """
+        Forward a frame relayed by the other call participant.
+        """
+        await self.forward(self.CALLS_STREAM, event["text"])
@@ -0,0 +1,136 @@
+"""
+Contact-scoped presence fan-out.
+
+A user's contacts are everyone they share a `Conversation` or a `ChatRoom`
+with. The set is cached per user in a short-lived process-local tier backed
+by Django's shared (Redis) cache, and dropped once a transaction that
+creates or deletes a conversation or changes room membership commits.
+
+Presence changes go only to the contacts that are online, through their
+`user_<id>` groups. Going offline is debounced: it is announced only if the
+user's last connection stays closed for `PRESENCE_DEBOUNCE_SECONDS`, so a
+reconnect storm or a reloaded tab produces no offline/online pair.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from src.accounts import presence
+from src.accounts.models import ChapianaUser
+from src.chat.models import Conversation
+from src.chat.notifications import send_to_users
+from src.common.cache import LocalCache
+from src.common.metrics import METRICS
+
+CACHE_KEY = "chat:contacts:{}"
+DEFAULT_LOCAL_TTL = 5
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+DEFAULT_DEBOUNCE_SECONDS = 5
+
+_LOCAL = LocalCache(
+    maxsize=4096,
+    ttl=getattr(settings, "CHAT_CONTACTS_LOCAL_TTL", DEFAULT_LOCAL_TTL),
+)
+# Pending offline checks, referenced until done so they are not collected.
+_SETTLING: set[asyncio.Task] = set()
+
+
+def _load_contacts(user_id: int) -> frozenset[int]:
+    pairs = list(Conversation.objects.filter(Q(low_user_id=user_id) | Q(high_user_id=user_id)).values_list(
+        "low_user_id", "high_user_id"
+    ))
+    room_mates = ChapianaUser.objects.filter(chat_rooms__members__pk=user_id).values_list("pk", flat=True)
+    contacts = {low for low, _ in pairs} | {high for _, high in pairs} | set(room_mates)
+    contacts.discard(user_id)
+    return frozenset(contacts)
+
+
+def get_contacts(user_id: int) -> frozenset[int]:
+    """
+    Ids of the users who share a conversation or a room with `user_id`.
+    """
+    contacts = _LOCAL.get(user_id)
+    if contacts is not None:
+        METRICS.increment("chat.contacts.local_hits")
+        return contacts
+
+    key = CACHE_KEY.format(user_id)
+    contacts = cache.get(key)
+    if contacts is None:
+        METRICS.increment("chat.contacts.misses")
+        contacts = _load_contacts(user_id)
+        cache.set(key, contacts, getattr(settings, "CHAT_CONTACTS_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT))
+
+    _LOCAL.set(user_id, contacts)
+    return contacts
+
+
+def _drop_contacts(user_ids: tuple[int, ...]) -> None:
+    _LOCAL.delete(*user_ids)
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+
+
+def invalidate_contacts(*user_ids: int) -> None:
+    """
+    Drop the cached contact sets of the given users from both tiers once
+    the current transaction commits, so a concurrent reader cannot cache
+    the contacts from before the change.
+    """
+    if not user_ids:
+        return
+    user_ids = tuple(user_ids)
+    transaction.on_commit(lambda: _drop_contacts(user_ids))
+
+
+async def publish_presence(channel_layer, user_id: int, is_online: bool) -> None:
+    """
+    Tell the user's online contacts that they came online or went offline.
+    """
+    def online_contacts():
+        contacts = get_contacts(user_id)
+        return [contact for contact, state in presence.get_presence(contacts).items() if state.is_online]
+
+    recipients = await database_sync_to_async(online_contacts)()
+    if not recipients:
+        return
+    await send_to_users(channel_layer, recipients, {
+        "command": "presence",
+        "user_id": user_id,
+        "is_online": is_online,
+        "was_online": timezone.now().isoformat(),
+    })
+    METRICS.increment("chat.contacts.presence_events")
+
+
+async def user_connected(channel_layer, user_id: int) -> None:
+    """
+    Record a new connection, announcing the user if they just came online.
+    """
+    if await sync_to_async(presence.connected, thread_sensitive=False)(user_id):
+        await publish_presence(channel_layer, user_id, True)
+
+
+async def user_disconnected(channel_layer, user_id: int) -> None:
+    """
+    Record a closed connection; if it was the last one, announce the user
+    offline unless they reconnect within the debounce interval.
+    """
+    if not await sync_to_async(presence.disconnected, thread_sensitive=False)(user_id):
+        return
+    task = asyncio.get_running_loop().create_task(_settle_later(channel_layer, user_id))
+    _SETTLING.add(task)
+    task.add_done_callback(_SETTLING.discard)
+
+
+async def _settle_later(channel_layer, user_id: int) -> None:
+    await asyncio.sleep(getattr(settings, "PRESENCE_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS))
+    if await sync_to_async(presence.settle, thread_sensitive=False)(user_id):
+        await publish_presence(channel_layer, user_id, False)
+    else:
+        METRICS.increment("chat.contacts.debounced")
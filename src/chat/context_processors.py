@@ -1,8 +1,13 @@
-"""
-Context processor for adding public chat rooms to base template.
-"""
-from src.chat.models import ChatRoom
-
-def public_chat_rooms(request):
-    chat_rooms = ChatRoom.objects.all()
-    return {"chat_rooms": chat_rooms}
+"""Chapiana chat template context processors."""
+from django.utils.functional import SimpleLazyObject
+
+from src.chat.lobby import get_lobby
+
+
+def lobby(request):
+    """
+    Expose the cached lobby listing as `lobby`.
+
+    The listing is only fetched by templates that actually use it.
+    """
+    return {"lobby": SimpleLazyObject(get_lobby)}
@@ -0,0 +1,169 @@
+"""
+Country lookups for chat categories.
+
+`country_index()` builds, once per process and only when first needed, an
+immutable index over `pycountry`:
+
+    - exact alpha-2 / alpha-3 codes and names,
+    - names normalized for case, accents and punctuation,
+    - a prefix trie over every word of every name, for partial input such
+      as "korea" or "united"
+
+so a lookup is a few dict probes instead of a scan of every country.
+Flags are built from regional indicator symbols and cached per code.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from types import MappingProxyType
+
+REGIONAL_INDICATOR_A = 0x1F1E6
+NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+# Trie node key holding the best country code for the prefix.
+MATCH = ""
+
+
+@dataclass(frozen=True)
+class Country:
+    """
+    A country as shown in categories.
+    """
+    alpha_2: str
+    name: str
+
+    @property
+    def flag(self) -> str:
+        """
+        The flag emoji of the country.
+        """
+        return flag_emoji(self.alpha_2)
+
+
+def normalize(value: str) -> str:
+    """
+    Lowercase, strip accents and collapse punctuation to single spaces.
+    """
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return NON_ALPHANUMERIC.sub(" ", value.casefold()).strip()
+
+
+@lru_cache(maxsize=None)
+def flag_emoji(alpha_2: str) -> str:
+    """
+    The flag emoji of an ISO alpha-2 code, or "" for anything else.
+    """
+    if len(alpha_2) != 2 or not alpha_2.isascii() or not alpha_2.isalpha():
+        return ""
+    return "".join(chr(REGIONAL_INDICATOR_A + ord(letter) - ord("A")) for letter in alpha_2.upper())
+
+
+def _freeze(node: dict) -> MappingProxyType:
+    return MappingProxyType({
+        key: value if key == MATCH else _freeze(value) for key, value in node.items()
+    })
+
+
+class CountryIndex:
+    """
+    Immutable lookup tables over a list of countries.
+    """
+    def __init__(self, entries):
+        """
+        Build the index from `(alpha_2, alpha_3, name, *other_names)` tuples.
+        """
+        by_key = {}
+        by_normalized = {}
+        trie = {}
+        countries = []
+
+        for alpha_2, alpha_3, name, *other_names in entries:
+            country = Country(alpha_2=alpha_2, name=name)
+            countries.append(country)
+            by_key[alpha_2.upper()] = country
+            by_key[alpha_3.upper()] = country
+            for label in (name, *other_names):
+                by_key.setdefault(label, country)
+                normalized = normalize(label)
+                by_normalized.setdefault(normalized, country)
+                self._insert(trie, normalized, country)
+
+        self.countries = tuple(sorted(countries, key=lambda country: country.name))
+        self._by_key = MappingProxyType(by_key)
+        self._by_normalized = MappingProxyType(by_normalized)
+        self._trie = _freeze(trie)
+
+    @staticmethod
+    def _insert(trie: dict, normalized: str, country: Country) -> None:
+        # Index every word start, so "korea" finds "Korea, Republic of" and
+        # "republic" finds it too. The shortest name wins a shared prefix.
+        words = normalized.split(" ")
+        for start in range(len(words)):
+            node = trie
+            for char in " ".join(words[start:]):
+                node = node.setdefault(char, {})
+                best = node.get(MATCH)
+                if best is None or (len(country.name), country.name) < (len(best.name), best.name):
+                    node[MATCH] = country
+
+    def lookup(self, value: str | None) -> Country | None:
+        """
+        The country matching a code or a (partial) name, or None.
+        """
+        if not value:
+            return None
+
+        country = self._by_key.get(value) or self._by_key.get(value.upper())
+        if country is not None:
+            return country
+
+        normalized = normalize(value)
+        country = self._by_normalized.get(normalized)
+        if country is not None or not normalized:
+            return country
+
+        node = self._trie
+        for char in normalized:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node[MATCH]
+
+    def choices(self) -> list[tuple[str, str]]:
+        """
+        `(alpha_2, name)` pairs sorted by name.
+        """
+        return [(country.alpha_2, country.name) for country in self.countries]
+
+
+@cache
+def country_index() -> CountryIndex:
+    """
+    The process-wide country index, built on first use.
+    """
+    import pycountry
+
+    return CountryIndex(
+        (
+            country.alpha_2,
+            country.alpha_3,
+            country.name,
+            *(getattr(country, attribute) for attribute in ("common_name", "official_name") if hasattr(country, attribute)),
+        )
+        for country in pycountry.countries
+    )
+
+
+def country_name_choices() -> list[tuple[str, str]]:
+    """
+    Choices for a country field, usable as a lazy `choices` callable.
+    """
+    return country_index().choices()
+
+
+def get_country_code_by_name(country_name: str | None) -> str | None:
+    """
+    The ISO alpha-2 code of a country code or (partial) name.
+    """
+    country = country_index().lookup(country_name)
+    return country.alpha_2 if country else None
@@ -0,0 +1,129 @@
+"""
+Message history reads.
+
+History is paged newest-first by `(created_at, id)` with keyset cursors,
+served by the `(chat_room, created_at, id)` and
+`(sender, recipient, created_at, id)` indexes on `Message`, so every page
+costs O(page size) no matter how deep the client scrolls. Reads stay on the
+hot message partitions unless the caller asks for archived history.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+from src.chat.models import ArchivedMessage, Message
+from src.common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+
+
+@dataclass(frozen=True)
+class HistoryPage:
+    """
+    One page of messages, newest first, and the cursor of the next page.
+    """
+    messages: list[Message | ArchivedMessage]
+    next_cursor: str | None
+
+
+def page_size(requested: int | str | None = None) -> int:
+    """
+    The requested page size, capped at `MESSAGES_PAGINATION`.
+    """
+    limit = getattr(settings, "MESSAGES_PAGINATION", DEFAULT_PAGE_SIZE)
+    try:
+        return max(1, min(int(requested), limit))
+    except (TypeError, ValueError):
+        return min(DEFAULT_PAGE_SIZE, limit)
+
+
+def _parse_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, pk = decode_cursor(cursor, 2)
+    created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+    if created_at is None or not isinstance(pk, int):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return created_at, pk
+
+
+def _before(queryset: QuerySet, cursor: str | None) -> QuerySet:
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = _parse_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return queryset
+
+
+def _page(messages: list[Message], size: int) -> HistoryPage:
+    if len(messages) <= size:
+        return HistoryPage(messages=messages, next_cursor=None)
+
+    messages = messages[:size]
+    last = messages[-1]
+    return HistoryPage(messages=messages, next_cursor=encode_cursor(last.created_at, last.pk))
+
+
+def _read(read, size: int, include_archived: bool) -> list:
+    # Archived partitions only hold rows older than every hot partition, so
+    # the archive continues a short hot page under the same cursor.
+    messages = read(Message, size + 1)
+    if include_archived and len(messages) <= size:
+        messages += read(ArchivedMessage, size + 1 - len(messages))
+    return messages
+
+
+def room_history(
+    room_id: int,
+    cursor: str | None = None,
+    size: int | None = None,
+    cleared_before: datetime | None = None,
+    include_archived: bool = False,
+) -> HistoryPage:
+    """
+    A page of a chat room's messages older than `cursor`, hiding everything
+    up to the room's `cleared_before` watermark. With `include_archived` the
+    page continues into archived partitions once the hot table runs out.
+    """
+    size = size or page_size()
+
+    def read(model, limit):
+        queryset = model.objects.filter(chat_room_id=room_id)
+        if cleared_before is not None:
+            queryset = queryset.filter(created_at__gt=cleared_before)
+        return list(_before(queryset, cursor).select_related("sender", "recipient", "file")[:limit])
+
+    return _page(_read(read, size, include_archived), size)
+
+
+def dialog_history(
+    user_id: int,
+    peer_id: int,
+    cursor: str | None = None,
+    size: int | None = None,
+    include_archived: bool = False,
+) -> HistoryPage:
+    """
+    A page of the direct messages between two users older than `cursor`.
+
+    Each direction is read with its own index range scan and the two sorted
+    runs are merged, instead of an OR that would sort the whole dialog.
+    """
+    size = size or page_size()
+
+    def read(model, limit):
+        directions = [
+            _before(
+                model.objects.filter(chat_room__isnull=True, sender_id=sender_id, recipient_id=recipient_id),
+                cursor,
+            ).select_related("sender", "recipient", "file")[:limit]
+            for sender_id, recipient_id in {(user_id, peer_id), (peer_id, user_id)}
+        ]
+        merged = heapq.merge(*directions, key=lambda message: (message.created_at, message.pk), reverse=True)
+        return list(merged)[:limit]
+
+    return _page(_read(read, size, include_archived), size)
@@ -0,0 +1,177 @@
+"""
+The inbox: every direct conversation of a user in one SQL round-trip.
+
+For each conversation the query returns the peer's basic profile, the last
+message preview and the unread count, ordered by last activity and paged
+with a `(last_activity, conversation id)` keyset cursor.
+
+The last message is picked with two `LATERAL ... LIMIT 1` probes, one per
+direction, instead of `DISTINCT ON` over every message of the user: each
+probe is a single descent of the `(sender, recipient, created_at, id)`
+index, so the cost grows with the number of conversations, not messages.
+
+Peer presence is then read for the whole page from Redis in one pipelined
+round-trip.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from src.accounts.models import ChapianaUser, Profile
+from src.accounts.presence import get_presence
+from src.chat.models import Conversation, Message, UnreadCounter
+from src.common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 20
+PREVIEW_LENGTH = 120
+
+INBOX_SQL = """
+WITH conversations AS (
+    SELECT c.id,
+           c.created,
+           c.high_user_id AS peer_id
+      FROM {conversation} c
+     WHERE c.low_user_id = %(user_id)s
+     UNION ALL
+    SELECT c.id,
+           c.created,
+           c.low_user_id AS peer_id
+      FROM {conversation} c
+     WHERE c.high_user_id = %(user_id)s
+),
+inbox AS (
+    SELECT cv.id AS conversation_id,
+           cv.peer_id,
+           lm.id AS message_id,
+           lm.sender_id AS message_sender_id,
+           LEFT(lm.message_content, {preview_length}) AS message_preview,
+           lm.file_id IS NOT NULL AS message_has_file,
+           lm.created_at AS message_created_at,
+           COALESCE(lm.created_at, cv.created) AS last_activity
+      FROM conversations cv
+      LEFT JOIN LATERAL (
+          SELECT m.* FROM (
+              (SELECT id, sender_id, message_content, file_id, created_at
+                 FROM {message}
+                WHERE sender_id = %(user_id)s AND recipient_id = cv.peer_id AND chat_room_id IS NULL
+                ORDER BY created_at DESC, id DESC LIMIT 1)
+              UNION ALL
+              (SELECT id, sender_id, message_content, file_id, created_at
+                 FROM {message}
+                WHERE sender_id = cv.peer_id AND recipient_id = %(user_id)s AND chat_room_id IS NULL
+                ORDER BY created_at DESC, id DESC LIMIT 1)
+          ) m
+          ORDER BY m.created_at DESC, m.id DESC
+          LIMIT 1
+      ) lm ON TRUE
+)
+SELECT inbox.*,
+       u.username AS peer_username,
+       u.first_name AS peer_first_name,
+       u.last_name AS peer_last_name,
+       u.is_online AS peer_is_online,
+       u.was_online AS peer_was_online,
+       p.image AS peer_image,
+       p.image_variants AS peer_image_variants,
+       COALESCE(uc.count, 0) AS unread_count
+  FROM inbox
+  JOIN {user} u ON u.id = inbox.peer_id
+  LEFT JOIN {profile} p ON p.user_id = inbox.peer_id
+  LEFT JOIN {unread} uc
+    ON uc.recipient_id = %(user_id)s AND uc.sender_id = inbox.peer_id AND uc.chat_room_id IS NULL
+ WHERE %(cursor_activity)s::timestamptz IS NULL
+    OR (inbox.last_activity, inbox.conversation_id) < (%(cursor_activity)s::timestamptz, %(cursor_id)s::bigint)
+ ORDER BY inbox.last_activity DESC, inbox.conversation_id DESC
+ LIMIT %(limit)s
+"""
+
+
+@dataclass(frozen=True)
+class InboxPage:
+    """
+    One page of inbox entries, most recent activity first.
+    """
+    entries: list[dict]
+    next_cursor: str | None
+
+
+def _inbox_sql() -> str:
+    return INBOX_SQL.format(
+        conversation=Conversation._meta.db_table,
+        message=Message._meta.db_table,
+        user=ChapianaUser._meta.db_table,
+        profile=Profile._meta.db_table,
+        unread=UnreadCounter._meta.db_table,
+        preview_length=PREVIEW_LENGTH,
+    )
+
+
+def _parse_cursor(cursor: str) -> tuple[datetime, int]:
+    last_activity, conversation_id = decode_cursor(cursor, 2)
+    last_activity = parse_datetime(last_activity) if isinstance(last_activity, str) else None
+    if last_activity is None or not isinstance(conversation_id, int):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return last_activity, conversation_id
+
+
+def _entry(row: dict) -> dict:
+    # A raw cursor leaves JSON columns undecoded; the field knows how.
+    variants = Profile._meta.get_field("image_variants").from_db_value(row["peer_image_variants"], None, connection)
+    return {
+        "conversation_id": row["conversation_id"],
+        "last_activity": row["last_activity"],
+        "unread_count": row["unread_count"],
+        "peer": {
+            "id": row["peer_id"],
+            "username": row["peer_username"],
+            "first_name": row["peer_first_name"],
+            "last_name": row["peer_last_name"],
+            "is_online": row["peer_is_online"],
+            "was_online": row["peer_was_online"],
+            "image": default_storage.url(row["peer_image"]) if row["peer_image"] else None,
+            "avatars": Profile.variant_urls_for(variants),
+        },
+        "last_message": {
+            "id": row["message_id"],
+            "sender_id": row["message_sender_id"],
+            "preview": row["message_preview"],
+            "has_file": row["message_has_file"],
+            "created_at": row["message_created_at"],
+        } if row["message_id"] else None,
+    }
+
+
+def get_inbox(user_id: int, cursor: str | None = None, size: int | None = None) -> InboxPage:
+    """
+    A page of the user's conversations, most recent activity first.
+    """
+    limit = getattr(settings, "DIALOGS_PAGINATION", DEFAULT_PAGE_SIZE)
+    size = max(1, min(size or DEFAULT_PAGE_SIZE, limit))
+    cursor_activity, cursor_id = _parse_cursor(cursor) if cursor else (None, None)
+
+    with connection.cursor() as db:
+        db.execute(_inbox_sql(), {
+            "user_id": user_id,
+            "cursor_activity": cursor_activity,
+            "cursor_id": cursor_id,
+            "limit": size + 1,
+        })
+        columns = [column.name for column in db.description]
+        rows = [dict(zip(columns, row)) for row in db.fetchall()]
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1]["last_activity"], rows[-1]["conversation_id"])
+
+    # The columns lag behind by up to a flush interval; Redis has it live.
+    peers = get_presence(row["peer_id"] for row in rows)
+    for row in rows:
+        peer = peers[row["peer_id"]]
+        row["peer_is_online"] = peer.is_online
+        row["peer_was_online"] = peer.last_seen or row["peer_was_online"]
+    return InboxPage(entries=[_entry(row) for row in rows], next_cursor=next_cursor)
@@ -0,0 +1,158 @@
+"""
+The lobby: every chat room grouped by category.
+
+The listing is built with one query (rooms, their category and file, member
+and online counts) and cached in two tiers: a short-lived process-local copy
+and a versioned copy in Django's shared (Redis) cache. Room, category and
+membership signals bump the version when their transaction commits, so a
+change is visible everywhere once the local copies expire. Online counts are refreshed at least every
+`CHAT_LOBBY_CACHE_TIMEOUT` seconds.
+
+Each listing carries an ETag derived from its content, so API clients can
+revalidate with `If-None-Match` instead of downloading it again.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.http import parse_etags
+
+from src.chat.models import ChatRoom
+from src.common.cache import LocalCache
+from src.common.encoding import dumps_bytes
+from src.common.metrics import METRICS
+
+VERSION_KEY = "chat:lobby:version"
+CACHE_KEY = "chat:lobby:{}"
+LOCAL_KEY = "lobby"
+DEFAULT_LOCAL_TTL = 5
+DEFAULT_CACHE_TIMEOUT = 30
+
+_LOCAL = LocalCache(maxsize=1, ttl=getattr(settings, "CHAT_LOBBY_LOCAL_TTL", DEFAULT_LOCAL_TTL))
+
+
+@dataclass(frozen=True)
+class Lobby:
+    """
+    Rooms grouped by category, and the ETag of that content.
+    """
+    groups: list[dict]
+    etag: str
+
+    def etag_for(self, country: str | None = None, chat_type: str | None = None, user_package: str | None = None):
+        """
+        The ETag of the listing narrowed by the given category fields.
+        """
+        if country is None and chat_type is None and user_package is None:
+            return self.etag
+        key = f"{self.etag}:{country}:{chat_type}:{user_package}".encode()
+        return f'"{hashlib.sha256(key).hexdigest()[:32]}"'
+
+    def filtered(self, country: str | None = None, chat_type: str | None = None, user_package: str | None = None):
+        """
+        The groups matching the given category fields.
+        """
+        wanted = {"country_code": country, "chat_type": chat_type, "user_package": user_package}
+        return [
+            group for group in self.groups
+            if all(value is None or group["category"][key] == value for key, value in wanted.items())
+        ]
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    Whether an `If-None-Match` header lists `etag`, or is `*`. Tags are
+    compared whole and weakly, ignoring any `W/` prefix.
+    """
+    tags = parse_etags(if_none_match) if if_none_match else []
+    if tags == ["*"]:
+        return True
+    return etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+def _build_lobby() -> Lobby:
+    rooms = (
+        ChatRoom.objects.select_related("category", "room_file")
+        .annotate(
+            member_count=Count("members", distinct=True),
+            online_count=Count("members", filter=Q(members__is_online=True), distinct=True),
+        )
+        .order_by("category__country_code", "category__chat_type", "category__user_package", "room_name")
+    )
+
+    groups = {}
+    for room in rooms:
+        category = room.category
+        group = groups.get(category.pk)
+        if group is None:
+            group = groups[category.pk] = {
+                "category": {
+                    "id": category.pk,
+                    "country_code": category.country_code,
+                    "country_name": category.get_country_name_display(),
+                    "flag": category.country_flag,
+                    "chat_type": category.chat_type,
+                    "chat_type_display": category.get_chat_type_display(),
+                    "user_package": category.user_package,
+                    "user_package_display": category.get_user_package_display(),
+                },
+                "rooms": [],
+            }
+        group["rooms"].append({
+            "name": room.room_name,
+            "slug": room.slug,
+            "image": room.room_file.file.url if room.room_file_id else None,
+            "member_count": room.member_count,
+            "online_count": room.online_count,
+        })
+
+    groups = list(groups.values())
+    etag = hashlib.sha256(dumps_bytes(groups)).hexdigest()[:32]
+    return Lobby(groups=groups, etag=f'"{etag}"')
+
+
+def _fresh_version() -> int:
+    # Time-based, so a version lost to eviction is never reused.
+    return time.time_ns() // 1_000_000
+
+
+def get_lobby() -> Lobby:
+    """
+    The current lobby listing, from the nearest cache tier that has it.
+    """
+    lobby = _LOCAL.get(LOCAL_KEY)
+    if lobby is not None:
+        METRICS.increment("chat.lobby.local_hits")
+        return lobby
+
+    version = cache.get_or_set(VERSION_KEY, _fresh_version, None)
+    key = CACHE_KEY.format(version)
+    lobby = cache.get(key)
+    if lobby is None:
+        METRICS.increment("chat.lobby.misses")
+        lobby = _build_lobby()
+        cache.set(key, lobby, getattr(settings, "CHAT_LOBBY_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT))
+
+    _LOCAL.set(LOCAL_KEY, lobby)
+    return lobby
+
+
+def _bump_version() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), None)
+    _LOCAL.clear()
+
+
+def invalidate_lobby() -> None:
+    """
+    Retire the cached listing in every process once the current
+    transaction commits, so a concurrent reader cannot cache the listing
+    from before the change under the new version.
+    """
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,62 @@
+"""
+Rewrite existing conversations into canonical (low, high) pair order.
+
+Conversations used to be stored in whichever order the first message went,
+with a second unique index for the reverse order. This command swaps rows
+where `low_user_id > high_user_id`, and removes self-conversations and
+reverse-order duplicates (keeping the oldest row). Run it after the field
+rename and before adding the `conversation_pair_canonical` and
+`conversation_pair_unique` constraints. It is idempotent.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from src.chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = "Store every conversation as a canonical (low_user, high_user) pair."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows swapped per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        table = Conversation._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as db:
+            db.execute(f"DELETE FROM {table} WHERE low_user_id = high_user_id")
+            removed_self = db.rowcount
+            db.execute(
+                f"""
+                DELETE FROM {table} newer
+                 USING {table} older
+                 WHERE LEAST(newer.low_user_id, newer.high_user_id) = LEAST(older.low_user_id, older.high_user_id)
+                   AND GREATEST(newer.low_user_id, newer.high_user_id) = GREATEST(older.low_user_id, older.high_user_id)
+                   AND newer.id > older.id
+                """
+            )
+            removed_duplicates = db.rowcount
+
+        swapped = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    Conversation.objects.filter(low_user_id__gt=F("high_user_id"))
+                    .order_by("pk").values_list("pk", flat=True)[:options["batch_size"]]
+                )
+                if not ids:
+                    break
+                swapped += Conversation.objects.filter(pk__in=ids).update(
+                    low_user_id=F("high_user_id"), high_user_id=F("low_user_id")
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Swapped {swapped} conversations, removed {removed_duplicates} duplicates "
+            f"and {removed_self} self-conversations."
+        ))
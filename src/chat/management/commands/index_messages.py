@@ -0,0 +1,52 @@
+"""
+Backfill the full-text search vectors of existing messages.
+
+Rows are indexed in primary key order, one short transaction per batch, so
+only the rows of the current batch are locked and the command can be stopped
+and re-run at any time: it only picks up messages without a vector.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+
+from src.chat.models import Message
+
+
+class Command(BaseCommand):
+    help = "Fill the search vector of messages indexed before full-text search existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Messages indexed per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.05,
+            help="Seconds to pause between batches.",
+        )
+
+    def handle(self, *args, **options):
+        vector = SearchVector("message_content", config=getattr(settings, "CHAT_SEARCH_CONFIG", "simple"))
+        pending = Message.objects.filter(search_vector__isnull=True, message_content__isnull=False)
+
+        indexed = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                pending.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:options["batch_size"]]
+            )
+            if not ids:
+                break
+
+            indexed += Message.objects.filter(pk__in=ids).update(search_vector=vector)
+            last_pk = ids[-1]
+            self.stdout.write(f"Indexed {indexed} messages (last id {last_pk}).")
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} messages."))
@@ -0,0 +1,59 @@
+"""
+Manage the monthly partitions of the message table.
+
+`--convert` switches the plain `chat_message` table to a partitioned one,
+once, keeping existing rows in place. `--ensure` creates the upcoming monthly
+partitions (the `maintain_message_partitions` beat task does the same daily).
+`--archive` moves partitions older than the retention window to
+`chat_message_archive`. With no flags the current partitions are listed.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from src.chat import partitions
+
+
+class Command(BaseCommand):
+    help = "Convert, extend, archive or list the monthly partitions of the message table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Partition the existing message table.")
+        parser.add_argument("--ensure", action="store_true", help="Create the upcoming monthly partitions.")
+        parser.add_argument("--archive", action="store_true", help="Move old partitions to the archive table.")
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=getattr(settings, "CHAT_MESSAGE_PARTITIONS_AHEAD", 3),
+            help="Monthly partitions to keep ready after the current one.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            default=getattr(settings, "CHAT_MESSAGE_RETENTION_MONTHS", 0),
+            help="Months of messages kept in the hot table.",
+        )
+
+    def handle(self, *args, **options):
+        if options["convert"]:
+            if partitions.is_partitioned():
+                self.stdout.write("The message table is already partitioned.")
+            else:
+                boundary = partitions.convert_to_partitioned()
+                self.stdout.write(self.style.SUCCESS(f"Partitioned the message table from {boundary}."))
+
+        if not partitions.is_partitioned():
+            raise CommandError("The message table is not partitioned; run with --convert first.")
+
+        if options["ensure"]:
+            created = partitions.ensure_partitions(options["months_ahead"])
+            self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partitions."))
+
+        if options["archive"]:
+            if options["retention_months"] < 1:
+                raise CommandError("--retention-months must be at least 1 to archive.")
+            moved = partitions.archive_partitions(options["retention_months"])
+            self.stdout.write(self.style.SUCCESS(f"Archived {len(moved)} partitions."))
+
+        for parent in (partitions.HOT_TABLE, partitions.ARCHIVE_TABLE):
+            for partition in partitions.list_partitions(parent):
+                self.stdout.write(f"{parent}: {partition.name} (until {partition.upper_bound or 'MAXVALUE'})")
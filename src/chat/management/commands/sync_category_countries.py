@@ -0,0 +1,18 @@
+"""
+Fill the denormalized country code and flag of existing categories.
+
+Categories saved after the columns were added fill them on save; this
+command updates the older rows in one bulk update. It is idempotent.
+"""
+from django.core.management.base import BaseCommand
+
+from src.chat.models import Category
+
+
+class Command(BaseCommand):
+    help = "Store the country code and flag on every category."
+
+    def handle(self, *args, **options):
+        categories = [category for category in Category.objects.all() if category.sync_country()]
+        Category.objects.bulk_update(categories, ["country_code", "country_flag"], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(categories)} categories."))
@@ -0,0 +1,120 @@
+"""
+Cached chat room membership.
+
+Membership snapshots are kept per room name in a short-lived process-local
+tier backed by Django's shared (Redis) cache. They are rebuilt from the
+database only after an `m2m_changed` signal on `ChatRoom.members`
+invalidates them, once the change has committed, so membership checks and
+notification fan-out do not touch the database in steady state.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from src.accounts.models import ChapianaUser
+from src.chat.models import ChatRoom
+from src.common.cache import LocalCache
+from src.common.metrics import METRICS
+
+CACHE_KEY = "chat:room_members:{}"
+DEFAULT_LOCAL_TTL = 5
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+
+_LOCAL = LocalCache(
+    maxsize=4096,
+    ttl=getattr(settings, "CHAT_MEMBERSHIP_LOCAL_TTL", DEFAULT_LOCAL_TTL),
+)
+
+
+@dataclass(frozen=True)
+class RoomMembers:
+    """
+    Immutable snapshot of the members of one chat room, along with the
+    room's history watermark that reads must honour.
+    """
+    room_id: int
+    member_ids: frozenset[int]
+    usernames: frozenset[str]
+    cleared_before: datetime | None = None
+
+    def __len__(self):
+        return len(self.member_ids)
+
+    def is_member(self, user_id: int) -> bool:
+        """
+        Whether the user with `user_id` belongs to the room.
+        """
+        return user_id in self.member_ids
+
+
+def _load_room_members(room_name: str) -> RoomMembers:
+    room = ChatRoom.objects.filter(room_name=room_name).values_list("pk", "history_cleared_before").first()
+    if room is None:
+        raise ChatRoom.DoesNotExist(f"Chat room {room_name} does not exist.")
+
+    room_id, cleared_before = room
+
+    members = list(ChapianaUser.objects.filter(chat_rooms__pk=room_id).values_list("pk", "username"))
+    return RoomMembers(
+        room_id=room_id,
+        member_ids=frozenset(pk for pk, _ in members),
+        usernames=frozenset(username for _, username in members),
+        cleared_before=cleared_before,
+    )
+
+
+def get_room_members(room_name: str) -> RoomMembers:
+    """
+    The membership snapshot for a room, loading it on a cache miss.
+    """
+    members = _LOCAL.get(room_name)
+    if members is not None:
+        METRICS.increment("chat.membership.local_hits")
+        return members
+
+    key = CACHE_KEY.format(room_name)
+    members = cache.get(key)
+    if members is None:
+        METRICS.increment("chat.membership.misses")
+        members = _load_room_members(room_name)
+        cache.set(
+            key,
+            members,
+            getattr(settings, "CHAT_MEMBERSHIP_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT),
+        )
+
+    _LOCAL.set(room_name, members)
+    return members
+
+
+async def aget_room_members(room_name: str) -> RoomMembers:
+    """
+    Async variant of `get_room_members` that skips the thread hop on a local hit.
+    """
+    members = _LOCAL.get(room_name)
+    if members is not None:
+        METRICS.increment("chat.membership.local_hits")
+        return members
+    return await database_sync_to_async(get_room_members)(room_name)
+
+
+def _drop_room_members(room_names) -> None:
+    _LOCAL.delete(*room_names)
+    cache.delete_many([CACHE_KEY.format(room_name) for room_name in room_names])
+
+
+def invalidate_room_members(*room_names: str) -> None:
+    """
+    Drop the cached snapshots of the given rooms from both tiers once the
+    current transaction commits, so a concurrent reader cannot cache the
+    membership from before the change. Outside a transaction they are
+    dropped at once.
+    """
+    if not room_names:
+        return
+    room_names = tuple(room_names)
+    transaction.on_commit(lambda: _drop_room_members(room_names))
@@ -1,63 +1,74 @@
 """Chapiana data layers."""
+from collections import Counter, defaultdict
 from datetime import timedelta
 
-import emoji
-from django.db import models
-from django.db.models import Q
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
-import emoji
 from model_utils.models import TimeStampedModel, SoftDeletableModel
 
 from src.accounts.models import ChapianaUser
+from src.common.cache import LocalCache
 from src.common.models import UploadedFile
-from src.chat.constants.symbolic_constants import VideoCallStatus, ETA_TIME, ChatType, ChapianaUserPackage
-from src.chat.tasks import notify_video_call_users
-from src.chat.utils import get_country_code_by_name , get_country_name_choices
+from src.chat.constants.symbolic_constants import VideoCallStatus, ChatType, ChapianaUserPackage
+from src.chat.countries import country_index, country_name_choices
+
+
+# Conversation pairs this process knows to exist.
+_KNOWN_CONVERSATIONS = LocalCache(maxsize=100_000, ttl=60 * 60)
 
 
 class Category(models.Model):
     """
     Represents a category for chat rooms.
+
+    The country's alpha-2 code and flag are stored with the row when it is
+    saved, so listing categories never looks countries up.
     """
     country_name = models.CharField(
         max_length=100,
-        choices=get_country_name_choices(),
+        choices=country_name_choices,
         verbose_name=_("Country")
     )
+    country_code = models.CharField(max_length=2, blank=True, editable=False, verbose_name=_("Country Code"))
+    country_flag = models.CharField(max_length=8, blank=True, editable=False, verbose_name=_("Flag"))
     chat_type = models.CharField(max_length=20, choices=ChatType.choices, verbose_name=_("Chat Type"))
     user_package = models.CharField(max_length=20, choices=ChapianaUserPackage.choices, verbose_name=_("User Package"))
 
     class Meta:
-        verbsose_name=_("Category")
-        verbsose_name_plural = _("Categories")
+        verbose_name = _("Category")
+        verbose_name_plural = _("Categories")
 
     def __str__(self):
         """
         A readable string representation of the category.
         """
-        return f"{self.country_flag} {self.country_name} - {self.get_chat_type_display()} - {self.get_user_package_display()}"
+        return f"{self.country_flag} {self.get_country_name_display()} - {self.get_chat_type_display()} - {self.get_user_package_display()}"
 
-    def country_code(self):
+    def save(self, *args, **kwargs):
         """
-        The ISO Alpha-2 country code based on the country name.
+        Store the country code and flag alongside the country.
         """
-        return get_country_code_by_name(self.country_name) or "Unkown"
+        self.sync_country()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "country_name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "country_code", "country_flag"}
+        super().save(*args, **kwargs)
 
-    @property
-    def country_flag(self):
+    def sync_country(self) -> bool:
         """
-        The flag based on the country code.
+        Refresh the denormalized country code and flag. Returns whether they changed.
         """
-        code = self.country_code
-        if code == "Unkown" or not code:
-            return ""
-
-        return emoji.emojize(
-            f":regionsl_indicator_{code[0].lower()}:"
-            f":regional_indicator_code{code[1].lower():}", language="alias"
-        )
+        country = country_index().lookup(self.country_name)
+        code, flag = (country.alpha_2, country.flag) if country else ("", "")
+        changed = (code, flag) != (self.country_code, self.country_flag)
+        self.country_code, self.country_flag = code, flag
+        return changed
 
     def category_type_display(self):
         """
@@ -109,6 +120,13 @@ class ChatRoom(models.Model):
         null=True,
         verbose_name="Slug"
     )
+    # Messages created at or before this time are hidden from reads and
+    # deleted in the background.
+    history_cleared_before = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="History Cleared Before"
+    )
 
     class Meta:
         verbose_name = "Chat Room"
@@ -134,47 +152,96 @@ class ChatRoom(models.Model):
 class Conversation(TimeStampedModel):
     """
     Model representing a dialog (conversation) between two users.
+
+    The pair is stored in canonical order, `low_user_id < high_user_id`, so a
+    conversation has exactly one row and a lookup is a single index probe.
     """
     id = models.BigAutoField(primary_key=True, verbose_name=_("Id"))
-    first_user = models.ForeignKey(
+    low_user = models.ForeignKey(
         ChapianaUser,
         on_delete=models.CASCADE,
-        verbose_name=_("first_user"),
+        verbose_name=_("low_user"),
         related_name="+", 
         db_index=True
     )
-    second_user = models.ForeignKey(
+    high_user = models.ForeignKey(
         ChapianaUser,
         on_delete=models.CASCADE,
-        verbose_name=_("second_user"),
+        verbose_name=_("high_user"),
         related_name="+", 
         db_index=True
     )
 
     class Meta:
-        unique_together = (("first_user", "second_user"), ("second_user", "first_user"))
+        constraints = [
+            models.UniqueConstraint(fields=["low_user", "high_user"], name="conversation_pair_unique"),
+            models.CheckConstraint(condition=Q(low_user__lt=F("high_user")), name="conversation_pair_canonical"),
+        ]
         verbose_name = _("Conversation")
         verbose_name_plural = _("Conversations")
 
     def __str__(self):
-        return _("Conversation between {} and {}").format(self.first_user_id, self.second_user_id)
+        return _("Conversation between {} and {}").format(self.low_user_id, self.high_user_id)
+
+    @staticmethod
+    def canonical_pair(user_one, user_two) -> tuple[int, int]:
+        """
+        The (low, high) id pair of two users, given as users or ids.
+        """
+        first = getattr(user_one, "pk", user_one)
+        second = getattr(user_two, "pk", user_two)
+        return (first, second) if first < second else (second, first)
 
     @staticmethod
-    def conversation_exists(user_one: ChapianaUser, user_two: ChapianaUser) -> None:
+    def conversation_exists(user_one: ChapianaUser, user_two: ChapianaUser) -> "Conversation | None":
         """
         Check if a conversation already exists between two users.
         """
-        return Conversation.objects.filter(
-            Q(first_user=user_one, second_user=user_two) | Q(first_user=user_two, second_user=user_one)
-        ).first()
+        low, high = Conversation.canonical_pair(user_one, user_two)
+        return Conversation.objects.filter(low_user_id=low, high_user_id=high).first()
 
     @staticmethod
     def create_if_not_exists(user_one: ChapianaUser, user_two: ChapianaUser):
         """
         Create a new conversation between two users if it doesn't exist.
         """
-        if not Conversation.conversation_exists(user_one, user_two):
-            Conversation.objects.create(first_user=user_one, second_user=user_two)
+        Conversation.ensure_pairs([(user_one, user_two)])
+
+    @staticmethod
+    def ensure_pairs(pairs) -> None:
+        """
+        Make sure a conversation exists for every (user, user) pair.
+
+        Pairs already seen by this process are skipped, so the steady-state
+        message path runs no query; the rest are inserted in one statement
+        with ON CONFLICT DO NOTHING, which is safe against concurrent inserts.
+        The users' cached contact sets are dropped, since they may be new.
+        """
+        unknown = {
+            pair for pair in (Conversation.canonical_pair(*users) for users in pairs)
+            if pair[0] != pair[1] and pair not in _KNOWN_CONVERSATIONS
+        }
+        if not unknown:
+            return
+
+        Conversation.objects.bulk_create(
+            [Conversation(low_user_id=low, high_user_id=high) for low, high in unknown],
+            ignore_conflicts=True,
+        )
+        for pair in unknown:
+            _KNOWN_CONVERSATIONS.set(pair, True)
+
+        # Imported here: the contacts module imports the models.
+        from src.chat.contacts import invalidate_contacts
+
+        invalidate_contacts(*{user_id for pair in unknown for user_id in pair})
+
+    @staticmethod
+    def forget_pair(low_user_id: int, high_user_id: int) -> None:
+        """
+        Drop a pair from this process's cache of known conversations.
+        """
+        _KNOWN_CONVERSATIONS.delete((low_user_id, high_user_id))
 
     @staticmethod
     def get_conversations_for_user(user: ChapianaUser):
@@ -182,8 +249,8 @@ class Conversation(TimeStampedModel):
         Retrieve all conversations for a given user.
         """
         return Conversation.objects.filter(
-            Q(first_user=user) | Q(second_user=user)
-        ).values_list('first_user__pk', 'second_user__pk')
+            Q(low_user=user) | Q(high_user=user)
+        ).values_list('low_user__pk', 'high_user__pk')
 
 
 class Message(models.Model):
@@ -214,15 +281,31 @@ class Message(models.Model):
     message_content = models.TextField(verbose_name=_("Text"), blank=True, null=True)
     file = models.ForeignKey(UploadedFile, related_name="message", on_delete=models.DO_NOTHING, verbose_name="File", blank=True, null=True)
     time = models.TimeField(auto_now_add=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: write-behind inserts keep the time the message was sent.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     read = models.BooleanField(verbose_name=_("Read"), default=False)
+    # Filled after insert and by `manage.py index_messages` for older rows.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # Managers
+    objects = models.Manager()
     all_objects = models.Manager()
 
     class Meta:
         ordering = ("created_at", )
+        indexes = [
+            # Keyset pagination of room and dialog history, newest first.
+            models.Index(fields=["chat_room", "-created_at", "-id"], name="message_room_history_idx"),
+            models.Index(fields=["sender", "recipient", "-created_at", "-id"], name="message_dialog_history_idx"),
+            # Unread counter reconciliation only scans unread rows.
+            models.Index(
+                fields=["recipient", "sender", "chat_room"],
+                condition=Q(read=False),
+                name="message_unread_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="message_search_idx"),
+        ]
         verbose_name = _("Message")
         verbose_name_plural = _("Messages")
 
@@ -234,8 +317,8 @@ class Message(models.Model):
         """
         Get the count of unread messages in a conversation between two users.
         """
-        return Message.objects.filter(sender_id=sender, recipient_id=recipient, read=False).count()
-    
+        return UnreadCounter.get_count(recipient, sender=sender)
+
 
     @staticmethod
     def get_last_message_for_conversation(sender, recipient):
@@ -243,16 +326,265 @@ class Message(models.Model):
         Get the latest message exchanged in a conversation between two users.
         """
         return Message.objects.filter(
-            Q(sender_id=sender, recipient_id=recipient) | Q(sender_id=recipient, recipient_id=sender) \
-            .select_related("sender", "recipient")[0]
-        )
+            Q(sender_id=sender, recipient_id=recipient) | Q(sender_id=recipient, recipient_id=sender),
+            chat_room__isnull=True,
+        ).select_related("sender", "recipient").order_by("-created_at", "-id").first()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded text, so `save` can tell whether the search
+        vector is stale.
+        """
+        message = super().from_db(db, field_names, values)
+        message._saved_content = message.__dict__.get("message_content")
+        return message
 
     def save(self, *args, **kwargs):
         """
-        Override save to ensure dialog creation if not already present.
+        Override save to ensure dialog creation if not already present, to
+        count a new unread message and to refresh the search vector of new or
+        edited text.
         """
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        content_changed = adding or (
+            (update_fields is None or "message_content" in update_fields)
+            and self.message_content != getattr(self, "_saved_content", None)
+        )
         super(Message, self).save(*args, **kwargs)
-        Conversation.create_if_not_exists(self.sender, self.recipient)
+        if self.chat_room_id is None:
+            Conversation.create_if_not_exists(self.sender_id, self.recipient_id)
+        if adding:
+            UnreadCounter.increment_for([self])
+        if content_changed:
+            Message.update_search_vectors([self])
+            self._saved_content = self.message_content
+
+    @staticmethod
+    def update_search_vectors(messages) -> int:
+        """
+        Refresh the full-text search vectors of the given saved messages in
+        one UPDATE. Returns the number of rows updated.
+        """
+        messages = [message for message in messages if message.message_content]
+        if not messages:
+            return 0
+
+        return Message.objects.filter(
+            pk__in=[message.pk for message in messages],
+            # Bounds the UPDATE to the partitions the messages live in.
+            created_at__gte=min(message.created_at for message in messages),
+        ).update(search_vector=SearchVector(
+            "message_content", config=getattr(settings, "CHAT_SEARCH_CONFIG", "simple")
+        ))
+
+
+class ArchivedMessage(models.Model):
+    """
+    Read-only view of the message partitions moved out of the hot table by
+    `src.chat.partitions.archive_partitions`. The table is created and
+    filled by partition management, not by migrations.
+    """
+    chat_room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_constraint=False,
+    )
+    sender = models.ForeignKey(
+        ChapianaUser,
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        verbose_name=_("Sender"),
+        db_constraint=False,
+    )
+    recipient = models.ForeignKey(
+        ChapianaUser,
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        verbose_name=_("Recipient"),
+        db_constraint=False,
+    )
+    message_content = models.TextField(verbose_name=_("Text"), blank=True, null=True)
+    file = models.ForeignKey(
+        UploadedFile,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        verbose_name="File",
+        blank=True,
+        null=True,
+        db_constraint=False,
+    )
+    time = models.TimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    read = models.BooleanField(verbose_name=_("Read"), default=False)
+
+    class Meta:
+        managed = False
+        db_table = "chat_message_archive"
+        ordering = ("created_at", )
+        verbose_name = _("Archived Message")
+        verbose_name_plural = _("Archived Messages")
+
+    def __str__(self):
+        return f"{self.sender.username}: {self.message_content}"
+
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized count of a user's unread messages, per dialog partner
+    (`sender`) or per chat room.
+
+    Incremented when messages are inserted and reset when the conversation is
+    marked read. A room message is stored once, addressed to its sender, so
+    it counts for every other member of the room and room counters have no
+    per-message read state; `reconcile_unread_counters` repairs drift in the
+    dialog counters.
+    """
+    recipient = models.ForeignKey(
+        ChapianaUser,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Recipient"),
+    )
+    sender = models.ForeignKey(
+        ChapianaUser,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Sender"),
+        null=True,
+        blank=True,
+    )
+    chat_room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Chat Room"),
+        null=True,
+        blank=True,
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name=_("Unread"))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipient", "sender"],
+                condition=Q(chat_room__isnull=True),
+                name="unread_counter_dialog_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["recipient", "chat_room"],
+                condition=Q(chat_room__isnull=False),
+                name="unread_counter_room_unique",
+            ),
+        ]
+        verbose_name = _("Unread Counter")
+        verbose_name_plural = _("Unread Counters")
+
+    def __str__(self):
+        return f"{self.recipient_id}: {self.count} unread"
+
+    @staticmethod
+    def _filter(recipient, sender=None, chat_room=None) -> Q:
+        if chat_room is not None:
+            return Q(recipient_id=recipient, chat_room_id=chat_room)
+        return Q(recipient_id=recipient, sender_id=sender, chat_room__isnull=True)
+
+    @staticmethod
+    def get_count(recipient, sender=None, chat_room=None) -> int:
+        """
+        The unread count of a dialog (`sender`) or a chat room.
+        """
+        return UnreadCounter.objects.filter(
+            UnreadCounter._filter(recipient, sender, chat_room)
+        ).values_list("count", flat=True).first() or 0
+
+    @staticmethod
+    def _room_deltas(messages) -> Counter:
+        # Every member of a room counts the messages the others sent.
+        sent = defaultdict(Counter)
+        for message in messages:
+            if message.chat_room_id:
+                sent[message.chat_room_id][message.sender_id] += 1
+        if not sent:
+            return Counter()
+
+        deltas = Counter()
+        members = ChatRoom.members.through.objects.filter(chatroom_id__in=sent).values_list(
+            "chatroom_id", "chapianauser_id"
+        )
+        for chat_room, member in members:
+            delta = sum(sent[chat_room].values()) - sent[chat_room][member]
+            if delta:
+                deltas[member, None, chat_room] = delta
+        return deltas
+
+    @staticmethod
+    def increment_for(messages) -> None:
+        """
+        Count newly inserted messages: direct messages for their recipient
+        and room messages for the room's other members. One UPDATE per
+        dialog counter, and one per room and increment.
+        """
+        deltas = Counter(
+            (message.recipient_id, message.sender_id, None)
+            for message in messages
+            if not message.chat_room_id and not message.read and message.sender_id != message.recipient_id
+        )
+        deltas.update(UnreadCounter._room_deltas(messages))
+        if not deltas:
+            return
+
+        rooms = defaultdict(list)
+        with transaction.atomic():
+            UnreadCounter.objects.bulk_create(
+                [
+                    UnreadCounter(recipient_id=recipient, sender_id=sender, chat_room_id=chat_room)
+                    for recipient, sender, chat_room in deltas
+                ],
+                ignore_conflicts=True,
+            )
+            for (recipient, sender, chat_room), delta in deltas.items():
+                if chat_room is not None:
+                    rooms[chat_room, delta].append(recipient)
+                    continue
+                UnreadCounter.objects.filter(
+                    UnreadCounter._filter(recipient, sender)
+                ).update(count=F("count") + delta)
+            for (chat_room, delta), recipients in rooms.items():
+                UnreadCounter.objects.filter(chat_room_id=chat_room, recipient_id__in=recipients).update(
+                    count=F("count") + delta
+                )
+
+    @staticmethod
+    def mark_read(recipient, sender=None, chat_room=None) -> int:
+        """
+        Mark a whole dialog or room read for `recipient` in one bulk UPDATE
+        and reset its counter. Returns the number of messages marked read.
+
+        Room messages have no per-member read state, so for a room only the
+        counter is reset and its count returned.
+        """
+        with transaction.atomic():
+            # Lock the counter first so a concurrent insert waits and is
+            # counted after the reset instead of being lost by it.
+            counters = list(UnreadCounter.objects.select_for_update().filter(
+                UnreadCounter._filter(recipient, sender, chat_room)
+            ))
+            if chat_room is not None:
+                updated = sum(counter.count for counter in counters)
+            else:
+                updated = Message.objects.filter(
+                    recipient_id=recipient, sender_id=sender, chat_room__isnull=True, read=False
+                ).update(read=True)
+            UnreadCounter.objects.filter(
+                UnreadCounter._filter(recipient, sender, chat_room)
+            ).update(count=0)
+        return updated
 
 
 class VideoCall(models.Model):
@@ -323,20 +655,22 @@ class VideoCall(models.Model):
 
     def notify_users(self):
         """
-        Trigger Celery task to notify users asynchronously.
-        """
-        notify_video_call_users.apply_async(
-            args=[
-                self.id,
-                self.caller.id,
-                self.receiver.id,
-                self.status_name,
-                self.date_started.isoformat(),
-                self.date_ended.isoformat(),
-                self.duration_in_seconds
-            ],
-            eta=ETA_TIME
-        )
+        Queue one notification about the call's current state.
+
+        Status changes go through `src.chat.calls.transition`, whose callers
+        announce them; this is for re-sending the current state.
+        """
+        # Imported here: the calls module imports the models.
+        from src.chat.calls import CallState, notify_call_state
+
+        notify_call_state(CallState(
+            call_id=self.pk,
+            caller_id=self.caller_id,
+            receiver_id=self.receiver_id,
+            status=self.status,
+            date_started=self.date_started,
+            date_ended=self.date_ended,
+        ))
 
     def is_accepted(self):
         """
@@ -379,7 +713,3 @@ class VideoCall(models.Model):
         Returns True if the call was missed.
         """
         return self.status == self.VideoCallStatus.MISSED
-
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.notify_users()
@@ -0,0 +1,136 @@
+"""
+Targeted chat notifications.
+
+Notifications go to the per-user `user_<id>` groups of a room's members
+instead of a global listener group, so each socket only receives what is
+meant for it. With `CHAT_NOTIFICATION_COALESCE_MS` set, bursts from one room
+are merged into a single "N new messages" event per user per interval.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+from src.common.encoding import frame_event
+from src.common.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+NOTIFICATION_HANDLER = "user_notification"
+CALL_HANDLER = "video_call_status"
+SIGNAL_HANDLER = "call_signal"
+DEFAULT_COALESCE_MS = 0
+
+
+def user_group(user_id: int) -> str:
+    """
+    The channel layer group every socket of a user listens on.
+    """
+    return f"user_{user_id}"
+
+
+async def send_to_users(channel_layer, user_ids, payload: dict) -> None:
+    """
+    Encode `payload` once and send it to each user's group concurrently.
+    """
+    event = frame_event(payload, handler=NOTIFICATION_HANDLER)
+    await asyncio.gather(*(
+        channel_layer.group_send(user_group(user_id), event) for user_id in user_ids
+    ))
+    METRICS.increment("chat.notifications.sent", len(user_ids))
+
+
+def room_group(room_name: str) -> str:
+    """
+    The channel layer group of a chat room.
+    """
+    return f"chat_{room_name}"
+
+
+def dialog_group(user_id: int, peer_id: int) -> str:
+    """
+    The channel layer group of the direct conversation between two users.
+    """
+    low, high = sorted((user_id, peer_id))
+    return f"dialog_{low}_{high}"
+
+
+def call_group(user_id: int) -> str:
+    """
+    The channel layer group every call socket of a user listens on.
+    """
+    return f"user_{user_id}_calls"
+
+
+async def send_call_event(channel_layer, caller_id: int, receiver_id: int, payload: dict) -> None:
+    """
+    Encode a call event once and send it to both participants concurrently.
+    """
+    event = frame_event(payload, handler=CALL_HANDLER)
+    await asyncio.gather(
+        channel_layer.group_send(call_group(caller_id), event),
+        channel_layer.group_send(call_group(receiver_id), event),
+    )
+
+
+class NotificationCoalescer:
+    """
+    Per-process merger of notification bursts, keyed by room and user.
+    """
+    def __init__(self, interval_ms: int | None = None):
+        if interval_ms is None:
+            interval_ms = getattr(settings, "CHAT_NOTIFICATION_COALESCE_MS", DEFAULT_COALESCE_MS)
+        self.interval = interval_ms / 1000
+        # room name -> user id -> (count, latest payload)
+        self._pending: dict[str, dict[int, tuple[int, dict]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def notify(self, channel_layer, room_name: str, user_ids, payload: dict) -> None:
+        """
+        Notify `user_ids` about a room event, merging bursts when enabled.
+        """
+        if not self.interval:
+            await send_to_users(channel_layer, list(user_ids), payload)
+            return
+
+        pending = self._pending.setdefault(room_name, {})
+        for user_id in user_ids:
+            count, _ = pending.get(user_id, (0, None))
+            pending[user_id] = (count + 1, payload)
+        METRICS.increment("chat.notifications.coalesced", len(user_ids))
+
+        if room_name not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[room_name] = loop.call_later(
+                self.interval, self._on_timer, loop, channel_layer, room_name
+            )
+
+    async def flush(self, channel_layer, room_name: str) -> None:
+        """
+        Send what is pending for a room: the event itself for a single
+        message, a summary for a burst.
+        """
+        timer = self._timers.pop(room_name, None)
+        if timer is not None:
+            timer.cancel()
+
+        # Group users that receive the same frame so each is encoded once.
+        frames: dict[tuple[int, int], tuple[int, dict, list[int]]] = {}
+        for user_id, (count, payload) in self._pending.pop(room_name, {}).items():
+            frames.setdefault((count, id(payload)), (count, payload, []))[2].append(user_id)
+
+        for count, payload, user_ids in frames.values():
+            if count > 1:
+                payload = {**payload, "content": f"{count} new messages", "count": count}
+            await send_to_users(channel_layer, user_ids, payload)
+
+    def _on_timer(self, loop, channel_layer, room_name: str) -> None:
+        self._timers.pop(room_name, None)
+        task = loop.create_task(self.flush(channel_layer, room_name))
+        # Keep a reference until the flush is done so it is not collected.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+NOTIFICATIONS = NotificationCoalescer()
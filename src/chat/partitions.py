@@ -0,0 +1,294 @@
+"""
+Monthly range partitioning of the message table (PostgreSQL).
+
+`chat_message` becomes a table partitioned by `created_at`, one partition per
+month, e.g. `chat_message_p2024_01`. Future partitions are created ahead of
+time by `ensure_partitions`. Partitions older than the retention window are
+detached by `archive_partitions` and attached to `chat_message_archive`, a
+partitioned table with the same columns. Recent-history queries and vacuum
+then only touch hot partitions, and `ArchivedMessage` can still read the cold
+ones.
+
+`convert_to_partitioned` performs the one-off switch: the existing table is
+kept as the partition holding everything before the current month.
+`chat_message_default` catches rows for months without a partition, so
+inserts keep working if the beat task falls behind; `ensure_partitions` moves
+them into their month once it is created.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from src.chat.models import ArchivedMessage, Message
+
+LOGGER = logging.getLogger(__name__)
+
+HOT_TABLE = Message._meta.db_table
+ARCHIVE_TABLE = ArchivedMessage._meta.db_table
+LEGACY_TABLE = f"{HOT_TABLE}_legacy"
+DEFAULT_PARTITION = f"{HOT_TABLE}_default"
+LEGACY_KEY = f"{LEGACY_TABLE}_pkey"
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    """
+    A partition of the hot or archive table and its upper bound.
+    """
+    name: str
+    parent: str
+    upper_bound: datetime | None
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """
+    The first day of the month `months` after the month of `day`.
+    """
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """
+    The name of the hot partition holding `month`.
+    """
+    return f"{HOT_TABLE}_p{month:%Y_%m}"
+
+
+def list_partitions(parent: str = HOT_TABLE) -> list[Partition]:
+    """
+    The partitions currently attached to `parent`, oldest first.
+    """
+    with connection.cursor() as db:
+        db.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+              FROM pg_inherits
+              JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+              JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+             WHERE parent.relname = %s
+            """,
+            [parent],
+        )
+        rows = db.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = UPPER_BOUND.search(bound or "")
+        upper = datetime.fromisoformat(match.group(1)) if match else None
+        partitions.append(Partition(name=name, parent=parent, upper_bound=upper))
+    bounded = sorted((p for p in partitions if p.upper_bound), key=lambda partition: partition.upper_bound)
+    return bounded + [partition for partition in partitions if not partition.upper_bound]
+
+
+def is_partitioned() -> bool:
+    """
+    Whether the message table has already been converted.
+    """
+    with connection.cursor() as db:
+        db.execute("SELECT relkind FROM pg_class WHERE relname = %s", [HOT_TABLE])
+        row = db.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def _create_partitioned_like(db, table: str, template: str) -> None:
+    db.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            LIKE {template} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+
+
+def convert_to_partitioned() -> date:
+    """
+    Switch `chat_message` to a partitioned table, keeping the existing rows
+    in place as the partition for everything before the current month.
+
+    Indexes and foreign keys are recreated on the new parent with their
+    original names, and the existing indexes are reused for the old rows.
+    The `(id, created_at)` key the parent needs is built on the old rows
+    beforehand, concurrently when called in autocommit mode, so the switch
+    itself holds its exclusive lock only for catalog changes and the scan
+    validating the range of the old rows. The identity of `id` moves to the
+    new parent and continues after the highest existing id. Returns the
+    first month served by a new partition.
+    """
+    boundary = month_start(timezone.now().date())
+    # `CREATE INDEX CONCURRENTLY` cannot run inside a transaction.
+    concurrently = "" if connection.in_atomic_block else "CONCURRENTLY"
+    with connection.cursor() as db:
+        db.execute(f"CREATE UNIQUE INDEX {concurrently} IF NOT EXISTS {LEGACY_KEY} ON {HOT_TABLE} (id, created_at)")
+
+    with transaction.atomic(), connection.cursor() as db:
+        db.execute(
+            """
+            SELECT indexname, indexdef FROM pg_indexes
+             WHERE tablename = %s
+               AND indexname <> %s
+               AND indexname NOT IN (
+                   SELECT conname FROM pg_constraint
+                    WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+               )
+            """,
+            [HOT_TABLE, LEGACY_KEY, HOT_TABLE],
+        )
+        indexes = db.fetchall()
+        db.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [HOT_TABLE],
+        )
+        foreign_keys = db.fetchall()
+
+        db.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [HOT_TABLE],
+        )
+        primary_key = db.fetchone()[0]
+
+        db.execute(f"ALTER TABLE {HOT_TABLE} RENAME TO {LEGACY_TABLE}")
+        # The parent's key must include `created_at`; the prebuilt index
+        # becomes the old rows' key, which ATTACH then reuses.
+        db.execute(f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {primary_key}")
+        db.execute(f"ALTER TABLE {LEGACY_TABLE} ADD CONSTRAINT {LEGACY_KEY} PRIMARY KEY USING INDEX {LEGACY_KEY}")
+        for index_name, _ in indexes:
+            db.execute(f"ALTER INDEX {index_name} RENAME TO {index_name[:55]}_legacy")
+        for constraint_name, _ in foreign_keys:
+            db.execute(
+                f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT {constraint_name} TO {constraint_name[:55]}_legacy"
+            )
+
+        # `LIKE` does not copy the identity of `id`, and a partition cannot
+        # keep its own, so the sequence moves to the parent and continues
+        # past the existing ids.
+        db.execute(f"SELECT max(id) FROM {LEGACY_TABLE}")
+        last_id = db.fetchone()[0]
+        db.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+
+        _create_partitioned_like(db, HOT_TABLE, LEGACY_TABLE)
+        db.execute(f"ALTER TABLE {HOT_TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        if last_id is not None:
+            db.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [HOT_TABLE, last_id])
+        db.execute(f"ALTER TABLE {HOT_TABLE} ADD PRIMARY KEY (id, created_at)")
+        for _, definition in indexes:
+            db.execute(
+                definition.replace(f" ON public.{LEGACY_TABLE} ", f" ON public.{HOT_TABLE} ")
+                .replace(f" ON {LEGACY_TABLE} ", f" ON {HOT_TABLE} ")
+            )
+        for constraint_name, definition in foreign_keys:
+            db.execute(f"ALTER TABLE {HOT_TABLE} ADD CONSTRAINT {constraint_name} {definition}")
+
+        # A validated CHECK lets ATTACH skip its own full scan of the old rows.
+        db.execute(
+            f"ALTER TABLE {LEGACY_TABLE} ADD CONSTRAINT {LEGACY_TABLE}_range "
+            f"CHECK (created_at IS NOT NULL AND created_at < %s)",
+            [boundary],
+        )
+        db.execute(
+            f"ALTER TABLE {HOT_TABLE} ATTACH PARTITION {LEGACY_TABLE} "
+            f"FOR VALUES FROM (MINVALUE) TO (%s)",
+            [boundary],
+        )
+        db.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {HOT_TABLE} DEFAULT")
+
+    LOGGER.info(f"Partitioned {HOT_TABLE}; rows before {boundary} stay in {LEGACY_TABLE}.")
+    return boundary
+
+
+def _create_month_partition(db, start: date) -> None:
+    end = month_start(start, 1)
+    db.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)",
+        [start, end],
+    )
+    if not db.fetchone()[0]:
+        db.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {HOT_TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        return
+
+    # Postgres refuses a new partition for rows already in the default one,
+    # so they move over while the default partition is detached.
+    with transaction.atomic():
+        db.execute(f"ALTER TABLE {HOT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        db.execute(
+            f"CREATE TABLE {partition_name(start)} PARTITION OF {HOT_TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        db.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {HOT_TABLE} SELECT * FROM moved
+            """,
+            [start, end],
+        )
+        db.execute(f"ALTER TABLE {HOT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    LOGGER.warning(f"Moved messages for {start:%Y-%m} out of {DEFAULT_PARTITION}.")
+
+
+def ensure_partitions(months_ahead: int = 3) -> list[str]:
+    """
+    Create the partitions from the current month up to `months_ahead`
+    months ahead, and the default partition if it is missing. Returns the
+    names of the partitions created.
+    """
+    existing = {partition.name for partition in list_partitions()}
+    current = month_start(timezone.now().date())
+    created = []
+    with connection.cursor() as db:
+        if DEFAULT_PARTITION not in existing:
+            db.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {HOT_TABLE} DEFAULT")
+            created.append(DEFAULT_PARTITION)
+        for offset in range(months_ahead + 1):
+            start = month_start(current, offset)
+            name = partition_name(start)
+            if name in existing:
+                continue
+            _create_month_partition(db, start)
+            created.append(name)
+
+    if created:
+        LOGGER.info(f"Created message partitions: {', '.join(created)}.")
+    return created
+
+
+def archive_partitions(retention_months: int) -> list[str]:
+    """
+    Move hot partitions that end more than `retention_months` months ago to
+    the archive table. Returns the names of the partitions moved.
+
+    `DETACH ... CONCURRENTLY` cannot run inside a transaction, so this must be
+    called in autocommit mode.
+    """
+    cutoff = month_start(timezone.now().date(), -retention_months)
+    moved = []
+    with connection.cursor() as db:
+        _create_partitioned_like(db, ARCHIVE_TABLE, HOT_TABLE)
+        for partition in list_partitions():
+            if partition.upper_bound is None or partition.upper_bound.date() > cutoff:
+                continue
+
+            db.execute(
+                "SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE relname = %s",
+                [partition.name],
+            )
+            bound = db.fetchone()[0]
+            db.execute(f"ALTER TABLE {HOT_TABLE} DETACH PARTITION {partition.name} CONCURRENTLY")
+            db.execute(f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {partition.name} {bound}")
+            moved.append(partition.name)
+
+    if moved:
+        LOGGER.info(f"Archived message partitions: {', '.join(moved)}.")
+    return moved
@@ -7,4 +7,7 @@ from src.chat import consumers
 
 websocket_urlpatterns = [
     re_path(r"ws/chat/(?P<room_name>\w+)/$", consumers.ChatConsumer.as_asgi()),
+    re_path(r"ws/notifications/$", consumers.NotificationConsumer.as_asgi()),
+    re_path(r"ws/calls/$", consumers.CallConsumer.as_asgi()),
+    re_path(r"ws/stream/$", consumers.StreamConsumer.as_asgi()),
 ]
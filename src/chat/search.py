@@ -0,0 +1,98 @@
+"""
+Full-text message search.
+
+Messages carry a `search_vector` column covered by a GIN index. It is filled
+right after insert (see `Message.update_search_vectors`) and by
+`manage.py index_messages` for rows written before the column existed.
+
+A search only sees the caller's own dialogs and the rooms they belong to,
+honouring each room's `history_cleared_before` watermark. Results are ranked
+with `ts_rank` and paged with a `(rank, id)` keyset cursor; each hit carries a
+highlighted snippet of the matching text.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from src.chat.models import Message
+from src.common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_CONFIG = "simple"
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    """
+    One page of search hits, best match first. Each message is annotated
+    with `rank` and `headline`.
+    """
+    messages: list[Message]
+    next_cursor: str | None
+
+
+def search_config() -> str:
+    """
+    The PostgreSQL text search configuration used for messages.
+    """
+    return getattr(settings, "CHAT_SEARCH_CONFIG", DEFAULT_CONFIG)
+
+
+def _parse_cursor(cursor: str) -> tuple[float, int]:
+    rank, pk = decode_cursor(cursor, 2)
+    if not isinstance(rank, (int, float)) or not isinstance(pk, int):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return float(rank), pk
+
+
+def _visible_to(user_id: int) -> Q:
+    dialogs = Q(chat_room__isnull=True) & (Q(sender_id=user_id) | Q(recipient_id=user_id))
+    rooms = Q(chat_room__members__id=user_id) & (
+        Q(chat_room__history_cleared_before__isnull=True)
+        | Q(created_at__gt=F("chat_room__history_cleared_before"))
+    )
+    return dialogs | rooms
+
+
+def search_messages(user_id: int, text: str, cursor: str | None = None, size: int | None = None) -> SearchPage:
+    """
+    A page of the messages visible to the user that match `text`, written
+    in web search syntax (quoted phrases, `or`, `-word`).
+    """
+    limit = getattr(settings, "MESSAGES_PAGINATION", DEFAULT_PAGE_SIZE)
+    size = max(1, min(size or DEFAULT_PAGE_SIZE, limit))
+    query = SearchQuery(text, config=search_config(), search_type="websearch")
+
+    # ts_rank returns a real; compare it as a double so the value in the
+    # cursor matches the one in the database exactly.
+    queryset = Message.objects.filter(_visible_to(user_id), search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+    )
+    if cursor:
+        rank, pk = _parse_cursor(cursor)
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=pk))
+
+    # Postgres evaluates the headline only for the rows that survive LIMIT.
+    messages = list(
+        queryset.annotate(
+            headline=SearchHeadline(
+                "message_content",
+                query,
+                config=search_config(),
+                start_sel="<mark>",
+                stop_sel="</mark>",
+                max_fragments=2,
+            ),
+        )
+        .select_related("chat_room", "sender", "recipient", "file")
+        .order_by("-rank", "-id")[:size + 1]
+    )
+
+    next_cursor = None
+    if len(messages) > size:
+        messages = messages[:size]
+        next_cursor = encode_cursor(messages[-1].rank, messages[-1].pk)
+    return SearchPage(messages=messages, next_cursor=next_cursor)
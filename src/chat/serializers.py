@@ -0,0 +1,102 @@
+"""Chapiana chat serializers."""
+from rest_framework import serializers
+
+from src.chat.models import Message
+from src.chat.upload_tickets import TARGET_MESSAGE, TARGET_ROOM_ICON
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    """
+    Serializes a message for history reads.
+    """
+    chat_room = serializers.SlugRelatedField(slug_field="room_name", read_only=True)
+    sender = serializers.SlugRelatedField(slug_field="username", read_only=True)
+    recipient = serializers.SlugRelatedField(slug_field="username", read_only=True)
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = ("id", "chat_room", "sender", "recipient", "message_content", "file", "created_at", "read")
+        read_only_fields = fields
+
+    def get_file(self, obj):
+        """
+        The URL of the attached file, if any.
+        """
+        return obj.file.file.url if obj.file_id else None
+
+
+class MessageSearchResultSerializer(MessageSerializer):
+    """
+    Serializes a search hit with its rank and highlighted snippet.
+    """
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(MessageSerializer.Meta):
+        fields = MessageSerializer.Meta.fields + ("rank", "headline")
+        read_only_fields = fields
+
+
+class ConversationTargetSerializer(serializers.Serializer):
+    """
+    Names a chat room or the dialog with another user.
+    """
+    room = serializers.CharField(required=False)
+    user = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        """
+        Exactly one of `room` or `user` must be given.
+        """
+        if bool(attrs.get("room")) == bool(attrs.get("user")):
+            raise serializers.ValidationError("Pass either a room or a user.")
+        return attrs
+
+
+class HistoryQuerySerializer(ConversationTargetSerializer):
+    """
+    Validates the query string of a history request.
+    """
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(required=False, min_value=1)
+    archived = serializers.BooleanField(required=False, default=False)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """
+    Validates the query string of a message search.
+    """
+    q = serializers.CharField(max_length=200, trim_whitespace=True)
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(required=False, min_value=1)
+
+
+class UploadTicketRequestSerializer(serializers.Serializer):
+    """
+    Validates a request for an upload ticket.
+    """
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=255, default="application/octet-stream")
+
+
+class UploadTicketCompleteSerializer(serializers.Serializer):
+    """
+    Validates the completion of an upload ticket and what to attach it to.
+    """
+    ticket = serializers.CharField()
+    target = serializers.ChoiceField(choices=[TARGET_MESSAGE, TARGET_ROOM_ICON])
+    room = serializers.CharField(required=False)
+    user = serializers.CharField(required=False)
+    message_content = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        """
+        A message goes to exactly one room or user; an icon needs a room.
+        """
+        if attrs["target"] == TARGET_ROOM_ICON and not attrs.get("room"):
+            raise serializers.ValidationError("A room is required to change its icon.")
+        if attrs["target"] == TARGET_MESSAGE and bool(attrs.get("room")) == bool(attrs.get("user")):
+            raise serializers.ValidationError("Pass either a room or a user.")
+        return attrs
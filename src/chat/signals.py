@@ -1,44 +1,119 @@
-"""Signals to Track Call Lifecycle Events."""
+"""
+Signals to Keep Chat Caches Fresh.
+
+Video call status changes are not tracked here: they go through
+`src.chat.calls.transition`, which writes and notifies once per change.
+"""
 import logging
 
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from src.chat.models import VideoCall
-from src.chat.constants.symbolic_constants import VideoCallStatus
+from src.accounts.models import ChapianaUser
+from src.chat.contacts import invalidate_contacts
+from src.chat.lobby import invalidate_lobby
+from src.chat.membership import invalidate_room_members
+from src.chat.models import Category, ChatRoom, Conversation
 
 LOGGER =logging.getLogger(__name__)
 
-@receiver(pre_save, sender=VideoCall)
-def track_status_change(sender, instance, **kwargs):
+@receiver(m2m_changed, sender=ChatRoom.members.through)
+def invalidate_membership_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached membership snapshots and the lobby listing when room
+    members change.
+
+    From the room side `instance` is the room; from the user side it is the
+    user and `pk_set` holds room ids, or is empty on clear, in which case the
+    rooms are captured before they are cleared.
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_lobby()
+
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_room_members(instance.room_name)
+        return
+
+    if action == "pre_clear":
+        room_names = instance.chat_rooms.values_list("room_name", flat=True)
+    elif action in ("post_add", "post_remove"):
+        room_names = ChatRoom.objects.filter(pk__in=pk_set).values_list("room_name", flat=True)
+    else:
+        return
+    invalidate_room_members(*room_names)
+
+
+def _member_ids(room_ids) -> set[int]:
+    return set(ChapianaUser.objects.filter(chat_rooms__pk__in=room_ids).values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=ChatRoom.members.through)
+def invalidate_contacts_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop the cached contact sets of everyone whose room mates changed.
+
+    Clears are handled before they happen, while the members can still be
+    read.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        user_ids = _member_ids([instance.pk]) | set(pk_set or ())
+    elif action == "pre_clear":
+        user_ids = _member_ids(instance.chat_rooms.values_list("pk", flat=True)) | {instance.pk}
+    else:
+        user_ids = _member_ids(pk_set) | {instance.pk}
+    invalidate_contacts(*user_ids)
+
+
+@receiver(pre_delete, sender=ChatRoom)
+def invalidate_room_contacts(sender, instance, **kwargs):
     """
-    Track call status changes before saving.
+    Drop the cached contact sets of the members of a room being deleted.
     """
-    if instance.pk:
-        previous = VideoCall.objects.get(pk=instance.pk)
+    invalidate_contacts(*_member_ids([instance.pk]))
 
-        if previous.status != instance.status:
-            LOGGER.info(
-                f"Status changed from {previous.get_status_display()} to {instance.get_status_display()}"
-            )
-            previous.save()
+
+@receiver(pre_save, sender=ChatRoom)
+def invalidate_renamed_room(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the cached membership snapshot stored under a room's old name when
+    the room is renamed.
+    """
+    if instance.pk is None or (update_fields is not None and "room_name" not in update_fields):
+        return
+    previous = ChatRoom.objects.filter(pk=instance.pk).values_list("room_name", flat=True).first()
+    if previous is not None and previous != instance.room_name:
+        invalidate_room_members(previous)
 
 
-@receiver(post_save, sender=VideoCall)
-def call_lifecycle_handler(sender, instance, created, **kwargs):
+@receiver(post_save, sender=ChatRoom)
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_room_cache(sender, instance, **kwargs):
     """
-    Handle events after a call is saved.
+    Drop the cached membership snapshot of a saved or deleted room and the
+    lobby listing.
     """
-    if created:
-        LOGGER.info(
-            f"New call initiated between {instance.caller} and {instance.receiver}"
-        )
-        # Send notification on new call start
-        instance.notify_users()
+    invalidate_room_members(instance.room_name)
+    invalidate_lobby()
+
 
-    elif instance.status == VideoCallStatus.ENDED:
-        LOGGER.info(
-            f"Call ended between {instance.caller} and {instance.receiver}"
-        )
-        # Notify about call ending
-        instance.notify_users()
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """
+    Drop the lobby listing when a category changes.
+    """
+    invalidate_lobby()
+
+
+@receiver(post_delete, sender=Conversation)
+def forget_conversation(sender, instance, **kwargs):
+    """
+    Let a deleted conversation be created again by the next message, and
+    drop both users' cached contact sets.
+    """
+    Conversation.forget_pair(instance.low_user_id, instance.high_user_id)
+    invalidate_contacts(instance.low_user_id, instance.high_user_id)
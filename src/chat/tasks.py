@@ -1,10 +1,17 @@
 """Chapiana chat tasks."""
 import logging
+import time
 
 from celery import shared_task
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.dateparse import parse_datetime
 
+from src.chat.notifications import room_group, send_call_event
+from src.common.encoding import frame_event
 from src.common.models import BaseRetryTask
 
 LOGGER = logging.getLogger(__name__)
@@ -14,15 +21,14 @@ LOGGER = logging.getLogger(__name__)
 def notify_video_call_users(self, call_id, caller_id, receiver_id, status, date_started, date_ended, duration_seconds):
     """
     Celery task to notify users about the video call status over channels.
+
+    Calls are normally signalled straight from the web process (see
+    `src.chat.calls.notify_call_state`); this task is the durable fallback
+    when that send fails.
     """
     LOGGER.info(f"Starting notification task for VideoCall ID {call_id}.")
 
-    # WebSocket Notification
-    channel_layer = get_channel_layer()
-
     payload = {
-        # Method name in the consumer
-        "type": "video_call_status",
         "call_id": call_id,
         "caller_id": caller_id,
         "receiver_id": receiver_id,
@@ -32,15 +38,8 @@ def notify_video_call_users(self, call_id, caller_id, receiver_id, status, date_
         "duration_seconds": duration_seconds,
     }
 
-    caller_group = f"user_{caller_id}_calls"
-    receiver_group = f"user_{receiver_id}_calls"
-
     try:
-        async_to_sync(channel_layer.group_send)(caller_group, payload)
-        async_to_sync(channel_layer.group_send)(receiver_group, payload)
-
-        LOGGER.info(f"WebSocket notification sent to {caller_group} and {receiver_group}")
-
+        async_to_sync(send_call_event)(get_channel_layer(), caller_id, receiver_id, payload)
         LOGGER.info(f"Notification task for VideoCall ID {call_id} completed successfully!")
 
     except  Exception as ex:
@@ -48,4 +47,168 @@ def notify_video_call_users(self, call_id, caller_id, receiver_id, status, date_
             f"Error in notify_video_call_users task: {str(ex)}"
         )
         #  Celery autoretry will handle retrying
-        raise self.retry(ex)
+        raise self.retry(exc=ex)
+
+
+@shared_task
+def reconcile_unread_counters(chunk_size: int = 1000) -> int:
+    """
+    Celery task to repair drift between dialog unread counters and unread
+    messages. Room counters are left alone: room messages carry no
+    per-member read state to count them from.
+
+    Works through recipients in id ranges so each pass only aggregates the
+    unread rows of one range through the partial unread index. The counters
+    of a range are locked before the messages are counted, so an increment
+    or reset running concurrently waits for the repair instead of being
+    overwritten by it. Returns the number of counters fixed.
+    """
+    # Imported here: the chat models import this module.
+    from src.chat.models import Message, UnreadCounter
+
+    max_recipient = max(
+        Message.objects.filter(read=False).aggregate(top=Max("recipient_id"))["top"] or 0,
+        UnreadCounter.objects.aggregate(top=Max("recipient_id"))["top"] or 0,
+    )
+    fixed = 0
+    for start in range(0, max_recipient + 1, chunk_size):
+        in_range = {"recipient_id__gte": start, "recipient_id__lt": start + chunk_size}
+        with transaction.atomic():
+            # Locked first: the count below then sees every committed
+            # increment, and later ones wait until the repair commits.
+            stored = {
+                (counter.recipient_id, counter.sender_id): counter
+                for counter in UnreadCounter.objects.select_for_update()
+                .filter(chat_room__isnull=True, **in_range).order_by("pk")
+            }
+            actual = {
+                (row["recipient_id"], row["sender_id"]): row["total"]
+                for row in Message.objects.filter(read=False, chat_room__isnull=True, **in_range)
+                .exclude(sender_id=F("recipient_id"))
+                .values("recipient_id", "sender_id").annotate(total=Count("id"))
+            }
+            missing = [
+                UnreadCounter(recipient_id=recipient, sender_id=sender, count=total)
+                for (recipient, sender), total in actual.items()
+                if (recipient, sender) not in stored
+            ]
+            drifted = []
+            for key, counter in stored.items():
+                if counter.count != actual.get(key, 0):
+                    counter.count = actual.get(key, 0)
+                    drifted.append(counter)
+
+            UnreadCounter.objects.bulk_create(missing, ignore_conflicts=True)
+            UnreadCounter.objects.bulk_update(drifted, ["count"])
+        fixed += len(missing) + len(drifted)
+
+    LOGGER.info(f"Reconciled {fixed} unread counters.")
+    return fixed
+
+
+@shared_task(bind=True, base=BaseRetryTask)
+def clear_room_history(self, room_id, cleared_before, batch_size=None, sleep_seconds=None):
+    """
+    Celery task to delete a room's messages up to the `cleared_before`
+    watermark in primary-key-ordered batches.
+
+    Each batch is its own short statement, and the task sleeps between
+    batches, so the table is never locked for long. Progress is reported to
+    the room group. The room's unread counters are reset first, since the
+    watermark already hides every message they counted.
+    """
+    # Imported here: the chat models import this module.
+    from src.chat.models import ChatRoom, Message, UnreadCounter
+
+    batch_size = batch_size or getattr(settings, "CHAT_CLEAR_HISTORY_BATCH_SIZE", 1000)
+    if sleep_seconds is None:
+        sleep_seconds = getattr(settings, "CHAT_CLEAR_HISTORY_SLEEP", 0.1)
+
+    room_name = ChatRoom.objects.filter(pk=room_id).values_list("room_name", flat=True).first()
+    if room_name is None:
+        LOGGER.info(f"Chat room {room_id} is gone, nothing to clear.")
+        return 0
+
+    UnreadCounter.objects.filter(chat_room_id=room_id).update(count=0)
+    channel_layer = get_channel_layer()
+    group = room_group(room_name)
+    messages = Message.objects.filter(chat_room_id=room_id, created_at__lte=parse_datetime(cleared_before))
+
+    deleted = 0
+    last_pk = 0
+    while True:
+        ids = list(
+            messages.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+
+        # Keeping the created_at bound lets Postgres prune message partitions.
+        messages.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        last_pk = ids[-1]
+        async_to_sync(channel_layer.group_send)(group, frame_event({
+            "command": "clear_history_progress",
+            "deleted": deleted,
+        }, group=group))
+        time.sleep(sleep_seconds)
+
+    async_to_sync(channel_layer.group_send)(group, frame_event({
+        "command": "clear_history_done",
+        "deleted": deleted,
+    }, group=group))
+    LOGGER.info(f"Cleared {deleted} messages from chat room {room_name}.")
+    return deleted
+
+
+@shared_task
+def maintain_message_partitions() -> dict:
+    """
+    Pre-create the upcoming monthly message partitions and move partitions
+    past the retention window to the archive table.
+    """
+    # Imported here: the chat models import this module.
+    from src.chat import partitions
+
+    if not partitions.is_partitioned():
+        LOGGER.warning("Message table is not partitioned; run `manage.py message_partitions --convert`.")
+        return {"created": [], "archived": []}
+
+    created = partitions.ensure_partitions(getattr(settings, "CHAT_MESSAGE_PARTITIONS_AHEAD", 3))
+    retention = getattr(settings, "CHAT_MESSAGE_RETENTION_MONTHS", 0)
+    archived = partitions.archive_partitions(retention) if retention else []
+    return {"created": created, "archived": archived}
+
+
+@shared_task
+def remove_stale_uploads() -> int:
+    """
+    Delete partial websocket uploads that can no longer be resumed.
+    """
+    # Imported here: the uploads module imports the models.
+    from src.chat import uploads
+
+    return uploads.remove_stale_uploads()
+
+
+@shared_task
+def expire_unanswered_calls() -> int:
+    """
+    Mark calls that rang past their deadline as missed.
+    """
+    # Imported here: the chat models import this module.
+    from src.chat import call_registry
+    from src.chat.calls import InvalidTransition, notify_call_state, transition
+    from src.chat.constants.symbolic_constants import VideoCallStatus
+
+    missed = 0
+    for call_id in call_registry.overdue_calls():
+        try:
+            notify_call_state(transition(call_id, VideoCallStatus.MISSED))
+            missed += 1
+        except InvalidTransition:
+            # Answered or ended before the sweep; just drop the deadline.
+            call_registry.answered(call_id)
+    if missed:
+        LOGGER.info(f"Marked {missed} unanswered calls as missed.")
+    return missed
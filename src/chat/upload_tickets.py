@@ -0,0 +1,276 @@
+"""
+Direct-to-storage uploads.
+
+Instead of streaming attachment bytes through the ASGI workers, the client
+asks for an upload ticket, sends the file straight to the storage backend and
+then completes the ticket:
+
+    1. `issue_ticket` reserves a storage key and returns where to send the
+       file. On S3 (or a MinIO endpoint set through `AWS_S3_ENDPOINT_URL`)
+       that is a pre-signed POST limited to the declared size and content
+       type. With any other storage it is a signed PUT URL served by
+       `store_local_upload`, a stand-in for development and tests.
+    2. `complete_ticket` checks the stored object's size, registers the
+       `UploadedFile` and attaches it to a new `Message` or to a room's
+       `room_file`.
+
+The ticket is a signed token holding the key, owner and declared size, so no
+server-side state is kept between the two calls beyond a short-lived "used"
+marker in the shared cache, which makes a ticket complete only once.
+Completing a ticket only costs a HEAD request and a few inserts, whatever
+the attachment size.
+"""
+import logging
+import uuid
+from dataclasses import dataclass
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.text import get_valid_filename
+
+from src.accounts.models import ChapianaUser
+from src.chat.membership import get_room_members
+from src.chat.models import ChatRoom, Message
+from src.chat.notifications import room_group, send_to_users
+from src.chat.uploads import DEFAULT_MAX_BYTES
+from src.common.encoding import frame_event
+from src.common.models import UploadedFile
+
+LOGGER = logging.getLogger(__name__)
+
+SALT = "chat.upload_ticket"
+USED_KEY = "chat:upload_ticket:used:{}"
+DEFAULT_TICKET_TTL = 15 * 60
+TARGET_MESSAGE = "message"
+TARGET_ROOM_ICON = "room_icon"
+
+
+class UploadTicketError(Exception):
+    """
+    Raised when a ticket cannot be issued, used or completed.
+    """
+
+
+@dataclass(frozen=True)
+class UploadTicket:
+    """
+    Where and how to send a file, and the ticket that completes it.
+    """
+    ticket: str
+    key: str
+    method: str
+    url: str
+    fields: dict
+    expires_in: int
+
+
+def ticket_ttl() -> int:
+    """
+    How long an upload ticket stays valid, in seconds.
+    """
+    return getattr(settings, "CHAT_UPLOAD_TICKET_TTL", DEFAULT_TICKET_TTL)
+
+
+def _max_bytes() -> int:
+    return getattr(settings, "CHAT_UPLOAD_MAX_BYTES", DEFAULT_MAX_BYTES)
+
+
+def presigned_posts_supported() -> bool:
+    """
+    Whether the default storage is S3-compatible and can sign uploads.
+    """
+    return hasattr(default_storage, "bucket_name") and hasattr(default_storage, "connection")
+
+
+def read_ticket(ticket: str) -> dict:
+    """
+    The payload of a valid, unexpired ticket.
+    """
+    try:
+        return signing.loads(ticket, salt=SALT, max_age=ticket_ttl())
+    except signing.BadSignature as exc:
+        raise UploadTicketError("Invalid or expired upload ticket.") from exc
+
+
+def issue_ticket(user_id: int, name: str, size: int, content_type: str, local_url) -> UploadTicket:
+    """
+    Reserve a storage key for the user's file and sign the upload target.
+
+    `local_url` builds the PUT URL of the local stand-in from a ticket; it is
+    only called when the storage cannot sign uploads itself.
+    """
+    if not 0 < size <= _max_bytes():
+        raise UploadTicketError(f"File size must be between 1 and {_max_bytes()} bytes.")
+
+    filename = get_valid_filename(name) or "file"
+    key = f"user_{user_id}/{uuid.uuid4().hex}/{filename}"
+    ticket = signing.dumps(
+        {"key": key, "user_id": user_id, "size": size, "content_type": content_type},
+        salt=SALT,
+    )
+
+    if not presigned_posts_supported():
+        return UploadTicket(
+            ticket=ticket, key=key, method="PUT", url=local_url(ticket), fields={}, expires_in=ticket_ttl()
+        )
+
+    location = getattr(default_storage, "location", "")
+    object_key = f"{location.rstrip('/')}/{key}" if location else key
+    fields = {"Content-Type": content_type}
+    conditions = [["content-length-range", size, size], {"Content-Type": content_type}]
+    if getattr(default_storage, "default_acl", None):
+        fields["acl"] = default_storage.default_acl
+        conditions.append({"acl": default_storage.default_acl})
+
+    post = default_storage.connection.meta.client.generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=object_key,
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=ticket_ttl(),
+    )
+    return UploadTicket(
+        ticket=ticket, key=key, method="POST", url=post["url"], fields=post["fields"], expires_in=ticket_ttl()
+    )
+
+
+def store_local_upload(ticket: str, stream, content_length: int) -> str:
+    """
+    Save a PUT body to the key reserved by `ticket`, for storages that cannot
+    sign uploads. Returns the stored key.
+    """
+    if presigned_posts_supported():
+        raise UploadTicketError("Upload directly to storage with the pre-signed POST.")
+
+    payload = read_ticket(ticket)
+    if content_length != payload["size"]:
+        raise UploadTicketError("Content-Length does not match the declared size.")
+    if default_storage.exists(payload["key"]):
+        raise UploadTicketError("This ticket has already been used.")
+
+    return default_storage.save(payload["key"], File(stream, name=payload["key"]))
+
+
+def _register_file(payload: dict) -> UploadedFile:
+    key = payload["key"]
+    if not default_storage.exists(key):
+        raise UploadTicketError("The file has not been uploaded yet.")
+
+    size = default_storage.size(key)
+    if size != payload["size"]:
+        default_storage.delete(key)
+        raise UploadTicketError("The uploaded file does not match the declared size.")
+
+    uploaded = UploadedFile.objects.filter(file=key).first()
+    if uploaded is None:
+        uploaded = UploadedFile(uploaded_by_id=payload["user_id"])
+        uploaded.file.name = key
+        uploaded.save()
+    return uploaded
+
+
+def _broadcast(room_name: str | None, recipient_id: int | None, payload: dict) -> None:
+    channel_layer = get_channel_layer()
+    if room_name:
+        group = room_group(room_name)
+        async_to_sync(channel_layer.group_send)(group, frame_event(payload, group=group))
+    elif recipient_id:
+        async_to_sync(send_to_users)(channel_layer, [recipient_id], payload)
+
+
+def complete_ticket(
+    user: ChapianaUser,
+    ticket: str,
+    target: str,
+    room_name: str | None = None,
+    recipient_username: str | None = None,
+    message_content: str | None = None,
+):
+    """
+    Register the uploaded file of `ticket` and attach it to `target`: a new
+    message in a room or dialog, or the icon of a room.
+
+    Returns the created `Message` or the updated `ChatRoom`. A ticket can be
+    completed once; it is released again if completing it fails.
+    """
+    payload = read_ticket(ticket)
+    if payload["user_id"] != user.pk:
+        raise UploadTicketError("This upload ticket belongs to another user.")
+
+    used_key = USED_KEY.format(payload["key"])
+    if not cache.add(used_key, 1, ticket_ttl()):
+        raise UploadTicketError("This ticket has already been used.")
+    try:
+        return _complete(user, payload, target, room_name, recipient_username, message_content)
+    except Exception:
+        cache.delete(used_key)
+        raise
+
+
+def _complete(
+    user: ChapianaUser,
+    payload: dict,
+    target: str,
+    room_name: str | None,
+    recipient_username: str | None,
+    message_content: str | None,
+):
+
+    room = None
+    if room_name:
+        try:
+            members = get_room_members(room_name)
+        except ChatRoom.DoesNotExist as exc:
+            raise UploadTicketError("Room not found.") from exc
+        if not members.is_member(user.pk):
+            raise UploadTicketError("Not a member of this room.")
+        room = members.room_id
+
+    with transaction.atomic():
+        uploaded = _register_file(payload)
+
+        if target == TARGET_ROOM_ICON:
+            if room is None:
+                raise UploadTicketError("A room is required to change its icon.")
+            # Saved, not updated, so the room's post_save receivers run.
+            result = ChatRoom.objects.get(pk=room)
+            result.room_file = uploaded
+            result.save(update_fields=["room_file"])
+            transaction.on_commit(lambda: _broadcast(room_name, None, {
+                "command": "change_icon",
+                "result": {"room_image": uploaded.file.url},
+            }))
+            return result
+
+        if room is None:
+            recipient = ChapianaUser.objects.filter(username=recipient_username).first()
+            if recipient is None:
+                raise UploadTicketError("Recipient not found.")
+        else:
+            recipient = user
+
+        message = Message.objects.create(
+            chat_room_id=room,
+            sender=user,
+            recipient=recipient,
+            message_content=message_content,
+            file=uploaded,
+        )
+        transaction.on_commit(lambda: _broadcast(room_name, None if room else recipient.pk, {
+            "command": "file",
+            "result": {
+                "__str__": user.username,
+                "content": message_content,
+                "file": uploaded.file.url,
+                "created_at": message.created_at.isoformat(),
+            },
+        }))
+
+    LOGGER.info(f"Attached upload {payload['key']} for user {user.pk} to {target}.")
+    return message
@@ -0,0 +1,284 @@
+"""
+Chunked file uploads over the chat websocket.
+
+Files are sent as binary websocket frames instead of base64 data URIs inside
+JSON, so nothing is inflated by a third and no frame holds the whole file:
+
+    1. The client sends `{"command": "upload_start", "name", "size",
+       "sha256"}` (plus `upload_id` to resume) and receives `upload_ready`
+       with the `upload_id` and the `offset` to continue from.
+    2. It sends binary frames of `HEADER` (upload id, offset, CRC32 of the
+       chunk) followed by the chunk bytes. Each accepted chunk is appended to
+       a temporary file and acknowledged with `upload_ack` and the new offset.
+    3. It references the `upload_id` in `new_message` or `change_icon`; the
+       server checks the size and SHA-256, streams the temporary file to
+       storage and creates the `UploadedFile`.
+
+Upload state lives in the shared cache and the received bytes in
+`CHAT_UPLOAD_DIR`, so an upload can resume after a reconnect. With several
+ASGI workers that directory must be shared between them. Writes to one
+upload take a short lock in the shared cache, so chunks arriving on two
+sockets cannot both pass the offset check. A completed upload remembers its
+`UploadedFile`, and completing it again returns that file. Partial files
+whose state expired are removed by `remove_stale_uploads`.
+"""
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.utils.text import get_valid_filename
+
+from src.common.models import UploadedFile
+
+LOGGER = logging.getLogger(__name__)
+
+# 16-byte upload id, 8-byte offset, 4-byte CRC32 of the chunk.
+HEADER = struct.Struct(">16sQI")
+CACHE_KEY = "chat:upload:{}"
+LOCK_KEY = "chat:upload:{}:lock"
+DONE_KEY = "chat:upload:{}:done"
+LOCK_TIMEOUT = 60
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_TIMEOUT = 24 * 60 * 60
+READ_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """
+    Raised when an upload request or chunk cannot be accepted.
+    """
+    def __init__(self, message: str, upload_id: str | None = None, offset: int | None = None):
+        super().__init__(message, upload_id, offset)
+        self.message = message
+        self.upload_id = upload_id
+        self.offset = offset
+
+    def __str__(self):
+        return self.message
+
+
+@dataclass(frozen=True)
+class UploadState:
+    """
+    An upload in progress, owned by one user.
+    """
+    upload_id: str
+    user_id: int
+    name: str
+    size: int
+    sha256: str | None = None
+
+    @property
+    def path(self) -> str:
+        """
+        Where the received bytes are stored until the upload completes.
+        """
+        return os.path.join(upload_dir(), f"{self.upload_id}.part")
+
+    @property
+    def offset(self) -> int:
+        """
+        The number of bytes received so far.
+        """
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+
+def upload_dir() -> str:
+    """
+    The directory holding partial uploads.
+    """
+    return getattr(settings, "CHAT_UPLOAD_DIR", None) or os.path.join(tempfile.gettempdir(), "chapiana_uploads")
+
+
+def upload_timeout() -> int:
+    """
+    Seconds an idle upload can still be resumed.
+    """
+    return getattr(settings, "CHAT_UPLOAD_TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def _save_state(state: UploadState) -> None:
+    cache.set(CACHE_KEY.format(state.upload_id), asdict(state), upload_timeout())
+
+
+@contextmanager
+def _locked(upload_id: str):
+    """
+    Hold the upload's lock, or refuse at once if another socket has it.
+    """
+    key = LOCK_KEY.format(upload_id)
+    if not cache.add(key, 1, LOCK_TIMEOUT):
+        raise UploadError("Upload is busy; retry shortly.", upload_id)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+def _discard(state: UploadState) -> None:
+    cache.delete(CACHE_KEY.format(state.upload_id))
+    try:
+        os.remove(state.path)
+    except FileNotFoundError:
+        pass
+
+
+def get_upload(user_id: int, upload_id: str) -> UploadState:
+    """
+    The state of the user's upload `upload_id`.
+    """
+    data = cache.get(CACHE_KEY.format(upload_id))
+    if data is None or data["user_id"] != user_id:
+        raise UploadError("Unknown or expired upload.", upload_id)
+    return UploadState(**data)
+
+
+def start_upload(
+    user_id: int,
+    name: str,
+    size: int,
+    sha256: str | None = None,
+    upload_id: str | None = None,
+) -> UploadState:
+    """
+    Register a new upload, or return the state of the one being resumed.
+    """
+    if upload_id:
+        return get_upload(user_id, upload_id)
+
+    max_bytes = getattr(settings, "CHAT_UPLOAD_MAX_BYTES", DEFAULT_MAX_BYTES)
+    if not isinstance(size, int) or not 0 < size <= max_bytes:
+        raise UploadError(f"File size must be between 1 and {max_bytes} bytes.")
+
+    state = UploadState(
+        upload_id=str(uuid.uuid4()),
+        user_id=user_id,
+        name=get_valid_filename(os.path.basename(name or "")) or "file",
+        size=size,
+        sha256=sha256.lower() if sha256 else None,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(state.path, "wb").close()
+    _save_state(state)
+    return state
+
+
+def write_chunk(user_id: int, frame: bytes) -> UploadState:
+    """
+    Append the chunk in a binary frame to its upload.
+
+    The chunk must start at the current offset and match its CRC32; on a
+    mismatch the error carries the offset the client should resend from.
+    """
+    if len(frame) <= HEADER.size:
+        raise UploadError("Malformed upload frame.")
+
+    raw_id, offset, crc = HEADER.unpack_from(frame)
+    upload_id = str(uuid.UUID(bytes=raw_id))
+    chunk = memoryview(frame)[HEADER.size:]
+
+    with _locked(upload_id):
+        state = get_upload(user_id, upload_id)
+        expected = state.offset
+        if offset != expected:
+            raise UploadError("Unexpected offset.", upload_id, expected)
+        if zlib.crc32(chunk) != crc:
+            raise UploadError("Checksum mismatch.", upload_id, expected)
+        if expected + len(chunk) > state.size:
+            raise UploadError("Upload exceeds its declared size.", upload_id, expected)
+
+        with open(state.path, "ab") as handle:
+            handle.write(chunk)
+        # Refresh the timeout so an active upload does not expire mid-way.
+        _save_state(state)
+    return state
+
+
+def cancel_upload(user_id: int, upload_id: str) -> None:
+    """
+    Drop an upload and its received bytes.
+    """
+    with _locked(upload_id):
+        _discard(get_upload(user_id, upload_id))
+
+
+def complete_upload(user_id: int, upload_id: str) -> UploadedFile:
+    """
+    Verify a fully received upload and store it as an `UploadedFile`.
+
+    The temporary file is hashed and copied to storage in fixed-size reads,
+    so memory use does not depend on the file size. Completing an upload
+    again returns the file stored the first time.
+    """
+    with _locked(upload_id):
+        done = cache.get(DONE_KEY.format(upload_id))
+        if done is not None and done["user_id"] == user_id:
+            return UploadedFile.objects.get(pk=done["file_id"])
+
+        state = get_upload(user_id, upload_id)
+        if state.offset != state.size:
+            raise UploadError("Upload is incomplete.", upload_id, state.offset)
+
+        digest = hashlib.sha256()
+        with open(state.path, "rb") as handle:
+            for block in iter(lambda: handle.read(READ_SIZE), b""):
+                digest.update(block)
+        if state.sha256 and digest.hexdigest() != state.sha256:
+            _discard(state)
+            raise UploadError("SHA-256 mismatch; the upload was discarded.", upload_id)
+
+        uploaded = UploadedFile(uploaded_by_id=user_id)
+        with open(state.path, "rb") as handle:
+            uploaded.file.save(state.name, File(handle), save=True)
+
+        cache.set(DONE_KEY.format(upload_id), {"user_id": user_id, "file_id": uploaded.pk}, upload_timeout())
+        _discard(state)
+    LOGGER.info(f"Stored upload {upload_id} ({state.size} bytes) for user {user_id}.")
+    return uploaded
+
+
+def remove_stale_uploads() -> int:
+    """
+    Delete partial files whose upload state has expired from the cache.
+    Returns the number of files removed.
+
+    Files touched within the last `LOCK_TIMEOUT` seconds are kept, so an
+    upload being started is not removed before its state is saved.
+    """
+    try:
+        names = [name for name in os.listdir(upload_dir()) if name.endswith(".part")]
+    except FileNotFoundError:
+        return 0
+
+    upload_ids = [name.removesuffix(".part") for name in names]
+    live = cache.get_many([CACHE_KEY.format(upload_id) for upload_id in upload_ids])
+    cutoff = time.time() - LOCK_TIMEOUT
+    removed = 0
+    for upload_id in upload_ids:
+        if CACHE_KEY.format(upload_id) in live:
+            continue
+        path = os.path.join(upload_dir(), f"{upload_id}.part")
+        try:
+            if os.path.getmtime(path) > cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+
+    if removed:
+        LOGGER.info(f"Removed {removed} expired partial uploads.")
+    return removed
@@ -0,0 +1,24 @@
+from django.urls import include, path
+
+from rest_framework.routers import DefaultRouter
+from src.chat.views import (
+    InboxViewSet,
+    LobbyViewSet,
+    MessageHistoryViewSet,
+    MessageSearchViewSet,
+    UploadTicketViewSet,
+)
+
+
+router = DefaultRouter()
+router.register(r"history", MessageHistoryViewSet, basename="message-history")
+router.register(r"inbox", InboxViewSet, basename="inbox")
+router.register(r"lobby", LobbyViewSet, basename="lobby")
+router.register(r"search", MessageSearchViewSet, basename="message-search")
+router.register(r"uploads", UploadTicketViewSet, basename="upload-ticket")
+
+app_name = "chat"
+
+urlpatterns = [
+    path("chat/", include(router.urls)),
+]
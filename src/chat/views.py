@@ -1,3 +1,322 @@
-from django.shortcuts import render
+"""
+This module defines API viewsets for chat.
+"""
 
-# Create your views here.
+from dataclasses import asdict
+
+from django.urls import reverse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+
+from src.accounts.models import ChapianaUser
+from src.chat.history import dialog_history, page_size, room_history
+from src.chat.inbox import get_inbox
+from src.chat.lobby import etag_matches, get_lobby
+from src.chat.membership import get_room_members
+from src.chat.models import ChatRoom, UnreadCounter
+from src.chat.search import search_messages
+from src.chat.serializers import (
+    ConversationTargetSerializer,
+    HistoryQuerySerializer,
+    MessageSearchResultSerializer,
+    MessageSerializer,
+    SearchQuerySerializer,
+    UploadTicketCompleteSerializer,
+    UploadTicketRequestSerializer,
+)
+from src.chat.upload_tickets import (
+    TARGET_ROOM_ICON,
+    UploadTicketError,
+    complete_ticket,
+    issue_ticket,
+    store_local_upload,
+)
+from src.common.pagination import InvalidCursor
+
+
+class MessageHistoryViewSet(viewsets.GenericViewSet):
+    """
+    A viewset for reading message history, newest first.
+
+    Supports:
+    - `?room=<room_name>` for a chat room the user belongs to.
+    - `?user=<username>` for the direct messages with another user.
+    - `?cursor=<next_cursor>` to continue from the previous page.
+    - `?archived=true` to continue into archived messages after recent ones.
+    - Marking a room or dialog read.
+    """
+    serializer_class = MessageSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post']
+
+    def list(self, request):
+        """
+        Handles GET requests.
+
+        Returns:
+            - 200 OK with `results` and the `next_cursor`, null on the last page.
+            - 400 Bad Request if the query or cursor is invalid.
+            - 403 Forbidden if the user is not a member of the room.
+            - 404 Not Found if the room or user does not exist.
+        """
+        query = HistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response({'status': 400, 'errors': query.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = query.validated_data
+        cursor = data.get('cursor')
+        size = page_size(data.get('page_size'))
+        archived = data.get('archived', False)
+
+        try:
+            if data.get('room'):
+                try:
+                    members = get_room_members(data['room'])
+                except ChatRoom.DoesNotExist:
+                    return Response({'status': 404, 'message': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+
+                if not members.is_member(request.user.id):
+                    return Response({'status': 403, 'message': 'Not a member of this room'}, status=status.HTTP_403_FORBIDDEN)
+                page = room_history(members.room_id, cursor, size, members.cleared_before, archived)
+            else:
+                peer_id = ChapianaUser.objects.filter(username=data['user']).values_list('pk', flat=True).first()
+                if peer_id is None:
+                    return Response({'status': 404, 'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+                page = dialog_history(request.user.id, peer_id, cursor, size, archived)
+        except InvalidCursor:
+            return Response({'status': 400, 'message': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 200,
+            'results': self.get_serializer(page.messages, many=True).data,
+            'next_cursor': page.next_cursor,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """
+        Marks every unread message of a room or dialog read and resets its
+        unread counter.
+
+        Expects either 'room' or 'user' in the request data.
+
+        Returns:
+            - 200 OK with the number of messages marked read.
+            - 400 Bad Request if neither or both are given.
+            - 404 Not Found if the room or user does not exist.
+        """
+        serializer = ConversationTargetSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 400, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        if data.get('room'):
+            try:
+                room_id = get_room_members(data['room']).room_id
+            except ChatRoom.DoesNotExist:
+                return Response({'status': 404, 'message': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+            updated = UnreadCounter.mark_read(request.user.id, chat_room=room_id)
+        else:
+            peer_id = ChapianaUser.objects.filter(username=data['user']).values_list('pk', flat=True).first()
+            if peer_id is None:
+                return Response({'status': 404, 'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+            updated = UnreadCounter.mark_read(request.user.id, sender=peer_id)
+
+        return Response({'status': 200, 'updated': updated}, status=status.HTTP_200_OK)
+
+
+class InboxViewSet(viewsets.GenericViewSet):
+    """
+    A viewset for the user's inbox: every direct conversation with the
+    peer's profile, the last message preview and the unread count.
+    """
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get']
+
+    def list(self, request):
+        """
+        Handles GET requests, most recent activity first.
+
+        Accepts `cursor` and `page_size` in the query string.
+
+        Returns:
+            - 200 OK with `results` and the `next_cursor`, null on the last page.
+            - 400 Bad Request if the cursor is invalid.
+        """
+        try:
+            size = int(request.query_params.get('page_size', 0)) or None
+            page = get_inbox(request.user.id, request.query_params.get('cursor'), size)
+        except (InvalidCursor, ValueError):
+            return Response({'status': 400, 'message': 'Invalid cursor or page size'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 200,
+            'results': page.entries,
+            'next_cursor': page.next_cursor,
+        }, status=status.HTTP_200_OK)
+
+
+class LobbyViewSet(viewsets.GenericViewSet):
+    """
+    A viewset for the lobby: every chat room grouped by category, with
+    member and online counts.
+    """
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get']
+
+    def list(self, request):
+        """
+        Handles GET requests.
+
+        Accepts `country`, `chat_type` and `user_package` in the query string
+        to narrow the categories, and `If-None-Match` to revalidate.
+
+        Returns:
+            - 200 OK with the category `groups` and an `ETag` header.
+            - 304 Not Modified if the client's ETag is still current.
+        """
+        lobby = get_lobby()
+        filters = {key: request.query_params.get(key) or None for key in ('country', 'chat_type', 'user_package')}
+        etag = lobby.etag_for(**filters)
+        if etag_matches(etag, request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        groups = lobby.filtered(**filters)
+        return Response({'status': 200, 'groups': groups}, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+class MessageSearchViewSet(viewsets.GenericViewSet):
+    """
+    A viewset for full-text search over the messages of the user's dialogs
+    and rooms, best match first.
+    """
+    serializer_class = MessageSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get']
+
+    def list(self, request):
+        """
+        Handles GET requests.
+
+        Expects `q` in the query string and accepts `cursor` and `page_size`.
+
+        Returns:
+            - 200 OK with ranked `results`, each with a highlighted `headline`,
+              and the `next_cursor`, null on the last page.
+            - 400 Bad Request if the query or cursor is invalid.
+        """
+        query = SearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response({'status': 400, 'errors': query.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = query.validated_data
+        try:
+            page = search_messages(request.user.id, data['q'], data.get('cursor'), data.get('page_size'))
+        except InvalidCursor:
+            return Response({'status': 400, 'message': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 200,
+            'results': self.get_serializer(page.messages, many=True).data,
+            'next_cursor': page.next_cursor,
+        }, status=status.HTTP_200_OK)
+
+
+class UploadTicketViewSet(viewsets.GenericViewSet):
+    """
+    A viewset for direct-to-storage attachment uploads.
+
+    Supports:
+    - POST to get an upload ticket and the pre-signed target to send the file to.
+    - POST `complete/` to attach the uploaded file to a message or room icon.
+    - PUT `local/<ticket>/`, the upload target when storage cannot sign uploads.
+    """
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['post', 'put']
+
+    def create(self, request):
+        """
+        Handles POST requests.
+
+        Expects 'name', 'size' and optionally 'content_type' in the request data.
+
+        Returns:
+            - 201 Created with the `ticket`, the upload `method`, `url` and form `fields`.
+            - 400 Bad Request if the data is invalid or the file is too large.
+        """
+        serializer = UploadTicketRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 400, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        try:
+            ticket = issue_ticket(
+                request.user.id,
+                data['name'],
+                data['size'],
+                data['content_type'],
+                lambda token: request.build_absolute_uri(reverse('chat:upload-ticket-local', args=[token])),
+            )
+        except UploadTicketError as exc:
+            return Response({'status': 400, 'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'status': 201, **asdict(ticket)}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def complete(self, request):
+        """
+        Registers the uploaded file and attaches it.
+
+        Expects the 'ticket' and a 'target': 'message' with either 'room' or
+        'user' (and optional 'message_content'), or 'room_icon' with 'room'.
+
+        Returns:
+            - 201 Created with the message or the new room image.
+            - 400 Bad Request if the ticket, upload or target is invalid.
+        """
+        serializer = UploadTicketCompleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 400, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        try:
+            result = complete_ticket(
+                request.user,
+                data['ticket'],
+                data['target'],
+                data.get('room'),
+                data.get('user'),
+                data.get('message_content'),
+            )
+        except UploadTicketError as exc:
+            return Response({'status': 400, 'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if data['target'] == TARGET_ROOM_ICON:
+            return Response({'status': 201, 'room_image': result.room_file.file.url}, status=status.HTTP_201_CREATED)
+        return Response({'status': 201, 'message': MessageSerializer(result).data}, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=['put'],
+        url_path=r'local/(?P<ticket>[^/]+)',
+        url_name='local',
+        permission_classes=[AllowAny],
+        authentication_classes=[],
+    )
+    def local(self, request, ticket=None):
+        """
+        Stores the request body under the ticket's key. The signed ticket in
+        the URL is the credential, like a pre-signed S3 URL.
+
+        Returns:
+            - 204 No Content once the file is stored.
+            - 400 Bad Request if the ticket is invalid, used, or the size differs.
+        """
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+            store_local_upload(ticket, request.stream, content_length)
+        except (UploadTicketError, ValueError) as exc:
+            return Response({'status': 400, 'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
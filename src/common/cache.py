@@ -0,0 +1,73 @@
+"""
+In-process caching helpers.
+
+`LocalCache` is the first tier in front of Django's shared (Redis) cache:
+a bounded, thread-safe LRU whose entries optionally expire after a TTL, so
+a hot lookup costs a dict access instead of a network round-trip.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    Thread-safe LRU cache with optional per-entry expiry.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def get(self, key, default=None):
+        """
+        The cached value for `key`, or `default` when absent or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        """
+        Store `value`, evicting the least recently used entry when full.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys) -> None:
+        """
+        Drop the given keys if present.
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._data.clear()
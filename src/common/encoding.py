@@ -0,0 +1,87 @@
+"""
+JSON encoding for outbound websocket frames.
+
+Frames are encoded once by the sender and shipped through the channel layer
+as text, so every recipient socket only forwards a string. The fastest
+installed encoder is used: orjson, then msgspec, then the standard library.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional speed-up
+    msgspec = None
+
+
+def _default(obj):
+    """
+    Encode the values the standard library cannot, the same way orjson does.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (uuid.UUID, decimal.Decimal)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    ENCODER = "orjson"
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_default)
+
+    loads = orjson.loads
+
+elif msgspec is not None:  # pragma: no cover - depends on the environment
+    ENCODER = "msgspec"
+    _msgspec_encoder = msgspec.json.Encoder(enc_hook=_default)
+
+    def dumps_bytes(obj) -> bytes:
+        return _msgspec_encoder.encode(obj)
+
+    loads = msgspec.json.decode
+
+else:  # pragma: no cover - depends on the environment
+    ENCODER = "json"
+
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+def dumps(obj) -> str:
+    """
+    Encode `obj` as a JSON string ready for a websocket text frame.
+    """
+    return dumps_bytes(obj).decode()
+
+
+def frame_event(payload: dict, handler: str = "chat_frame", group: str | None = None) -> dict:
+    """
+    Build a channel layer event that carries `payload` pre-encoded.
+
+    `handler` is the consumer method that forwards the frame to its socket.
+    `group` names the group the event is sent to, so a socket subscribed to
+    several groups can tell which stream the frame belongs to.
+    """
+    event = {"type": handler, "text": dumps(payload)}
+    if group is not None:
+        event["group"] = group
+    return event
+
+
+def stream_frame(stream: str, text: str) -> str:
+    """
+    Wrap an encoded frame in a `{"stream": ..., "payload": ...}` envelope
+    without decoding it again.
+    """
+    return f'{{"stream":{dumps(stream)},"payload":{text}}}'
@@ -0,0 +1,99 @@
+"""
+In-process metrics for Chapiana.
+
+Counters and observations are kept per process so hot paths can record what
+they do without a network round-trip. Exporters (logs, admin, Prometheus)
+read a point-in-time copy through `snapshot`.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class Observation:
+    """
+    Aggregate of the values observed for a single metric.
+    """
+    count: int = 0
+    total: float = 0.0
+    last: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        """
+        The average observed value.
+        """
+        return self.total / self.count if self.count else 0.0
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters and observations.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._observations: dict[str, Observation] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increase a counter by `value`.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record one observed value, e.g. a batch size or a latency.
+        """
+        with self._lock:
+            observation = self._observations.setdefault(name, Observation())
+            observation.count += 1
+            observation.total += value
+            observation.last = value
+            observation.max = max(observation.max, value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Observe the wall-clock seconds spent inside the block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def counter(self, name: str) -> int:
+        """
+        The current value of a counter.
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """
+        A copy of every counter and observation.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "observations": {
+                    name: Observation(**vars(observation))
+                    for name, observation in self._observations.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """
+        Drop every recorded value.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+METRICS = MetricsRegistry()
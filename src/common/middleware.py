@@ -1,11 +1,13 @@
-
 """Middleware for Auto Tracking users online status based on requests."""
-from django.utils import timezone
+from src.accounts import presence
+
 
 class ChapianaActiveUserMiddleware:
     """
     Middleware to track user activity on each request and mark them as online.
-    It also updates their last seen time.
+
+    Activity goes to the Redis presence service, which writes at most once
+    per user per `PRESENCE_WRITE_INTERVAL`; the database is updated in bulk.
     """
     def __init__(self, get_response):
         """
@@ -15,13 +17,10 @@ class ChapianaActiveUserMiddleware:
 
     def __call__(self, request):
         """"
-        Processes each HTTP request and updates the user's online status and last seen timestamp.
+        Processes each HTTP request and records the user's activity.
         """
         if request.user.is_authenticated:
-            if hasattr(request.user, "status"):
-                request.user.status.is_online = True
-                request.user.status.was_online = timezone.now()
-                request.user.status.save(update_field=["is_online", "was_online"])
+            presence.touch(request.user.pk)
 
         response = self.get_response(request)
         return response
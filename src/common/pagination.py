@@ -0,0 +1,39 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, encoded as an opaque
+URL-safe string. The next page is read with `WHERE key < cursor`, so deep
+pages cost the same as the first one instead of an OFFSET scan.
+"""
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a client sends a cursor that was not produced by `encode_cursor`.
+    """
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encode the sort key values of a row as an opaque cursor.
+    """
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Decode a cursor into its `size` sort key values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError as exc:
+        # binascii.Error, UnicodeDecodeError and JSONDecodeError are all ValueErrors.
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from exc
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return values
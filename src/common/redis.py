@@ -0,0 +1,20 @@
+"""
+Direct Redis access.
+
+Django's cache API covers plain get/set, but registries that need sets,
+sorted sets, pipelines or scripts talk to Redis through one shared client.
+"""
+from functools import cache
+
+import redis
+from django.conf import settings
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/1"
+
+
+@cache
+def get_redis() -> redis.Redis:
+    """
+    The process-wide client for `REDIS_URL`, with responses decoded to str.
+    """
+    return redis.Redis.from_url(getattr(settings, "REDIS_URL", DEFAULT_REDIS_URL), decode_responses=True)
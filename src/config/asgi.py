@@ -6,11 +6,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 """
 import os
 
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from configurations.asgi import get_asgi_application
 
+from src.accounts.ws_auth import TokenAuthMiddleware
 from src.chat import routing
 
 
@@ -31,7 +31,7 @@ os.environ.setdefault("DJANGO_CONFIGURATION", DJANGO_ENV.capitalize())
 application = ProtocolTypeRouter(
    { 
        "http": get_asgi_application(),
-       "websocket": AuthMiddlewareStack(
+       "websocket": TokenAuthMiddleware(
            URLRouter(
                routing.websocket_urlpatterns
            )
@@ -23,6 +23,7 @@ class Common(Configuration):
         "django.contrib.sessions",
         "django.contrib.messages",
         "django.contrib.staticfiles",
+        "django.contrib.postgres",
         
         # Third party apps
         "daphne",
@@ -51,7 +52,7 @@ class Common(Configuration):
         "django.contrib.auth.middleware.AuthenticationMiddleware",
         "django.contrib.messages.middleware.MessageMiddleware",
         "django.middleware.clickjacking.XFrameOptionsMiddleware",
-        "src.common.middleware.",
+        "src.common.middleware.ChapianaActiveUserMiddleware",
     )
 
     CORS_ALLOWED_ORIGINS = [
@@ -125,6 +126,7 @@ class Common(Configuration):
                     "django.template.context_processors.request",
                     "django.contrib.auth.context_processors.auth",
                     "django.contrib.messages.context_processors.messages",
+                    "src.chat.context_processors.lobby",
                 ],
             },
         },
@@ -261,3 +263,114 @@ class Common(Configuration):
         ),
     )
     CELERYBEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+    CELERY_BEAT_SCHEDULE = {
+        "reconcile-unread-counters": {
+            "task": "src.chat.tasks.reconcile_unread_counters",
+            "schedule": timedelta(hours=1),
+        },
+        "maintain-message-partitions": {
+            "task": "src.chat.tasks.maintain_message_partitions",
+            "schedule": timedelta(days=1),
+        },
+        "flush-presence": {
+            "task": "src.accounts.tasks.flush_presence",
+            "schedule": timedelta(minutes=1),
+        },
+        "expire-unanswered-calls": {
+            "task": "src.chat.tasks.expire_unanswered_calls",
+            "schedule": timedelta(seconds=10),
+        },
+        "remove-stale-uploads": {
+            "task": "src.chat.tasks.remove_stale_uploads",
+            "schedule": timedelta(hours=1),
+        },
+    }
+
+    # Redis backed cache and channel layer
+    REDIS_URL = env.str("REDIS_URL", "redis://localhost:6379/1")
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+
+    # Presence: seconds a user stays online after their last heartbeat, and
+    # the shortest gap between two presence writes for one user per process
+    PRESENCE_TTL = env.int("PRESENCE_TTL", 90)
+    PRESENCE_WRITE_INTERVAL = env.int("PRESENCE_WRITE_INTERVAL", 30)
+
+    # Seconds a user's last connection must stay closed before their
+    # contacts are told they went offline
+    PRESENCE_DEBOUNCE_SECONDS = env.int("PRESENCE_DEBOUNCE_SECONDS", 5)
+
+    # Websocket tokens: seconds a token is accepted
+    WS_TOKEN_TTL = env.int("WS_TOKEN_TTL", 60)
+
+    # User lookups by id and username: seconds a user is cached per process,
+    # and in the shared cache
+    IDENTITY_LOCAL_TTL = env.int("IDENTITY_LOCAL_TTL", 30)
+    IDENTITY_CACHE_TIMEOUT = env.int("IDENTITY_CACHE_TIMEOUT", 60 * 60)
+
+    # Largest page of message history and of the inbox
+    MESSAGES_PAGINATION = env.int("MESSAGES_PAGINATION", 250)
+    DIALOGS_PAGINATION = env.int("DIALOGS_PAGINATION", 50)
+
+    # Chat room membership cache (seconds)
+    CHAT_MEMBERSHIP_LOCAL_TTL = env.int("CHAT_MEMBERSHIP_LOCAL_TTL", 5)
+    CHAT_MEMBERSHIP_CACHE_TIMEOUT = env.int("CHAT_MEMBERSHIP_CACHE_TIMEOUT", 60 * 60)
+
+    # Cached contact sets used for presence fan-out (seconds)
+    CHAT_CONTACTS_LOCAL_TTL = env.int("CHAT_CONTACTS_LOCAL_TTL", 5)
+    CHAT_CONTACTS_CACHE_TIMEOUT = env.int("CHAT_CONTACTS_CACHE_TIMEOUT", 60 * 60)
+
+    # Merge notification bursts per room and user; 0 sends every message
+    CHAT_NOTIFICATION_COALESCE_MS = env.int("CHAT_NOTIFICATION_COALESCE_MS", 0)
+
+    # Background history clearing: rows per delete and pause between batches
+    CHAT_CLEAR_HISTORY_BATCH_SIZE = env.int("CHAT_CLEAR_HISTORY_BATCH_SIZE", 1000)
+    CHAT_CLEAR_HISTORY_SLEEP = env.float("CHAT_CLEAR_HISTORY_SLEEP", 0.1)
+
+    # Monthly message partitions created ahead, and months kept in the hot
+    # table before a partition moves to the archive (0 keeps everything hot)
+    CHAT_MESSAGE_PARTITIONS_AHEAD = env.int("CHAT_MESSAGE_PARTITIONS_AHEAD", 3)
+    CHAT_MESSAGE_RETENTION_MONTHS = env.int("CHAT_MESSAGE_RETENTION_MONTHS", 0)
+
+    # Text search configuration used to index and query message content
+    CHAT_SEARCH_CONFIG = env.str("CHAT_SEARCH_CONFIG", "simple")
+
+    # Chunked websocket uploads: partial files (shared between ASGI workers),
+    # size limit and how long an idle upload can be resumed
+    CHAT_UPLOAD_DIR = env.str("CHAT_UPLOAD_DIR", "")
+    CHAT_UPLOAD_MAX_BYTES = env.int("CHAT_UPLOAD_MAX_BYTES", 50 * 1024 * 1024)
+    CHAT_UPLOAD_TIMEOUT = env.int("CHAT_UPLOAD_TIMEOUT", 24 * 60 * 60)
+
+    # Lobby listing: seconds kept per process and in the shared cache
+    CHAT_LOBBY_LOCAL_TTL = env.int("CHAT_LOBBY_LOCAL_TTL", 5)
+    CHAT_LOBBY_CACHE_TIMEOUT = env.int("CHAT_LOBBY_CACHE_TIMEOUT", 30)
+
+    # Lifetime in seconds of direct-to-storage upload tickets
+    CHAT_UPLOAD_TICKET_TTL = env.int("CHAT_UPLOAD_TICKET_TTL", 15 * 60)
+
+    # Chat write-behind persistence: flush after N messages or M milliseconds,
+    # and write a message on its own after it failed in K batches
+    CHAT_MESSAGE_BUFFER_SIZE = env.int("CHAT_MESSAGE_BUFFER_SIZE", 100)
+    CHAT_MESSAGE_FLUSH_INTERVAL_MS = env.int("CHAT_MESSAGE_FLUSH_INTERVAL_MS", 250)
+    CHAT_MESSAGE_FLUSH_MAX_ATTEMPTS = env.int("CHAT_MESSAGE_FLUSH_MAX_ATTEMPTS", 5)
+
+    # Seconds a live call's signaling session is kept in the shared cache
+    CHAT_CALL_SESSION_TIMEOUT = env.int("CHAT_CALL_SESSION_TIMEOUT", 2 * 60 * 60)
+
+    # Most streams one multiplexed socket (ws/stream/) may subscribe to
+    CHAT_STREAM_MAX_SUBSCRIPTIONS = env.int("CHAT_STREAM_MAX_SUBSCRIPTIONS", 100)
+
+    # Active-call registry: seconds an entry lives without a heartbeat, and
+    # how long a call rings before it is marked missed
+    CHAT_CALL_HEARTBEAT_TTL = env.int("CHAT_CALL_HEARTBEAT_TTL", 60)
+    CHAT_CALL_RING_TIMEOUT = env.int("CHAT_CALL_RING_TIMEOUT", 45)
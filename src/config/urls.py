@@ -12,10 +12,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 app_name = "chapiana"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include('src.chat.urls')),
 ]
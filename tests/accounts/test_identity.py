@@ -0,0 +1,159 @@
+"""
+Test Module for the Identity Cache.
+
+These tests cover looking users up through the local and shared tiers,
+caching only a projection of the user, resolving many usernames at once,
+dropping renamed users and deferring the signal's invalidation to commit.
+The shared cache is a dictionary and users come from a mock manager.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.accounts import identity, signals
+
+
+class FakeCache(dict):
+    """
+    The subset of Django's cache API used by the identity cache.
+    """
+
+    def get_many(self, keys):
+        return {key: self[key] for key in keys if key in self}
+
+    def set_many(self, mapping, timeout=None):
+        self.update(mapping)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.pop(key, None)
+
+
+class TestIdentityCache:
+    """
+    Test class for `get_user`, `get_user_by_username`, `get_user_ids` and
+    `invalidate_user`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Start from empty tiers, with one user in the mock database.
+        """
+        identity._USERS.clear()
+        identity._USER_IDS.clear()
+        self.cache = patch("src.accounts.identity.cache", FakeCache()).start()
+        self.row = SimpleNamespace(
+            pk=1, username="alice", is_active=True, password="pbkdf2$secret",
+            get_session_auth_hash=lambda: "a" * 64,
+        )
+        self.user = identity.CachedUser(id=1, username="alice", is_active=True, auth_hash="a" * 16)
+        self.objects = patch("src.accounts.identity.ChapianaUser").start().objects
+        self.objects.filter.return_value.first.return_value = self.row
+        self.objects.filter.return_value.values_list.return_value = [("alice", 1)]
+        yield
+        patch.stopall()
+
+    def test_lookups_fill_both_tiers(self):
+        """
+        A miss is read from the database once; later lookups by id or
+        username are served from the caches.
+        """
+        assert identity.get_user_by_username("alice") == self.user
+        assert identity.get_user(1) == self.user
+        assert identity.get_user_by_username("alice") == self.user
+
+        self.objects.filter.assert_called_once_with(username="alice")
+        assert self.cache[identity.ID_KEY.format(1)] == self.user
+
+    def test_caches_no_password_hash(self):
+        """
+        Only the projection is cached, not the user row and its password.
+        """
+        identity.get_user(1)
+
+        assert "pbkdf2$secret" not in repr(self.cache)
+        assert isinstance(self.cache[identity.ID_KEY.format(1)], identity.CachedUser)
+
+    def test_non_local_lookups_skip_the_local_tier(self):
+        """
+        A lookup with `local=False` does not trust this process's copy.
+        """
+        identity.get_user(1)
+        self.cache[identity.ID_KEY.format(1)] = identity.CachedUser(1, "alice", False, "a" * 16)
+
+        assert identity.get_user(1).is_active
+        assert not identity.get_user(1, local=False).is_active
+
+    def test_shared_tier_serves_other_processes(self):
+        """
+        A user missing locally is read from the shared cache, not the
+        database.
+        """
+        identity.get_user(1)
+        identity._USERS.clear()
+        identity._USER_IDS.clear()
+
+        assert identity.get_user_by_username("alice") == self.user
+        self.objects.filter.assert_called_once_with(pk=1)
+
+    def test_get_user_ids_queries_only_unknown_usernames(self):
+        """
+        Cached usernames are resolved without a query; the rest in one.
+        """
+        self.cache[identity.USERNAME_KEY.format("bob")] = 2
+
+        assert identity.get_user_ids(["alice", "bob", "alice"]) == {"alice": 1, "bob": 2}
+        self.objects.filter.assert_called_once_with(username__in=["alice"])
+
+        self.objects.filter.reset_mock()
+        assert identity.get_user_ids(["alice", "bob"]) == {"alice": 1, "bob": 2}
+        self.objects.filter.assert_not_called()
+
+    def test_invalidate_drops_the_old_username(self):
+        """
+        Renaming a user stops the old username from resolving to them.
+        """
+        identity.get_user(1)
+        renamed = SimpleNamespace(pk=1, username="alicia")
+
+        identity.invalidate_user(renamed)
+
+        assert identity._USER_IDS.get("alice") is None
+        assert self.cache == {}
+        self.objects.filter.return_value.first.return_value = None
+        assert identity.get_user_by_username("alice") is None
+
+
+class TestInvalidateIdentitySignal:
+    """
+    Test class for the `invalidate_identity` signal receiver.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Capture on-commit callbacks instead of running them.
+        """
+        self.callbacks = []
+        patch("src.accounts.signals.transaction.on_commit", side_effect=self.callbacks.append).start()
+        self.invalidate = patch("src.accounts.signals.identity.invalidate_user").start()
+        yield
+        patch.stopall()
+
+    def test_invalidation_waits_for_commit(self):
+        """
+        The user is dropped only on commit, under the id and username they
+        had when the signal fired.
+        """
+        instance = SimpleNamespace(pk=1, username="alice")
+
+        signals.invalidate_identity(sender=None, instance=instance)
+        instance.pk = None
+        self.invalidate.assert_not_called()
+
+        self.callbacks.pop()()
+        (user,), _ = self.invalidate.call_args
+        assert (user.pk, user.username) == (1, "alice")
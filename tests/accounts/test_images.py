@@ -0,0 +1,72 @@
+"""
+Test Module for Profile Image Processing.
+
+This module contains unit tests for the avatar variant renderer, covering the
+sizes and formats produced, aspect ratio handling and EXIF stripping.
+
+Images are generated in memory with Pillow, so no storage is involved.
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from src.accounts.images import AVATAR_SIZES, FORMATS, content_hash, render_variants
+
+
+def jpeg_with_exif(width: int, height: int) -> io.BytesIO:
+    """
+    Build an in-memory JPEG carrying an EXIF camera model.
+    """
+    exif = Image.Exif()
+    exif[0x0110] = "Test Camera"
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "JPEG", exif=exif.tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+class TestRenderVariants:
+    """
+    Test class for the `render_variants` function.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Fixture providing a large landscape photo with EXIF metadata.
+        """
+        self.source = jpeg_with_exif(2400, 1200)
+        yield
+
+    def test_renders_every_size_and_format(self):
+        """
+        Test that each size is rendered in each format and fits its box.
+        """
+        variants = render_variants(self.source)
+
+        assert set(variants) == {(size, name) for size in AVATAR_SIZES for name in FORMATS}
+        for (size, _), data in variants.items():
+            image = Image.open(io.BytesIO(data))
+            assert max(image.size) == size
+            assert image.width == 2 * image.height
+
+    def test_strips_exif(self):
+        """
+        Test that no variant carries the source EXIF data.
+        """
+        variants = render_variants(self.source)
+
+        for data in variants.values():
+            assert not Image.open(io.BytesIO(data)).getexif()
+
+    def test_content_hash_is_stable(self):
+        """
+        Test that the same content always hashes the same.
+        """
+        first = content_hash(self.source)
+        self.source.seek(0)
+
+        assert first == content_hash(self.source)
+        assert len(first) == 64
@@ -0,0 +1,75 @@
+"""
+Test Module for the Presence Service.
+
+These tests cover the per-user write throttle, reading the presence of
+many users in one round-trip, and that heartbeats do not shorten the
+connection count. The Redis client is replaced by a mock.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.accounts import presence
+
+
+class TestPresence:
+    """
+    Test class for `touch` and `get_presence`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Serve pipelines from a mock Redis client and reset the throttle.
+        """
+        self.pipe = MagicMock()
+        client = MagicMock()
+        client.pipeline.return_value = self.pipe
+        patch("src.accounts.presence.get_redis", return_value=client).start()
+        presence._RECENT.clear()
+        yield
+        patch.stopall()
+
+    def test_touch_writes_once_per_interval(self):
+        """
+        Repeated heartbeats within the interval cost one Redis write.
+        """
+        presence.touch(1)
+        presence.touch(1)
+        presence.touch(2)
+
+        assert self.pipe.execute.call_count == 2
+
+    def test_mark_offline_is_never_throttled(self):
+        """
+        Going offline is written even right after a heartbeat.
+        """
+        presence.touch(1)
+        presence.mark_offline(1)
+
+        assert self.pipe.execute.call_count == 2
+        self.pipe.delete.assert_called_once_with("presence:online:1")
+
+    def test_get_presence_for_many_users(self):
+        """
+        Online users have a live key; others fall back to their last activity.
+        """
+        self.pipe.execute.return_value = [["1700000000.0", None, None], [None, "1600000000.0", None]]
+
+        result = presence.get_presence([1, 2, 3])
+
+        assert self.pipe.execute.call_count == 1
+        assert result[1].is_online and result[1].last_seen.timestamp() == 1700000000
+        assert not result[2].is_online and result[2].last_seen.timestamp() == 1600000000
+        assert result[3].last_seen is None
+
+    def test_heartbeats_leave_the_connection_count_alone(self):
+        """
+        The connection count does not expire with the online key, so a
+        quiet socket still counts when another one closes.
+        """
+        presence.mark_online(1)
+
+        self.pipe.expire.assert_not_called()
+        self.pipe.set.assert_called_once()
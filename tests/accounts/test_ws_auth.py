@@ -0,0 +1,110 @@
+"""
+Test Module for Websocket Token Authentication.
+
+These tests cover issuing and verifying signed websocket tokens, revoking
+them by changing the password or deactivating the user, and reading them
+from the handshake. Users are served from a mock instead of the database.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.accounts import ws_auth
+from src.accounts.identity import CachedUser
+
+
+def fake_user(pk: int = 1, auth_hash: str = "a" * 64):
+    """
+    Build a user-like object with a session auth hash.
+    """
+    return SimpleNamespace(pk=pk, is_authenticated=True, get_session_auth_hash=lambda: auth_hash)
+
+
+def cached_user(pk: int = 1, auth_hash: str = "a" * 64, is_active: bool = True) -> CachedUser:
+    """
+    Build the identity cache's projection of a user.
+    """
+    return CachedUser(id=pk, username=f"user{pk}", is_active=is_active, auth_hash=auth_hash[:16])
+
+
+class TestWebsocketTokens:
+    """
+    Test class for `issue_token` and `user_for_token`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Serve users from a mock loader.
+        """
+        self.user = fake_user()
+        self.load_user = patch("src.accounts.ws_auth._load_user", return_value=cached_user()).start()
+        yield
+        patch.stopall()
+
+    def test_token_resolves_to_its_user(self):
+        """
+        A fresh token authenticates the user it was issued to.
+        """
+        token = ws_auth.issue_token(self.user)
+
+        user = ws_auth.user_for_token(token)
+
+        assert (user.pk, user.username, user.is_authenticated) == (1, "user1", True)
+        self.load_user.assert_called_once_with(1)
+
+    def test_tampered_and_expired_tokens_are_rejected(self):
+        """
+        Altered or expired tokens yield an anonymous user.
+        """
+        token = ws_auth.issue_token(self.user)
+
+        assert not ws_auth.user_for_token(token[:-1] + "x").is_authenticated
+        with patch("src.accounts.ws_auth.token_ttl", return_value=-1):
+            assert not ws_auth.user_for_token(token).is_authenticated
+
+    def test_password_change_revokes_tokens(self):
+        """
+        A token stops working once the user's auth hash changes.
+        """
+        token = ws_auth.issue_token(self.user)
+        self.load_user.return_value = cached_user(auth_hash="b" * 64)
+
+        assert not ws_auth.user_for_token(token).is_authenticated
+
+    def test_deactivated_users_are_rejected(self):
+        """
+        A token of a user who was deactivated no longer authenticates.
+        """
+        token = ws_auth.issue_token(self.user)
+        self.load_user.return_value = cached_user(is_active=False)
+
+        assert not ws_auth.user_for_token(token).is_authenticated
+
+    def test_handshakes_skip_the_local_tier(self):
+        """
+        The async path reads the shared tier, not a process-local copy that
+        another process may have invalidated.
+        """
+        token = ws_auth.issue_token(self.user)
+        patch("src.accounts.ws_auth.identity.get_local_user", return_value=cached_user()).start()
+        shared = patch(
+            "src.accounts.ws_auth.identity.aget_shared_user", AsyncMock(return_value=cached_user(is_active=False))
+        ).start()
+
+        assert not asyncio.run(ws_auth.auser_for_token(token)).is_authenticated
+        shared.assert_awaited_once_with(1)
+
+    def test_token_read_from_subprotocol_or_query_string(self):
+        """
+        Tokens can be offered as a subprotocol or a query parameter.
+        """
+        token = ws_auth.issue_token(self.user)
+
+        assert ws_auth.token_from_scope({"subprotocols": [ws_auth.SUBPROTOCOL, token]}) == (token, True)
+        assert ws_auth.token_from_scope({"query_string": f"token={token}".encode()}) == (token, False)
+        assert ws_auth.token_from_scope({"query_string": b""}) == (None, False)
+        assert ":" not in token
@@ -0,0 +1 @@
+"""Chat tests module."""
@@ -0,0 +1,154 @@
+"""
+Test Module for the Write-Behind Message Buffer.
+
+These tests cover when `MessageBuffer` flushes (batch size, interval, explicit
+flush), that a failed flush keeps its messages queued until a bad message is
+dropped, and that flush size and latency are recorded.
+
+The database write is mocked so the tests exercise only the buffering logic.
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from src.chat.buffers import MessageBuffer, PendingMessage
+from src.common.metrics import METRICS
+
+
+def pending(index: int) -> PendingMessage:
+    """
+    Build a pending room message.
+    """
+    return PendingMessage(sender="biko", recipient="biko", chat_room="lobby", message_content=f"hi {index}")
+
+
+class TestMessageBuffer:
+    """
+    Test class for `MessageBuffer`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Mock the bulk write and reset the metrics registry.
+        """
+        self.mock_persist = patch("src.chat.buffers.persist_messages").start()
+        METRICS.reset()
+        yield
+        patch.stopall()
+
+    def test_flushes_when_batch_is_full(self):
+        """
+        A full batch is written straight away with a single bulk write.
+        """
+        buffer = MessageBuffer(max_size=3, flush_interval_ms=60_000)
+
+        async def run():
+            for index in range(3):
+                await buffer.add(pending(index))
+
+        asyncio.run(run())
+
+        self.mock_persist.assert_called_once()
+        assert len(self.mock_persist.call_args.args[0]) == 3
+        assert len(buffer) == 0
+
+    def test_flushes_after_interval(self):
+        """
+        A partial batch is written once the flush interval has passed.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=10)
+
+        async def run():
+            await buffer.add(pending(1))
+            assert self.mock_persist.call_count == 0
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+
+        self.mock_persist.assert_called_once()
+        assert len(buffer) == 0
+
+    def test_flush_sync_writes_pending_messages(self):
+        """
+        The shutdown hook writes whatever is still pending.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=60_000)
+        buffer._pending.extend([pending(1), pending(2)])
+
+        buffer.flush_sync()
+
+        self.mock_persist.assert_called_once()
+        assert len(buffer) == 0
+
+    def test_failed_flush_requeues_messages(self):
+        """
+        Messages survive a failed write and are retried on the next flush.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=60_000)
+        buffer._pending.extend([pending(1), pending(2)])
+        self.mock_persist.side_effect = Exception("database unavailable")
+
+        with pytest.raises(Exception, match="database unavailable"):
+            buffer.flush_sync()
+
+        assert len(buffer) == 2
+        assert METRICS.counter("chat.message_buffer.flush_failures") == 1
+
+    def test_bad_message_is_dropped_after_max_attempts(self):
+        """
+        A message that keeps failing is written on its own and dropped, and
+        does not hold back the rest of its batch.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=60_000, max_attempts=2)
+        bad = pending(0)
+        buffer._pending.extend([bad, pending(1)])
+
+        def persist(batch):
+            if any(message.message_content == bad.message_content for message in batch):
+                raise Exception("value too long")
+
+        self.mock_persist.side_effect = persist
+
+        for _ in range(2):
+            with pytest.raises(Exception, match="value too long"):
+                buffer.flush_sync()
+
+        assert len(buffer) == 0
+        assert [call.args[0][0].message_content for call in self.mock_persist.call_args_list[2:]] == [
+            "hi 0", "hi 1",
+        ]
+        assert METRICS.counter("chat.message_buffer.dead_letters") == 1
+
+    def test_try_flush_schedules_a_retry_instead_of_raising(self):
+        """
+        A failed flush from a consumer keeps the messages and retries later.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=10)
+        buffer._pending.append(pending(1))
+        self.mock_persist.side_effect = [Exception("database unavailable"), None]
+
+        async def run():
+            assert await buffer.try_flush() is False
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+
+        assert self.mock_persist.call_count == 2
+        assert len(buffer) == 0
+
+    def test_records_flush_metrics(self):
+        """
+        Each flush records its size and latency.
+        """
+        buffer = MessageBuffer(max_size=100, flush_interval_ms=60_000)
+        buffer._pending.extend([pending(1), pending(2)])
+
+        buffer.flush_sync()
+
+        observations = METRICS.snapshot()["observations"]
+        assert observations["chat.message_buffer.flush_size"].last == 2
+        assert observations["chat.message_buffer.flush_seconds"].count == 1
+        assert METRICS.counter("chat.message_buffer.messages_flushed") == 2
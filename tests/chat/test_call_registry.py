@@ -0,0 +1,45 @@
+"""
+Test Module for the Active-Call Registry.
+
+These tests cover how one pipelined round-trip to Redis decides whether a
+receiver can be rung. The Redis client is replaced by a mock.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.chat.call_registry import availability
+from src.chat.constants.symbolic_constants import VideoCallStatus
+
+
+class TestAvailability:
+    """
+    Test class for `availability`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Serve pipeline results from a mock Redis client.
+        """
+        self.pipe = MagicMock()
+        client = MagicMock()
+        client.pipeline.return_value = self.pipe
+        patch("src.chat.call_registry.get_redis", return_value=client).start()
+        yield
+        patch.stopall()
+
+    @pytest.mark.parametrize("in_call, reachable, expected", [
+        (1, 1, VideoCallStatus.BUSY),
+        (0, 0, VideoCallStatus.NOT_AVAILABLE),
+        (0, 1, VideoCallStatus.CONTACTING),
+    ])
+    def test_status_from_registry(self, in_call, reachable, expected):
+        """
+        A user in a call is busy, one without a call socket is not available.
+        """
+        self.pipe.execute.return_value = [in_call, reachable]
+
+        assert availability(7) == expected
+        self.pipe.execute.assert_called_once()
@@ -0,0 +1,142 @@
+"""
+Test Module for the Video Call State Machine.
+
+These tests cover which transitions are allowed, how the call duration is
+derived from the state returned by a transition, and who a call session
+relays signaling frames to. `transition` itself is tested against the
+PostgreSQL database with the active-call registry mocked.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+
+from src.accounts.models import ChapianaUser
+from src.chat.calls import (
+    TERMINAL_STATUSES, CallSession, CallState, InvalidTransition, _SESSIONS, sources_for, transition,
+)
+from src.chat.constants.symbolic_constants import VideoCallStatus
+from src.chat.models import VideoCall
+
+
+class TestCallTransitions:
+    """
+    Test class for the allowed call transitions.
+    """
+
+    def test_answers_only_follow_contacting(self):
+        """
+        A call can only be accepted, rejected or missed while it is ringing.
+        """
+        for target in (VideoCallStatus.ACCEPTED, VideoCallStatus.REJECTED, VideoCallStatus.MISSED):
+            assert sources_for(target) == [VideoCallStatus.CONTACTING]
+
+    def test_any_live_call_can_end(self):
+        """
+        Ringing, accepted and connected calls can all be ended.
+        """
+        assert set(sources_for(VideoCallStatus.ENDED)) == {
+            VideoCallStatus.CONTACTING, VideoCallStatus.ACCEPTED, VideoCallStatus.PROCESSING,
+        }
+
+    def test_final_statuses_are_terminal(self):
+        """
+        Nothing follows a call that has finished.
+        """
+        assert VideoCallStatus.ENDED in TERMINAL_STATUSES
+        assert VideoCallStatus.CONTACTING not in TERMINAL_STATUSES
+
+    def test_duration_counts_only_finished_calls(self):
+        """
+        The duration is zero until the call reaches a final status.
+        """
+        started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        state = CallState(1, 2, 3, VideoCallStatus.ACCEPTED, started, started)
+        ended = CallState(1, 2, 3, VideoCallStatus.ENDED, started, started + timedelta(seconds=90))
+
+        assert state.duration_seconds == 0
+        assert ended.duration_seconds == 90
+
+
+class TestCallSession:
+    """
+    Test class for `CallSession`.
+    """
+
+    def test_peer_is_the_other_participant(self):
+        """
+        Each participant's peer is the other one; outsiders have none.
+        """
+        session = CallSession(call_id=1, caller_id=2, receiver_id=3)
+
+        assert session.peer_of(2) == 3
+        assert session.peer_of(3) == 2
+        assert session.peer_of(4) is None
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL.")
+class TestTransition:
+    """
+    Test class for `transition`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create a ringing call and mock the active-call registry.
+        """
+        self.registry = patch("src.chat.calls.call_registry").start()
+        self.biko, self.amani = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani")
+        )
+        self.call = VideoCall.objects.create(caller=self.biko, receiver=self.amani)
+        yield
+        _SESSIONS.clear()
+        patch.stopall()
+
+    def test_accept_updates_the_call_and_opens_its_session(self):
+        """
+        Accepting stamps the start, and once committed the call's session is
+        opened and its ring deadline dropped.
+        """
+        with patch("src.chat.calls.transaction.on_commit") as on_commit:
+            state = transition(self.call.pk, VideoCallStatus.ACCEPTED)
+            on_commit.assert_called_once()
+            assert _SESSIONS.get(self.call.pk) is None
+            on_commit.call_args.args[0]()
+
+        self.call.refresh_from_db()
+        assert self.call.status == state.status == VideoCallStatus.ACCEPTED
+        assert self.call.date_started == state.date_started
+        assert (state.caller_id, state.receiver_id) == (self.biko.pk, self.amani.pk)
+        assert _SESSIONS.get(self.call.pk).peer_of(self.biko.pk) == self.amani.pk
+        self.registry.answered.assert_called_once_with(self.call.pk)
+
+    def test_rejected_transition_changes_nothing(self):
+        """
+        A status the current one cannot move to is refused without writing
+        or scheduling anything.
+        """
+        VideoCall.objects.filter(pk=self.call.pk).update(status=VideoCallStatus.ENDED)
+
+        with patch("src.chat.calls.transaction.on_commit") as on_commit:
+            with pytest.raises(InvalidTransition, match="cannot move to"):
+                transition(self.call.pk, VideoCallStatus.ACCEPTED)
+
+        on_commit.assert_not_called()
+        self.call.refresh_from_db()
+        assert self.call.status == VideoCallStatus.ENDED
+
+    def test_ending_frees_both_users(self):
+        """
+        Once an ended call commits, both users are released in the registry.
+        """
+        with patch("src.chat.calls.transaction.on_commit", side_effect=lambda callback: callback()):
+            state = transition(self.call.pk, VideoCallStatus.ENDED)
+
+        assert state.status in TERMINAL_STATUSES
+        self.registry.release.assert_called_once_with(self.call.pk, self.biko.pk, self.amani.pk)
@@ -0,0 +1,129 @@
+"""
+Test Module for Clearing Room History.
+
+These tests cover the `clear_room_history` task deleting a room's messages
+in batches, resetting the room's unread counters and reporting progress to
+the room group, and the history API hiding messages behind the room's
+watermark before the task has run. The channel layer is a mock; the
+messages need the PostgreSQL database.
+"""
+
+import json
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from src.accounts.models import ChapianaUser
+from src.chat import membership
+from src.chat.constants.symbolic_constants import ChapianaUserPackage, ChatType
+from src.chat.models import Category, ChatRoom, Message, UnreadCounter
+from src.chat.notifications import room_group
+from src.chat.tasks import clear_room_history
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL."),
+]
+
+
+class TestClearRoomHistory:
+    """
+    Test class for `clear_room_history` and the `cleared_before` watermark.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create a room with two members, five messages before the watermark
+        and one after it.
+        """
+        membership._LOCAL.clear()
+        cache.clear()
+        self.channel_layer = patch("src.chat.tasks.get_channel_layer").start().return_value
+        self.channel_layer.group_send = AsyncMock()
+
+        self.biko, self.amani = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani")
+        )
+        category = Category.objects.create(
+            country_name="Kenya", chat_type=ChatType.GROUP_MESSAGE, user_package=ChapianaUserPackage.FREE
+        )
+        self.room = ChatRoom.objects.create(category=category, room_name="lobby", slug="lobby")
+        self.room.members.add(self.biko, self.amani)
+
+        self.cleared_before = timezone.now()
+        for minutes in range(5, 0, -1):
+            self.send("old", self.cleared_before - timedelta(minutes=minutes))
+        self.send("new", self.cleared_before + timedelta(minutes=1))
+        yield
+        patch.stopall()
+
+    def send(self, content, created_at):
+        """
+        Save a message from biko to the room.
+        """
+        Message.objects.create(
+            chat_room=self.room, sender=self.biko, recipient=self.biko,
+            message_content=content, read=True, created_at=created_at,
+        )
+
+    def frames(self) -> list[tuple[str, dict]]:
+        """
+        The groups and decoded payloads sent to the channel layer.
+        """
+        return [
+            (group, json.loads(event["text"]))
+            for (group, event), _ in self.channel_layer.group_send.call_args_list
+        ]
+
+    def test_deletes_in_batches_up_to_the_watermark(self):
+        """
+        Only messages up to the watermark are deleted, batch by batch.
+        """
+        deleted = clear_room_history(self.room.pk, self.cleared_before.isoformat(), batch_size=2, sleep_seconds=0)
+
+        assert deleted == 5
+        assert list(Message.objects.values_list("message_content", flat=True)) == ["new"]
+        assert [payload["deleted"] for _, payload in self.frames()] == [2, 4, 5, 5]
+
+    def test_reports_progress_to_the_room_group(self):
+        """
+        Progress and completion frames go to the room's group.
+        """
+        clear_room_history(self.room.pk, self.cleared_before.isoformat(), batch_size=10, sleep_seconds=0)
+
+        assert self.frames() == [
+            (room_group("lobby"), {"command": "clear_history_progress", "deleted": 5}),
+            (room_group("lobby"), {"command": "clear_history_done", "deleted": 5}),
+        ]
+
+    def test_resets_the_room_unread_counters(self):
+        """
+        The members' unread counters for the room drop to zero.
+        """
+        assert UnreadCounter.get_count(self.amani.pk, chat_room=self.room.pk) == 6
+
+        clear_room_history(self.room.pk, self.cleared_before.isoformat(), sleep_seconds=0)
+
+        assert UnreadCounter.get_count(self.amani.pk, chat_room=self.room.pk) == 0
+
+    def test_history_api_hides_messages_before_the_watermark(self):
+        """
+        Once the watermark is set, the history API stops returning older
+        messages even though they are not deleted yet.
+        """
+        ChatRoom.objects.filter(pk=self.room.pk).update(history_cleared_before=self.cleared_before)
+        client = APIClient()
+        client.force_authenticate(self.amani)
+
+        response = client.get("/chat/history/", {"room": "lobby"})
+
+        assert response.status_code == 200
+        assert [message["message_content"] for message in response.json()["results"]] == ["new"]
+        assert Message.objects.count() == 6
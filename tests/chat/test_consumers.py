@@ -0,0 +1,192 @@
+"""
+Test Module for the Chat Consumers.
+
+These tests cover the membership checks of the chat socket's commands, and
+that room commands on the multiplexed socket only reach the room of their
+subscribed stream. Handlers are called directly on a consumer whose socket,
+channel layer and membership snapshots are mocks.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.chat.consumers import ChatConsumer, StreamConsumer
+from src.chat.membership import RoomMembers
+from src.common.encoding import dumps, loads
+
+
+def chat_consumer(user_id: int = 1, room_name: str = "lobby") -> ChatConsumer:
+    """
+    Build a connected chat consumer for `room_name` with a mock socket.
+    """
+    consumer = ChatConsumer()
+    consumer.user = SimpleNamespace(id=user_id, username=f"user{user_id}", is_authenticated=True)
+    consumer.scope = {"user": consumer.user}
+    consumer.room_name = room_name
+    consumer.room_group_name = f"chat_{room_name}"
+    consumer.channel_layer = AsyncMock()
+    consumer.send = AsyncMock()
+    return consumer
+
+
+def stream_consumer(user_id: int = 1) -> StreamConsumer:
+    """
+    Build a multiplexed consumer subscribed to the `lobby` room stream.
+    """
+    consumer = StreamConsumer()
+    consumer.user = SimpleNamespace(id=user_id, username=f"user{user_id}", is_authenticated=True)
+    consumer.scope = {"user": consumer.user}
+    consumer.user_id = user_id
+    consumer.username = consumer.user.username
+    consumer.streams = {"room:lobby": ("chat_lobby", "lobby")}
+    consumer.group_streams = {"chat_lobby": "room:lobby"}
+    consumer.reply_stream = None
+    consumer.channel_layer = AsyncMock()
+    consumer.base_send = AsyncMock()
+    return consumer
+
+
+def rooms(**member_ids):
+    """
+    Look up membership snapshots of the given rooms and their member ids.
+    """
+    snapshots = {
+        name: RoomMembers(room_id=index, member_ids=frozenset(ids), usernames=frozenset())
+        for index, (name, ids) in enumerate(member_ids.items(), start=1)
+    }
+    return snapshots.__getitem__
+
+
+def sent_frames(consumer: ChatConsumer) -> list[dict]:
+    """
+    The frames a consumer sent to its socket.
+    """
+    return [loads(call.kwargs["text_data"]) for call in consumer.send.call_args_list]
+
+
+class TestRoomMembership:
+    """
+    Test class for the membership checks of `ChatConsumer.connect` and
+    `ChatConsumer.fetch_history`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Serve a room whose only member is user 2.
+        """
+        members = RoomMembers(room_id=7, member_ids=frozenset({2}), usernames=frozenset({"user2"}))
+        patch("src.chat.consumers.aget_room_members", AsyncMock(return_value=members)).start()
+        self.room_history = patch("src.chat.consumers.room_history").start()
+        yield
+        patch.stopall()
+
+    def test_non_member_cannot_connect(self):
+        """
+        The chat socket of a room is closed for users who are not members.
+        """
+        consumer = chat_consumer(user_id=1)
+        consumer.scope["url_route"] = {"kwargs": {"room_name": "lobby"}}
+        consumer.close = AsyncMock()
+        consumer.accept = AsyncMock()
+
+        asyncio.run(consumer.connect())
+
+        consumer.close.assert_awaited_once()
+        consumer.accept.assert_not_called()
+        consumer.channel_layer.group_add.assert_not_called()
+
+    def test_non_member_cannot_read_history(self):
+        """
+        A user who is not a member of the room gets an error, not messages.
+        """
+        consumer = chat_consumer(user_id=1)
+
+        asyncio.run(consumer.fetch_history({"command": "fetch_history"}))
+
+        assert sent_frames(consumer) == [{"command": "error", "message": "Not a member of this room"}]
+        self.room_history.assert_not_called()
+
+
+class TestStreamRoomCommands:
+    """
+    Test class for room commands on `StreamConsumer`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Serve a `lobby` room with user 1 and a `private` room without them,
+        and mock the message buffer and notifications.
+        """
+        self.get_members = patch(
+            "src.chat.consumers.aget_room_members", AsyncMock(side_effect=rooms(lobby={1, 3}, private={2}))
+        ).start()
+        patch("src.chat.consumers.presence.atouch", AsyncMock()).start()
+        self.buffer = patch("src.chat.consumers.MESSAGE_BUFFER", AsyncMock()).start()
+        self.notifications = patch("src.chat.consumers.NOTIFICATIONS", AsyncMock()).start()
+        yield
+        patch.stopall()
+
+    def frames(self, consumer: StreamConsumer) -> list[dict]:
+        """
+        The envelopes the consumer sent to its socket.
+        """
+        return [loads(call.args[0]["text"]) for call in consumer.base_send.call_args_list]
+
+    def test_cannot_post_to_an_unsubscribed_room(self):
+        """
+        A command naming a room stream the socket has not subscribed to is
+        rejected, and nothing is broadcast or stored.
+        """
+        consumer = stream_consumer(user_id=1)
+
+        asyncio.run(consumer.receive(text_data=dumps({
+            "stream": "room:private", "command": "new_message", "message_content": "hi",
+        })))
+
+        assert self.frames(consumer) == [
+            {"stream": "room:private", "payload": {"command": "error", "message": "Not subscribed."}}
+        ]
+        consumer.channel_layer.group_send.assert_not_called()
+        self.buffer.add.assert_not_called()
+
+    def test_payload_cannot_redirect_a_room_command(self):
+        """
+        Room names in the payload are ignored: the message goes to the room
+        of the stream it was sent on.
+        """
+        consumer = stream_consumer(user_id=1)
+
+        asyncio.run(consumer.receive(text_data=dumps({
+            "stream": "room:lobby",
+            "command": "new_message",
+            "message_content": "hi",
+            "chat_room": "private",
+            "roomName": "private",
+        })))
+
+        assert self.buffer.add.call_args.args[0].chat_room == "lobby"
+        assert consumer.channel_layer.group_send.call_args.args[0] == "chat_lobby"
+        self.notifications.notify.assert_awaited_once()
+        assert self.notifications.notify.call_args.args[1:3] == ("lobby", [3])
+
+    def test_removed_member_cannot_post(self):
+        """
+        Membership is checked again before each write, so a user removed
+        from the room after subscribing is refused.
+        """
+        consumer = stream_consumer(user_id=2)
+        self.get_members.side_effect = rooms(lobby={1})
+
+        asyncio.run(consumer.receive(text_data=dumps({
+            "stream": "room:lobby", "command": "clear_history",
+        })))
+
+        assert self.frames(consumer) == [
+            {"stream": "room:lobby", "payload": {"command": "error", "message": "Not a member of this room"}}
+        ]
+        consumer.channel_layer.group_send.assert_not_called()
@@ -0,0 +1,103 @@
+"""
+Test Module for Contact-Scoped Presence Fan-Out.
+
+These tests cover the offline debounce: a user whose last connection closes
+is announced offline only if they have not reconnected when it settles.
+The presence service and the fan-out are replaced by mocks. They also
+cover that cached contact sets are dropped only after a commit.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.chat.contacts import invalidate_contacts, user_disconnected
+
+
+class TestUserDisconnected:
+    """
+    Test class for `user_disconnected`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Settle at once and record what would be published.
+        """
+        patch("src.chat.contacts.settings", SimpleNamespace(PRESENCE_DEBOUNCE_SECONDS=0)).start()
+        self.disconnected = patch("src.chat.contacts.presence.disconnected", return_value=True).start()
+        self.settle = patch("src.chat.contacts.presence.settle", return_value=True).start()
+        self.publish = patch("src.chat.contacts.publish_presence", new_callable=AsyncMock).start()
+        yield
+        patch.stopall()
+
+    def disconnect(self):
+        """
+        Close a connection of user 1 and wait for the debounce to settle.
+        """
+        async def run():
+            await user_disconnected(None, 1)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+
+    def test_announces_offline_after_last_connection(self):
+        """
+        A user who stays away is announced offline.
+        """
+        self.disconnect()
+
+        self.publish.assert_awaited_once_with(None, 1, False)
+
+    def test_reconnect_within_debounce_is_silent(self):
+        """
+        Nothing is announced when the user reconnected before it settled.
+        """
+        self.settle.return_value = False
+
+        self.disconnect()
+
+        self.publish.assert_not_awaited()
+
+    def test_other_connections_keep_user_online(self):
+        """
+        Closing one of several connections does not start the debounce.
+        """
+        self.disconnected.return_value = False
+
+        self.disconnect()
+
+        self.settle.assert_not_called()
+        self.publish.assert_not_awaited()
+
+
+class TestInvalidateContacts:
+    """
+    Test class for `invalidate_contacts`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Capture commit callbacks instead of running them.
+        """
+        self.callbacks = []
+        self.cache = patch("src.chat.contacts.cache").start()
+        self.local = patch("src.chat.contacts._LOCAL").start()
+        patch("src.chat.contacts.transaction.on_commit", side_effect=self.callbacks.append).start()
+        yield
+        patch.stopall()
+
+    def test_drops_contacts_after_commit(self):
+        """
+        Nothing is dropped while the transaction is open.
+        """
+        invalidate_contacts(1, 2)
+
+        self.cache.delete_many.assert_not_called()
+        self.callbacks[0]()
+
+        self.local.delete.assert_called_once_with(1, 2)
+        self.cache.delete_many.assert_called_once_with(["chat:contacts:1", "chat:contacts:2"])
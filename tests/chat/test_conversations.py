@@ -0,0 +1,111 @@
+"""
+Test Module for Canonical Conversation Pairs.
+
+These tests cover ordering a pair of users, creating one conversation row
+per pair whichever way round it is given, the constraint rejecting
+self-conversations, and the command rewriting legacy rows. All but the pair
+ordering need the PostgreSQL database.
+"""
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+
+from src.accounts.models import ChapianaUser
+from src.chat import models
+from src.chat.models import Conversation
+
+
+class TestCanonicalPair:
+    """
+    Test class for `Conversation.canonical_pair`.
+    """
+
+    def test_pair_is_ordered_low_to_high(self):
+        """
+        Both orders of a pair give the same (low, high) ids.
+        """
+        assert Conversation.canonical_pair(7, 3) == (3, 7)
+        assert Conversation.canonical_pair(3, 7) == (3, 7)
+
+    def test_accepts_users(self):
+        """
+        Users are reduced to their primary keys.
+        """
+        assert Conversation.canonical_pair(ChapianaUser(pk=9), 4) == (4, 9)
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL.")
+class TestConversationPairs:
+    """
+    Test class for `Conversation.ensure_pairs`, the pair constraints and the
+    `canonicalize_conversations` command.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create three users, with no pairs remembered by earlier tests.
+        """
+        models._KNOWN_CONVERSATIONS.clear()
+        self.biko, self.amani, self.zuri = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani", "zuri")
+        )
+
+    def pairs(self) -> list[tuple[int, int]]:
+        """
+        The stored (low, high) pairs, in id order.
+        """
+        return list(Conversation.objects.order_by("pk").values_list("low_user_id", "high_user_id"))
+
+    def test_reversed_pairs_share_one_row(self):
+        """
+        A pair given in both orders, and again later, is stored once in
+        canonical order.
+        """
+        Conversation.ensure_pairs([(self.zuri, self.biko), (self.biko, self.zuri)])
+        models._KNOWN_CONVERSATIONS.clear()
+        Conversation.create_if_not_exists(self.zuri, self.biko)
+
+        assert self.pairs() == [Conversation.canonical_pair(self.biko, self.zuri)]
+        assert Conversation.conversation_exists(self.zuri, self.biko) is not None
+
+    def test_self_pairs_are_rejected(self):
+        """
+        `ensure_pairs` skips a user paired with themself, and the check
+        constraint refuses to store one.
+        """
+        Conversation.ensure_pairs([(self.biko, self.biko)])
+        assert self.pairs() == []
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(low_user=self.biko, high_user=self.biko)
+
+    def test_command_merges_legacy_rows(self):
+        """
+        Reverse-order duplicates collapse onto the oldest row,
+        self-conversations are removed and the remaining rows are swapped
+        into canonical order.
+        """
+        table = Conversation._meta.db_table
+        first, second, third = sorted(user.pk for user in (self.biko, self.amani, self.zuri))
+        with connection.cursor() as db:
+            # Legacy rows predate the pair constraints; the test's
+            # transaction restores them.
+            db.execute(f"ALTER TABLE {table} DROP CONSTRAINT conversation_pair_canonical")
+            db.execute(f"ALTER TABLE {table} DROP CONSTRAINT conversation_pair_unique")
+            for low, high in [(second, first), (first, second), (third, third), (third, second)]:
+                db.execute(
+                    f"INSERT INTO {table} (low_user_id, high_user_id, created, modified) VALUES (%s, %s, now(), now())",
+                    [low, high],
+                )
+        oldest = Conversation.objects.order_by("pk").first().pk
+
+        call_command("canonicalize_conversations", batch_size=1, stdout=StringIO())
+
+        assert self.pairs() == [(first, second), (second, third)]
+        assert Conversation.objects.order_by("pk").first().pk == oldest
@@ -0,0 +1,62 @@
+"""
+Test Module for the Country Index.
+
+These tests cover resolving codes, exact and loosely written names and
+partial names, and building flag emoji.
+
+The index is built from a small fixed list instead of `pycountry`.
+"""
+
+import pytest
+
+from src.chat.countries import CountryIndex, flag_emoji
+
+
+class TestCountryIndex:
+    """
+    Test class for `CountryIndex`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Build an index over a few countries.
+        """
+        self.index = CountryIndex([
+            ("KE", "KEN", "Kenya", "Republic of Kenya"),
+            ("KR", "KOR", "Korea, Republic of", "South Korea"),
+            ("CI", "CIV", "Côte d'Ivoire", "Republic of Côte d'Ivoire"),
+            ("US", "USA", "United States", "United States of America"),
+        ])
+        yield
+
+    def test_resolves_codes_and_names(self):
+        """
+        Codes and names, however written, resolve to the country.
+        """
+        assert self.index.lookup("KE").name == "Kenya"
+        assert self.index.lookup("kor").alpha_2 == "KR"
+        assert self.index.lookup("Kenya").alpha_2 == "KE"
+        assert self.index.lookup("cote d ivoire").alpha_2 == "CI"
+
+    def test_resolves_partial_names(self):
+        """
+        Any word prefix finds a country, the shortest name winning.
+        """
+        assert self.index.lookup("korea").alpha_2 == "KR"
+        assert self.index.lookup("unit").alpha_2 == "US"
+        assert self.index.lookup("republic").alpha_2 == "KE"
+        assert self.index.lookup("atlantis") is None
+
+    def test_choices_sorted_by_name(self):
+        """
+        Choices are (code, name) pairs in name order.
+        """
+        assert [code for code, _ in self.index.choices()] == ["CI", "KE", "KR", "US"]
+
+    def test_flag_emoji(self):
+        """
+        Flags are built from regional indicator symbols.
+        """
+        assert flag_emoji("KE") == "\U0001F1F0\U0001F1EA"
+        assert flag_emoji("Unknown") == ""
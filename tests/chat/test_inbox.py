@@ -0,0 +1,120 @@
+"""
+Test Module for the Inbox.
+
+These tests cover the inbox query: picking each conversation's last
+message whichever way it went, joining the unread counters and the peer's
+avatars, and paging by last activity with a keyset cursor. Presence is
+replaced by a mock; the query needs the PostgreSQL database.
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from src.accounts.models import ChapianaUser, Profile
+from src.chat import models
+from src.chat.inbox import get_inbox
+from src.chat.models import Conversation, Message
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL."),
+]
+
+
+class TestGetInbox:
+    """
+    Test class for `get_inbox`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Give biko three conversations: amani replied last, biko wrote to
+        zuri last, and the one with wanjiru has no messages yet.
+        """
+        models._KNOWN_CONVERSATIONS.clear()
+        patch(
+            "src.chat.inbox.get_presence",
+            side_effect=lambda ids: {pk: SimpleNamespace(is_online=False, last_seen=None) for pk in ids},
+        ).start()
+
+        self.biko, self.amani, self.zuri, self.wanjiru = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani", "zuri", "wanjiru")
+        )
+        now = timezone.now()
+        self.send(self.biko, self.amani, "habari", now - timedelta(hours=3))
+        self.reply = self.send(self.amani, self.biko, "nzuri sana", now - timedelta(hours=1))
+        self.send(self.zuri, self.biko, "uko wapi?", now - timedelta(hours=4))
+        self.last_to_zuri = self.send(self.biko, self.zuri, "niko njiani", now - timedelta(hours=2))
+        Conversation.create_if_not_exists(self.biko, self.wanjiru)
+        yield
+        patch.stopall()
+
+    def send(self, sender, recipient, content, created_at):
+        """
+        Save a direct message sent at `created_at`.
+        """
+        return Message.objects.create(
+            sender=sender, recipient=recipient, message_content=content, created_at=created_at,
+        )
+
+    def entries(self, **kwargs) -> dict[str, dict]:
+        """
+        biko's inbox entries by peer username.
+        """
+        return {entry["peer"]["username"]: entry for entry in get_inbox(self.biko.pk, **kwargs).entries}
+
+    def test_last_message_in_either_direction(self):
+        """
+        The preview is the newest message of the pair, sent or received.
+        """
+        entries = self.entries()
+
+        assert entries["amani"]["last_message"]["id"] == self.reply.pk
+        assert entries["amani"]["last_message"]["sender_id"] == self.amani.pk
+        assert entries["zuri"]["last_message"]["id"] == self.last_to_zuri.pk
+        assert entries["zuri"]["last_message"]["preview"] == "niko njiani"
+        assert entries["wanjiru"]["last_message"] is None
+
+    def test_unread_counts_come_from_the_counters(self):
+        """
+        Each entry carries the reader's unread count for messages from that
+        peer.
+        """
+        entries = self.entries()
+
+        assert entries["amani"]["unread_count"] == 1
+        assert entries["zuri"]["unread_count"] == 1
+        assert entries["wanjiru"]["unread_count"] == 0
+        assert get_inbox(self.amani.pk).entries[0]["unread_count"] == 1
+
+    def test_peer_avatars_are_decoded(self):
+        """
+        The peer's stored avatar variants become URLs.
+        """
+        Profile.objects.filter(user=self.amani).update(image_variants={"64": {"webp": "avatars/amani-64.webp"}})
+
+        avatars = self.entries()["amani"]["peer"]["avatars"]
+
+        assert list(avatars) == ["64"]
+        assert avatars["64"]["webp"].endswith("avatars/amani-64.webp")
+
+    def test_cursor_pages_by_last_activity(self):
+        """
+        Paging one entry at a time visits every conversation once, most
+        recent activity first, and the last page has no cursor.
+        """
+        usernames, cursor = [], None
+        for _ in range(3):
+            page = get_inbox(self.biko.pk, cursor, size=1)
+            usernames += [entry["peer"]["username"] for entry in page.entries]
+            cursor = page.next_cursor
+
+        assert usernames == ["wanjiru", "amani", "zuri"]
+        assert cursor is None
@@ -0,0 +1,101 @@
+"""
+Test Module for the Lobby Listing.
+
+These tests cover narrowing the cached listing by category fields, the
+ETags that clients use to revalidate each view of it, and retiring the
+cached listing after a commit.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.chat.lobby import VERSION_KEY, Lobby, etag_matches, invalidate_lobby
+
+
+def group(country: str, chat_type: str, user_package: str) -> dict:
+    """
+    Build a lobby group with one room.
+    """
+    return {
+        "category": {"country_code": country, "chat_type": chat_type, "user_package": user_package},
+        "rooms": [{"name": f"{country}-{chat_type}", "member_count": 2, "online_count": 1}],
+    }
+
+
+class TestLobby:
+    """
+    Test class for `Lobby`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Build a listing with three categories.
+        """
+        self.lobby = Lobby(
+            groups=[group("KE", "public", "free"), group("KE", "private", "premium"), group("US", "public", "free")],
+            etag='"abc"',
+        )
+        yield
+
+    def test_filters_by_category_fields(self):
+        """
+        Only groups matching every given field are returned.
+        """
+        assert len(self.lobby.filtered()) == 3
+        assert len(self.lobby.filtered(country="KE")) == 2
+        assert self.lobby.filtered(country="KE", chat_type="public")[0]["rooms"][0]["name"] == "KE-public"
+
+    def test_etag_differs_per_filter(self):
+        """
+        The full listing keeps its ETag and every filtered view gets its own.
+        """
+        assert self.lobby.etag_for() == '"abc"'
+        assert self.lobby.etag_for(country="KE") != self.lobby.etag_for(country="US")
+        assert self.lobby.etag_for(country="KE") == self.lobby.etag_for(country="KE")
+
+
+class TestEtagMatches:
+    """
+    Test class for `etag_matches`.
+    """
+
+    def test_compares_whole_tags_from_the_list(self):
+        """
+        A tag matches only as a whole entry of the list, weak or strong.
+        """
+        assert etag_matches('"abc"', '"xyz", W/"abc"')
+        assert etag_matches('"abc"', "*")
+        assert not etag_matches('"abc"', '"abcd"')
+        assert not etag_matches('"ab"', '"abc"')
+        assert not etag_matches('"abc"', "")
+
+
+class TestInvalidateLobby:
+    """
+    Test class for `invalidate_lobby`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Capture commit callbacks instead of running them.
+        """
+        self.callbacks = []
+        self.cache = patch("src.chat.lobby.cache").start()
+        patch("src.chat.lobby.transaction.on_commit", side_effect=self.callbacks.append).start()
+        yield
+        patch.stopall()
+
+    def test_bumps_version_after_commit(self):
+        """
+        The version is bumped only once the change is committed, so a
+        listing built meanwhile is not cached under the new version.
+        """
+        invalidate_lobby()
+
+        self.cache.incr.assert_not_called()
+        self.callbacks[0]()
+
+        self.cache.incr.assert_called_once_with(VERSION_KEY)
@@ -0,0 +1,45 @@
+"""
+Test Module for Cached Room Membership.
+
+These tests cover that snapshots are dropped only once the writing
+transaction commits. The caches are mocks and the commit hook is captured.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.chat import membership
+
+
+class TestInvalidateRoomMembers:
+    """
+    Test class for `invalidate_room_members`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Capture commit callbacks instead of running them.
+        """
+        self.callbacks = []
+        self.cache = patch("src.chat.membership.cache").start()
+        self.local = patch("src.chat.membership._LOCAL").start()
+        patch("src.chat.membership.transaction.on_commit", side_effect=self.callbacks.append).start()
+        yield
+        patch.stopall()
+
+    def test_drops_snapshots_after_commit(self):
+        """
+        Nothing is dropped while the transaction is open, so a concurrent
+        reader cannot re-cache the old membership after the drop.
+        """
+        membership.invalidate_room_members("lobby", "general")
+
+        self.cache.delete_many.assert_not_called()
+        self.callbacks[0]()
+
+        self.local.delete.assert_called_once_with("lobby", "general")
+        self.cache.delete_many.assert_called_once_with(
+            ["chat:room_members:lobby", "chat:room_members:general"]
+        )
@@ -0,0 +1,80 @@
+"""
+Test Module for Targeted Chat Notifications.
+
+These tests cover routing notifications to per-user groups, merging bursts
+from one room into a single "N new messages" event per user, and sending
+call events to both participants.
+"""
+
+import asyncio
+import json
+
+from src.chat.notifications import NotificationCoalescer, send_call_event
+
+
+class FakeChannelLayer:
+    """
+    Records group sends instead of delivering them.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append((group, json.loads(event["text"])))
+
+
+class TestNotificationCoalescer:
+    """
+    Test class for `NotificationCoalescer`.
+    """
+
+    def test_sends_immediately_when_disabled(self):
+        """
+        Without an interval every message goes straight to each user group.
+        """
+        layer = FakeChannelLayer()
+        coalescer = NotificationCoalescer(interval_ms=0)
+
+        asyncio.run(coalescer.notify(layer, "lobby", [1, 2], {"content": "hi"}))
+
+        assert sorted(group for group, _ in layer.sent) == ["user_1", "user_2"]
+
+    def test_merges_bursts_per_user(self):
+        """
+        A burst from one room becomes one summary event per user.
+        """
+        layer = FakeChannelLayer()
+        coalescer = NotificationCoalescer(interval_ms=10)
+
+        async def run():
+            await coalescer.notify(layer, "lobby", [1, 2], {"content": "one"})
+            await coalescer.notify(layer, "lobby", [1], {"content": "two"})
+            await coalescer.notify(layer, "lobby", [1], {"content": "three"})
+            assert layer.sent == []
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+
+        sent = dict(layer.sent)
+        assert sent["user_1"] == {"content": "3 new messages", "count": 3}
+        assert sent["user_2"] == {"content": "one"}
+
+
+class TestSendCallEvent:
+    """
+    Test class for `send_call_event`.
+    """
+
+    def test_sends_once_to_each_participant(self):
+        """
+        The caller and receiver call groups each get the same event.
+        """
+        layer = FakeChannelLayer()
+
+        asyncio.run(send_call_event(layer, 1, 2, {"call_id": 7, "status": "Contacting"}))
+
+        assert layer.sent == [
+            ("user_1_calls", {"call_id": 7, "status": "Contacting"}),
+            ("user_2_calls", {"call_id": 7, "status": "Contacting"}),
+        ]
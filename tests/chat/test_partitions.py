@@ -0,0 +1,123 @@
+"""
+Test Module for Message Table Partitioning.
+
+These tests cover the month arithmetic and naming used to pre-create and
+archive the monthly message partitions, and the one-off conversion of the
+message table, which needs the PostgreSQL database.
+"""
+
+from datetime import date, datetime, time
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from src.accounts.models import ChapianaUser
+from src.chat.models import Message
+from src.chat.partitions import (
+    DEFAULT_PARTITION, LEGACY_KEY, LEGACY_TABLE, convert_to_partitioned, ensure_partitions, is_partitioned,
+    month_start, partition_name,
+)
+
+
+class TestPartitionMonths:
+    """
+    Test class for `month_start` and `partition_name`.
+    """
+
+    def test_month_start_rolls_over_years(self):
+        """
+        Month offsets wrap across year boundaries in both directions.
+        """
+        assert month_start(date(2024, 11, 17)) == date(2024, 11, 1)
+        assert month_start(date(2024, 11, 17), 3) == date(2025, 2, 1)
+        assert month_start(date(2024, 1, 31), -1) == date(2023, 12, 1)
+
+    def test_partition_name_is_zero_padded(self):
+        """
+        Partition names sort in month order.
+        """
+        assert partition_name(date(2024, 3, 1)) == "chat_message_p2024_03"
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL.")
+class TestConvertToPartitioned:
+    """
+    Test class for `convert_to_partitioned` and `ensure_partitions`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create a message sent before the current month.
+        """
+        self.biko, self.amani = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani")
+        )
+        last_month = month_start(timezone.now().date(), -1)
+        self.old = Message.objects.create(
+            sender=self.biko,
+            recipient=self.amani,
+            message_content="old",
+            created_at=timezone.make_aware(datetime.combine(last_month, time())),
+        )
+        # Run the deferred foreign key checks now: Postgres refuses to alter
+        # a table with checks still pending in the test's transaction.
+        with connection.cursor() as db:
+            db.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def partition_of(self, message) -> str:
+        """
+        The partition holding `message`.
+        """
+        with connection.cursor() as db:
+            db.execute("SELECT tableoid::regclass::text FROM chat_message WHERE id = %s", [message.pk])
+            return db.fetchone()[0]
+
+    def test_converted_table_accepts_new_messages(self):
+        """
+        After the switch, old rows stay readable and new inserts get ids
+        past the existing ones.
+        """
+        convert_to_partitioned()
+        ensure_partitions(0)
+
+        new = Message.objects.create(sender=self.biko, recipient=self.amani, message_content="new")
+
+        assert is_partitioned()
+        assert new.pk > self.old.pk
+        assert list(Message.objects.values_list("message_content", flat=True)) == ["old", "new"]
+
+    def test_old_rows_keep_their_prebuilt_key(self):
+        """
+        The parent's key is served on the old rows by the index built before
+        the switch, not by a second one built during ATTACH.
+        """
+        convert_to_partitioned()
+
+        with connection.cursor() as db:
+            db.execute(
+                "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass AND indisunique",
+                [LEGACY_TABLE],
+            )
+            assert db.fetchall() == [(LEGACY_KEY,)]
+
+    def test_unpartitioned_months_fall_back_to_the_default_partition(self):
+        """
+        A message for a month without a partition lands in the default
+        partition, and moves to its month once that partition is created.
+        """
+        convert_to_partitioned()
+        later = month_start(timezone.now().date(), 2)
+        message = Message.objects.create(
+            sender=self.biko,
+            recipient=self.amani,
+            message_content="later",
+            created_at=timezone.make_aware(datetime.combine(later, time())),
+        )
+
+        assert self.partition_of(message) == DEFAULT_PARTITION
+        ensure_partitions(2)
+        assert self.partition_of(message) == partition_name(later)
@@ -0,0 +1,98 @@
+"""
+Test Module for Full-Text Message Search.
+
+These tests cover matching messages through their search vectors, limiting
+hits to the caller's dialogs and rooms, and refreshing a message's vector
+only when its text is new or edited. They need the PostgreSQL database.
+"""
+
+import pytest
+from django.db import connection
+
+from src.accounts.models import ChapianaUser
+from src.chat.constants.symbolic_constants import ChapianaUserPackage, ChatType
+from src.chat.models import Category, ChatRoom, Message
+from src.chat.search import search_messages
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL."),
+]
+
+
+class TestSearchMessages:
+    """
+    Test class for `search_messages` and the vector refresh in
+    `Message.save`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create a room amani belongs to, one they do not, and a dialog they
+        are not part of, each with a message about the safari.
+        """
+        self.biko, self.amani, self.zuri = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani", "zuri")
+        )
+        category = Category.objects.create(
+            country_name="Kenya", chat_type=ChatType.GROUP_MESSAGE, user_package=ChapianaUserPackage.FREE
+        )
+        self.lobby = ChatRoom.objects.create(category=category, room_name="lobby", slug="lobby")
+        self.lobby.members.add(self.biko, self.amani)
+        self.private = ChatRoom.objects.create(category=category, room_name="private", slug="private")
+        self.private.members.add(self.biko, self.zuri)
+
+        self.visible = self.send("Safari photos are up", chat_room=self.lobby)
+        self.send("Safari budget, members only", chat_room=self.private)
+        self.send("Safari plans for two", recipient=self.zuri)
+
+    def send(self, content, chat_room=None, recipient=None):
+        """
+        Save a message from biko to a room or to `recipient`.
+        """
+        return Message.objects.create(
+            chat_room=chat_room, sender=self.biko, recipient=recipient or self.biko, message_content=content,
+        )
+
+    def hits(self, user, text) -> list[int]:
+        """
+        The ids of the messages `user` finds for `text`.
+        """
+        return [message.pk for message in search_messages(user.pk, text).messages]
+
+    def test_matches_only_visible_messages(self):
+        """
+        A match in a room of the user is found; matches in other rooms and
+        other people's dialogs are not.
+        """
+        page = search_messages(self.amani.pk, "safari")
+
+        assert [message.pk for message in page.messages] == [self.visible.pk]
+        assert "<mark>Safari</mark>" in page.messages[0].headline
+        assert len(self.hits(self.biko, "safari")) == 3
+
+    def test_edited_text_is_reindexed(self):
+        """
+        Saving new text replaces the words the message is found by.
+        """
+        message = Message.objects.get(pk=self.visible.pk)
+        message.message_content = "Game drive photos are up"
+        message.save()
+
+        assert self.hits(self.amani, "safari") == []
+        assert self.hits(self.amani, "drive") == [self.visible.pk]
+
+    def test_unchanged_text_skips_the_vector_update(self, django_assert_num_queries):
+        """
+        Saving a message without touching its text runs only the row's own
+        UPDATE.
+        """
+        message = Message.objects.get(pk=self.visible.pk)
+        message.read = True
+
+        with django_assert_num_queries(1):
+            message.save(update_fields=["read"])
+        with django_assert_num_queries(1):
+            message.save()
@@ -0,0 +1,105 @@
+"""
+Test Module for Unread Counters.
+
+These tests write messages through the message buffer's bulk write and
+through `Message.save`, and check the denormalized unread counters. They need the
+PostgreSQL database.
+"""
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+
+from src.accounts import identity
+from src.accounts.models import ChapianaUser
+from src.chat.buffers import PendingMessage, persist_messages
+from src.chat.constants.symbolic_constants import ChapianaUserPackage, ChatType
+from src.chat.models import Category, ChatRoom, Message, UnreadCounter
+from src.chat.tasks import reconcile_unread_counters
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL."),
+]
+
+
+class TestRoomUnreadCounters:
+    """
+    Test class for room counters in `UnreadCounter.increment_for` and
+    `UnreadCounter.mark_read`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """
+        Create a room with three members, with no usernames left cached by
+        earlier tests, whose users were rolled back without a commit.
+        """
+        identity._USERS.clear()
+        identity._USER_IDS.clear()
+        cache.clear()
+        self.biko, self.amani, self.zuri = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani", "zuri")
+        )
+        category = Category.objects.create(
+            country_name="Kenya", chat_type=ChatType.GROUP_MESSAGE, user_package=ChapianaUserPackage.FREE
+        )
+        self.room = ChatRoom.objects.create(category=category, room_name="lobby", slug="lobby")
+        self.room.members.add(self.biko, self.amani, self.zuri)
+
+    def count(self, user) -> int:
+        """
+        The room's unread count for `user`.
+        """
+        return UnreadCounter.get_count(user.pk, chat_room=self.room.pk)
+
+    def test_room_message_counts_for_the_other_members(self):
+        """
+        A room message is unread for every member but its sender.
+        """
+        persist_messages([
+            PendingMessage(sender="biko", recipient="biko", chat_room="lobby", message_content="hi"),
+            PendingMessage(sender="biko", recipient="biko", chat_room="lobby", message_content="again"),
+            PendingMessage(sender="amani", recipient="amani", chat_room="lobby", message_content="hey"),
+        ])
+
+        assert self.count(self.amani) == 2
+        assert self.count(self.zuri) == 3
+        assert self.count(self.biko) == 1
+
+    def test_mark_read_resets_the_room_counter(self):
+        """
+        Marking the room read resets only the reader's counter, and the
+        reconciler leaves room counters alone.
+        """
+        persist_messages([PendingMessage(sender="biko", recipient="biko", chat_room="lobby")])
+
+        assert UnreadCounter.mark_read(self.amani.pk, chat_room=self.room.pk) == 1
+        reconcile_unread_counters()
+
+        assert self.count(self.amani) == 0
+        assert self.count(self.zuri) == 1
+
+    def test_saved_room_message_counts_once(self):
+        """
+        A single room message saved through the model counts exactly once
+        for each of the other members.
+        """
+        Message.objects.create(
+            chat_room=self.room, sender=self.biko, recipient=self.biko, message_content="hi", read=True
+        )
+
+        assert self.count(self.amani) == 1
+        assert self.count(self.zuri) == 1
+        assert self.count(self.biko) == 0
+
+    def test_saved_dialog_message_counts_once(self):
+        """
+        A single dialog message saved through the model counts exactly once
+        for its recipient.
+        """
+        Message.objects.create(sender=self.biko, recipient=self.amani, message_content="hi")
+
+        assert UnreadCounter.get_count(self.amani.pk, sender=self.biko.pk) == 1
+        assert UnreadCounter.get_count(self.biko.pk, sender=self.amani.pk) == 0
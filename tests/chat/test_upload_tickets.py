@@ -0,0 +1,72 @@
+"""
+Test Module for Direct-to-Storage Upload Tickets.
+
+These tests complete tickets for files already in storage and check that a
+ticket attaches its file only once. They need the PostgreSQL database.
+"""
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from src.accounts.models import ChapianaUser
+from src.chat.models import Message
+from src.chat.upload_tickets import TARGET_MESSAGE, UploadTicketError, complete_ticket, issue_ticket
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "postgresql", reason="Needs PostgreSQL."),
+]
+
+
+class TestCompleteTicket:
+    """
+    Test class for `complete_ticket`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, tmp_path):
+        """
+        Store a file for a ticket issued to a user writing to a contact.
+        """
+        settings.MEDIA_ROOT = str(tmp_path)
+        cache.clear()
+        self.biko, self.amani = (
+            ChapianaUser.objects.create(username=name, email=f"{name}@example.com")
+            for name in ("biko", "amani")
+        )
+        issued = issue_ticket(self.biko.pk, "notes.txt", 5, "text/plain", lambda ticket: f"/local/{ticket}/")
+        default_storage.save(issued.key, ContentFile(b"hello"))
+        self.ticket = issued.ticket
+
+    def complete(self):
+        """
+        Attach the ticket's file to a message for amani.
+        """
+        return complete_ticket(self.biko, self.ticket, TARGET_MESSAGE, recipient_username="amani")
+
+    def test_ticket_completes_once(self):
+        """
+        Replaying a completed ticket is refused instead of sending the file
+        again.
+        """
+        self.complete()
+
+        with pytest.raises(UploadTicketError, match="already been used"):
+            self.complete()
+
+        assert Message.objects.filter(sender=self.biko).count() == 1
+
+    def test_failed_completion_releases_the_ticket(self):
+        """
+        A ticket whose completion failed can be completed once the problem
+        is fixed.
+        """
+        with pytest.raises(UploadTicketError, match="Recipient not found"):
+            complete_ticket(self.biko, self.ticket, TARGET_MESSAGE, recipient_username="nobody")
+
+        self.complete()
+
+        assert Message.objects.filter(sender=self.biko).count() == 1
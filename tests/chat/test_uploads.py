@@ -0,0 +1,160 @@
+"""
+Test Module for Chunked Websocket Uploads.
+
+These tests cover the binary chunk protocol: chunks are appended only at the
+current offset and with a matching CRC32, and a restarted upload resumes
+from the bytes already received. They also cover the per-upload lock,
+repeated completion and the removal of expired partial files.
+
+The shared cache is replaced by a dict and partial files go to a temporary
+directory.
+"""
+
+import hashlib
+import os
+import uuid
+import zlib
+from unittest.mock import patch
+
+import pytest
+
+from src.chat.uploads import (
+    CACHE_KEY, HEADER, LOCK_KEY, UploadError, complete_upload, remove_stale_uploads, start_upload, write_chunk,
+)
+
+
+def frame(upload_id: str, offset: int, chunk: bytes, crc: int | None = None) -> bytes:
+    """
+    Build a binary upload frame.
+    """
+    crc = zlib.crc32(chunk) if crc is None else crc
+    return HEADER.pack(uuid.UUID(upload_id).bytes, offset, crc) + chunk
+
+
+class FakeCache(dict):
+    """
+    Dict with the subset of the cache API used by uploads.
+    """
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+    def add(self, key, value, timeout=None):
+        if key in self:
+            return False
+        self[key] = value
+        return True
+
+    def get_many(self, keys):
+        return {key: self[key] for key in keys if key in self}
+
+    def delete(self, key):
+        self.pop(key, None)
+
+
+class TestChunkedUpload:
+    """
+    Test class for `start_upload` and `write_chunk`.
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        """
+        Use an in-memory cache and a temporary upload directory.
+        """
+        self.cache = patch("src.chat.uploads.cache", FakeCache()).start()
+        patch("src.chat.uploads.upload_dir", return_value=str(tmp_path)).start()
+        self.uploaded_file = patch("src.chat.uploads.UploadedFile").start()
+        yield
+        patch.stopall()
+
+    def test_appends_chunks_in_order(self):
+        """
+        Consecutive chunks advance the offset to the declared size.
+        """
+        state = start_upload(1, "notes.txt", 10)
+
+        write_chunk(1, frame(state.upload_id, 0, b"hello"))
+        state = write_chunk(1, frame(state.upload_id, 5, b"world"))
+
+        assert state.offset == 10
+        with open(state.path, "rb") as handle:
+            assert handle.read() == b"helloworld"
+
+    def test_rejects_wrong_offset_and_checksum(self):
+        """
+        Misplaced or corrupted chunks are refused with the offset to resend from.
+        """
+        state = start_upload(1, "notes.txt", 10)
+        write_chunk(1, frame(state.upload_id, 0, b"hello"))
+
+        with pytest.raises(UploadError) as wrong_offset:
+            write_chunk(1, frame(state.upload_id, 0, b"hello"))
+        with pytest.raises(UploadError) as bad_crc:
+            write_chunk(1, frame(state.upload_id, 5, b"world", crc=0))
+
+        assert wrong_offset.value.offset == 5
+        assert bad_crc.value.offset == 5
+
+    def test_resumes_from_received_bytes(self):
+        """
+        Restarting with the upload id reports the bytes already stored.
+        """
+        state = start_upload(1, "notes.txt", 10)
+        write_chunk(1, frame(state.upload_id, 0, b"hello"))
+
+        resumed = start_upload(1, "notes.txt", 10, upload_id=state.upload_id)
+
+        assert resumed.offset == 5
+
+    def test_other_users_cannot_write(self):
+        """
+        An upload only accepts chunks from the user who started it.
+        """
+        state = start_upload(1, "notes.txt", 10)
+
+        with pytest.raises(UploadError):
+            write_chunk(2, frame(state.upload_id, 0, b"hello"))
+
+    def test_rejects_chunks_while_another_is_written(self):
+        """
+        A chunk for an upload locked by another socket is refused, not
+        appended after an outdated offset check.
+        """
+        state = start_upload(1, "notes.txt", 10)
+        self.cache[LOCK_KEY.format(state.upload_id)] = 1
+
+        with pytest.raises(UploadError, match="busy"):
+            write_chunk(1, frame(state.upload_id, 0, b"hello"))
+
+        assert state.offset == 0
+
+    def test_completing_twice_returns_the_stored_file(self):
+        """
+        A repeated completion returns the first file instead of failing or
+        storing the bytes again.
+        """
+        state = start_upload(1, "notes.txt", 5, hashlib.sha256(b"hello").hexdigest())
+        write_chunk(1, frame(state.upload_id, 0, b"hello"))
+
+        first = complete_upload(1, state.upload_id)
+        again = complete_upload(1, state.upload_id)
+
+        first.file.save.assert_called_once()
+        self.uploaded_file.objects.get.assert_called_once_with(pk=first.pk)
+        assert again is self.uploaded_file.objects.get.return_value
+        assert not os.path.exists(state.path)
+
+    def test_removes_expired_partial_files(self):
+        """
+        Partial files whose upload state expired are deleted; live ones stay.
+        """
+        live = start_upload(1, "live.txt", 10)
+        expired = start_upload(1, "expired.txt", 10)
+        self.cache.delete(CACHE_KEY.format(expired.upload_id))
+        for state in (live, expired):
+            os.utime(state.path, (0, 0))
+
+        assert remove_stale_uploads() == 1
+        assert os.path.exists(live.path)
+        assert not os.path.exists(expired.path)
@@ -0,0 +1,66 @@
+"""
+Test Module for the In-Process LRU Cache.
+
+These tests cover expiry, least-recently-used eviction and invalidation of
+`LocalCache`, the first tier in front of the shared Redis cache.
+"""
+
+from unittest.mock import patch
+
+from src.common.cache import LocalCache
+
+
+class TestLocalCache:
+    """
+    Test class for `LocalCache`.
+    """
+
+    def test_get_returns_default_when_missing(self):
+        """
+        Unknown keys fall back to the default.
+        """
+        cache = LocalCache()
+
+        assert cache.get("missing") is None
+        assert cache.get("missing", 0) == 0
+
+    def test_entries_expire_after_ttl(self):
+        """
+        Entries are dropped once their TTL has elapsed.
+        """
+        cache = LocalCache(ttl=5)
+
+        with patch("src.common.cache.time.monotonic", return_value=100):
+            cache.set("room", "members")
+        with patch("src.common.cache.time.monotonic", return_value=104):
+            assert cache.get("room") == "members"
+        with patch("src.common.cache.time.monotonic", return_value=105):
+            assert cache.get("room") is None
+
+    def test_evicts_least_recently_used(self):
+        """
+        A full cache evicts the entry that was used least recently.
+        """
+        cache = LocalCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_delete_and_clear(self):
+        """
+        Invalidation drops single keys or everything.
+        """
+        cache = LocalCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+
+        cache.delete("a", "unknown")
+        assert len(cache) == 1
+
+        cache.clear()
+        assert len(cache) == 0
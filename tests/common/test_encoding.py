@@ -0,0 +1,63 @@
+"""
+Test Module for Websocket Frame Encoding.
+
+These tests check that frames are encoded once into channel layer events,
+that values the standard library cannot encode are handled the same way by
+every backend, and that stream envelopes wrap encoded frames as valid JSON.
+"""
+
+import datetime
+import uuid
+
+from src.common.encoding import dumps, frame_event, loads, stream_frame
+
+
+class TestEncoding:
+    """
+    Test class for `dumps`, `frame_event` and `stream_frame`.
+    """
+
+    def test_dumps_returns_text(self):
+        """
+        Frames are text so they can go straight into a websocket text frame.
+        """
+        assert loads(dumps({"command": "new_message", "content": "hi"})) == {
+            "command": "new_message",
+            "content": "hi",
+        }
+        assert isinstance(dumps({}), str)
+
+    def test_dumps_encodes_datetimes_and_uuids(self):
+        """
+        Datetimes become ISO strings and UUIDs their canonical form.
+        """
+        guid = uuid.uuid4()
+        created_at = datetime.datetime(2024, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+        decoded = loads(dumps({"guid": guid, "created_at": created_at}))
+
+        assert decoded == {"guid": str(guid), "created_at": "2024-01-01T12:00:00+00:00"}
+
+    def test_frame_event_carries_pre_encoded_text(self):
+        """
+        The event names its handler and carries the payload as text.
+        """
+        event = frame_event({"command": "clear_history"})
+
+        assert event["type"] == "chat_frame"
+        assert loads(event["text"]) == {"command": "clear_history"}
+        assert "group" not in event
+
+    def test_frame_event_names_its_group(self):
+        """
+        Events sent to a group can say which group that was.
+        """
+        assert frame_event({}, group="chat_lobby")["group"] == "chat_lobby"
+
+    def test_stream_frame_wraps_encoded_text(self):
+        """
+        The envelope tags an already encoded frame with its stream.
+        """
+        text = stream_frame('room:"lobby"', dumps({"command": "new_message"}))
+
+        assert loads(text) == {"stream": 'room:"lobby"', "payload": {"command": "new_message"}}
@@ -0,0 +1,40 @@
+"""
+Test Module for Keyset Pagination Cursors.
+
+These tests check that cursors round-trip the sort key of a row and that
+tampered cursors are rejected.
+"""
+
+import pytest
+
+from src.common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+class TestCursor:
+    """
+    Test class for `encode_cursor` and `decode_cursor`.
+    """
+
+    def test_round_trip(self):
+        """
+        Decoding a cursor gives back the values it was built from.
+        """
+        cursor = encode_cursor("2024-01-01T12:00:00+00:00", 42)
+
+        assert decode_cursor(cursor, 2) == ["2024-01-01T12:00:00+00:00", 42]
+
+    def test_cursor_is_url_safe(self):
+        """
+        Cursors can be passed in a query string without escaping.
+        """
+        cursor = encode_cursor("2024-01-01T12:00:00+00:00", 42)
+
+        assert all(character.isalnum() or character in "-_" for character in cursor)
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(1, 2, 3), encode_cursor({"a": 1})])
+    def test_rejects_invalid_cursors(self, cursor):
+        """
+        Garbage or cursors of the wrong shape raise `InvalidCursor`.
+        """
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor, 2)
@@ -27,12 +27,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # 3rd party
     'channels',
     'django_extensions',
+
+    # Chapiana apps
+    'src.accounts.apps.AccountsConfig',
+    'src.chat.apps.ChatConfig',
+    'src.common',
 ]
 
+AUTH_USER_MODEL = 'accounts.ChapianaUser'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
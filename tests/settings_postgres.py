@@ -0,0 +1,28 @@
+# -*- coding: utf-8
+"""
+Test settings for the PostgreSQL-backed tests.
+
+The default test settings use SQLite, where the partitioning, full-text
+search, unread counter and call transition tests are skipped. Run those
+against a PostgreSQL server with:
+
+    DB_HOST=localhost DB_USER=postgres pytest --ds=tests.settings_postgres --nomigrations
+
+The apps ship without migrations, so the schema is built from the models.
+"""
+from __future__ import unicode_literals, absolute_import
+
+import os
+
+from tests.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_NAME", "chapiana"),
+        "USER": os.environ.get("DB_USER", "postgres"),
+        "PASSWORD": os.environ.get("DB_PASS", ""),
+        "HOST": os.environ.get("DB_HOST", "localhost"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+    }
+}